@@ -1,13 +1,111 @@
-from flask import Flask
-import os  # Missing import for os module
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Service
 
-app = Flask(__name__)
+This module is the production entry point. It serves the recommendation routes of
+fashion_recommender_api and the questionnaire routes of fashion_questionnaire_api
+behind one ASGI app sharing a single recommender, and is run by gunicorn with uvicorn
+workers (see gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py app:app
+
+For local development it can also be run directly with uvicorn.
+"""
+import os
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+import fashion_questionnaire_api
+import fashion_recommender_api
+from fashion_admin import install_admin
+from fashion_admission import install_admission
+from fashion_catalogs import install_catalogs
+from fashion_metrics import install_metrics
+from fashion_startup import Warmup, install_health, warmup_queries_from_env
+
+# Get the dataset path (FASHION_DATASET may name a CSV, Parquet or Feather catalog)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+dataset_path = os.environ.get('FASHION_DATASET', os.path.join(current_dir, "fashion_dataset_updated.csv"))
+
+
+def create_app(dataset_path=dataset_path, warmup_queries=None):
+    """
+    Create the combined recommendation and questionnaire app
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        warmup_queries (int): Synthetic queries run before reporting ready
+            (defaults to FASHION_WARMUP_QUERIES)
+
+    Returns:
+        FastAPI: The app
+    """
+    app = FastAPI(
+        title="Fashion Recommendation Service",
+        description="Personalized fashion recommendations and preference questionnaire",
+        version="1.0.0"
+    )
+
+    # Shed load with quick 503s instead of queueing requests until clients time out;
+    # installed first so the CORS headers are added to the rejections as well
+    install_admission(app, "service")
+
+    # Add CORS middleware to allow cross-origin requests
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/", tags=["Root"])
+    def read_root():
+        """Root endpoint with service information."""
+        return {
+            "name": "Fashion Recommendation Service",
+            "version": "1.0.0",
+            "apis": {
+                "recommendations": "POST /recommendations/question, /recommendations/tags, /recommendations/preferences, "
+                                   "/recommendations/next",
+                "items": "GET /items/{id}/similar",
+                "questionnaire": "GET /questions, POST /answers/{question_id}, GET /recommendations, /speculation, "
+                                 "POST /items/{id}/dismiss and more",
+                "catalogs": "GET /catalogs; pass ?catalog=<id> to the recommendation routes",
+                "monitoring": "GET /healthz, /readyz, /metrics"
+            }
+        }
+
+    # The service root above takes precedence over the routers' own root routes
+    app.include_router(fashion_recommender_api.router)
+    app.include_router(fashion_questionnaire_api.router)
+
+    if warmup_queries is None:
+        warmup_queries = warmup_queries_from_env()
+    warmup = Warmup(dataset_path, "service", warmup_queries=warmup_queries)
+    install_health(app, warmup)
+    if fashion_questionnaire_api.speculator is not None:
+        fashion_questionnaire_api.speculator.get_recommender = lambda: warmup.recommender
+
+    # Further catalogs selected with ?catalog=<id>, built on first use
+    install_catalogs(app, "service")
+
+    # Expose per-stage timings and request latency on GET /metrics
+    install_metrics(app, "service")
+    fashion_recommender_api.snapshots.install_metrics("service")
+    fashion_questionnaire_api.seen.install_metrics("service")
+
+    # Admin-only debugging routes, enabled by FASHION_ADMIN_TOKEN
+    install_admin(app, get_recommender=lambda: warmup.recommender, sessions=fashion_questionnaire_api.sessions)
+    return app
+
+
+app = create_app()
 
-@app.route('/')
-def home():
-    return "Hello, World!"
 
 if __name__ == '__main__':
     # For local development
-    port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    port = int(os.environ.get("PORT", 8000))
+    uvicorn.run("app:create_app", factory=True, host="0.0.0.0", port=port)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Admin Routes
+
+This module adds admin-only debugging routes to the FastAPI apps. The routes are
+disabled unless the FASHION_ADMIN_TOKEN environment variable is set, and every call
+must send the same token in the X-Admin-Token header.
+
+    GET /debug/profile?seconds=N    Sample the worker for N seconds and return
+                                    collapsed stacks for a flame graph
+    GET /debug/memory               Memory held by the recommender and sessions
+    POST /debug/memory/trace        Start tracing allocations from a baseline
+    GET /debug/memory/trace         Allocation growth since the baseline
+    DELETE /debug/memory/trace      Stop tracing allocations
+"""
+import asyncio
+import hmac
+import os
+import threading
+
+from fastapi import Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from fashion_memory import LeakTracker, session_report
+from fashion_profiler import Sampler
+
+# Bounds that keep a profile's overhead and duration predictable
+MAX_PROFILE_SECONDS = 60.0
+MIN_PROFILE_INTERVAL_MS = 1.0
+
+# Only one profile runs at a time per worker
+_profile_lock = threading.Lock()
+
+# One allocation baseline per worker, shared by all apps in the process
+_leak_tracker = LeakTracker()
+_leak_tracker_lock = threading.Lock()
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """
+    FastAPI dependency that only lets requests with the admin token through
+
+    Args:
+        x_admin_token (str): Value of the X-Admin-Token header
+    """
+    token = os.environ.get('FASHION_ADMIN_TOKEN')
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def install_admin(app, get_recommender=None, sessions=None):
+    """
+    Add the admin-only debugging routes to a FastAPI app
+
+    Args:
+        app (FastAPI): The app to extend
+        get_recommender (callable): Returns the recommender reported by /debug/memory,
+            or None while it is not loaded
+        sessions (dict): Session store reported by /debug/memory
+    """
+    @app.get("/debug/profile", tags=["Admin"], include_in_schema=False,
+             response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+    async def debug_profile(seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+                            interval_ms: float = Query(10.0, ge=MIN_PROFILE_INTERVAL_MS)):
+        """Sample every thread of this worker and return collapsed stacks."""
+        if not _profile_lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        try:
+            sampler = Sampler(interval_ms / 1000.0)
+            sampler.start()
+            try:
+                # Sleep on the event loop so the worker keeps serving the traffic
+                # being profiled
+                await asyncio.sleep(seconds)
+            finally:
+                await asyncio.get_running_loop().run_in_executor(None, sampler.stop)
+        finally:
+            _profile_lock.release()
+
+        return PlainTextResponse(sampler.collapsed(), headers={
+            'X-Profile-Samples': str(sampler.n_samples),
+            'X-Profile-Overhead-Ms': f"{sampler.overhead * 1000.0:.1f}",
+        })
+
+    @app.get("/debug/memory", tags=["Admin"], include_in_schema=False, dependencies=[Depends(require_admin)])
+    def debug_memory():
+        """Memory held by the recommender's data structures and the session store."""
+        report = {}
+        recommender = get_recommender() if get_recommender is not None else None
+        if recommender is not None:
+            report['recommender'] = recommender.memory_report()
+        if sessions is not None:
+            report['sessions'] = session_report(sessions)
+        return report
+
+    @app.post("/debug/memory/trace", tags=["Admin"], include_in_schema=False, dependencies=[Depends(require_admin)])
+    def start_memory_trace():
+        """Start tracing allocations and take the baseline snapshot."""
+        with _leak_tracker_lock:
+            _leak_tracker.start()
+        return {"message": "Allocation tracing started"}
+
+    @app.get("/debug/memory/trace", tags=["Admin"], include_in_schema=False, dependencies=[Depends(require_admin)])
+    def memory_trace(top: int = Query(20, ge=1, le=200),
+                     group_by: str = Query('lineno', pattern='^(lineno|filename|traceback)$')):
+        """Allocation sites that grew the most since the baseline snapshot."""
+        with _leak_tracker_lock:
+            if not _leak_tracker.active:
+                raise HTTPException(status_code=409, detail="Allocation tracing is not running")
+            return _leak_tracker.diff(top=top, group_by=group_by)
+
+    @app.delete("/debug/memory/trace", tags=["Admin"], include_in_schema=False, dependencies=[Depends(require_admin)])
+    def stop_memory_trace():
+        """Stop tracing allocations."""
+        with _leak_tracker_lock:
+            _leak_tracker.stop()
+        return {"message": "Allocation tracing stopped"}
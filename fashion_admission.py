@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation API Admission Control
+
+The recommendation handlers are synchronous and run in the server's threadpool, so
+under a traffic spike requests pile up behind the scoring work until every client
+times out. This middleware admits at most a configurable number of concurrent
+requests per endpoint class and queues a bounded number of the rest. A request that
+finds the queue full, or is still queued when its queue-time deadline passes, gets an
+immediate 503 with a Retry-After header instead of waiting for a slot.
+
+Cheap endpoints (the question catalog, answers, sessions) have their own, larger pool
+of slots, so they are never queued behind scoring requests. Health probes, /metrics
+and the admin routes bypass admission control entirely.
+
+Limits are configured through the environment of the API process:
+
+    FASHION_ADMISSION=0                        # disable admission control
+    FASHION_ADMISSION_SCORING=4,64,1000        # concurrency, queue depth, deadline in ms
+    FASHION_ADMISSION_CHEAP=32,256,2000
+    FASHION_ADMISSION_RETRY_AFTER=1            # Retry-After of rejections in seconds
+"""
+import asyncio
+import collections
+import json
+import os
+import time
+
+from fashion_metrics import REGISTRY
+
+ADMISSION_SHED = REGISTRY.counter(
+    'fashion_admission_shed_total', 'Requests rejected by admission control by reason (queue_full or deadline)',
+    ['app', 'endpoint_class', 'reason'])
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    'fashion_admission_queue_seconds', 'Time admitted requests waited for a slot', ['app', 'endpoint_class'])
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    'fashion_admission_in_flight', 'Requests holding an admission slot', ['app', 'endpoint_class'])
+ADMISSION_QUEUED = REGISTRY.gauge(
+    'fashion_admission_queued', 'Requests waiting for an admission slot', ['app', 'endpoint_class'])
+
+# Path prefixes of the scoring endpoints; every other route is cheap
+SCORING_PREFIXES = ('/recommendations',)
+
+# Routes that must answer even when the app is overloaded
+EXEMPT_PREFIXES = ('/healthz', '/readyz', '/metrics', '/debug')
+
+
+def endpoint_class(path):
+    """
+    Get the admission class of a request path
+
+    Args:
+        path (str): Request path
+
+    Returns:
+        str: 'scoring', 'cheap', or None for exempt routes
+    """
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    return 'scoring' if path.startswith(SCORING_PREFIXES) else 'cheap'
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded, deadline-limited FIFO queue for one event loop."""
+
+    def __init__(self, concurrency, queue_depth, deadline_ms):
+        """
+        Initialize the limiter
+
+        Args:
+            concurrency (int): Requests admitted at the same time
+            queue_depth (int): Requests allowed to wait for a slot
+            deadline_ms (float): Longest time a request waits before it is rejected
+        """
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.deadline = deadline_ms / 1000.0
+        self.in_flight = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        Wait for a slot
+
+        Returns:
+            str: None once a slot is held, or the reason the request is rejected
+                ('queue_full' or 'deadline')
+        """
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.queue_depth:
+            return 'queue_full'
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.deadline)
+        finally:
+            if not waiter.done():
+                # Timed out or cancelled: give up the place in the queue
+                waiter.cancel()
+                self._waiters.remove(waiter)
+        if waiter.cancelled():
+            return 'deadline'
+        # release() handed its slot over to this request
+        return None
+
+    def release(self):
+        """Give up a slot, handing it to the longest waiting request if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionLimiter per endpoint class."""
+
+    def __init__(self, app, app_name, limits, retry_after=1):
+        """
+        Args:
+            app: The wrapped ASGI app
+            app_name (str): Value of the 'app' label of the admission metrics
+            limits (dict): Mapping of endpoint class to (concurrency, queue depth, deadline in ms)
+            retry_after (int): Retry-After of rejected requests in seconds
+        """
+        self.app = app
+        self.app_name = app_name
+        self.retry_after = retry_after
+        self.limiters = {name: AdmissionLimiter(*limit) for name, limit in limits.items()}
+        for name, limiter in self.limiters.items():
+            ADMISSION_IN_FLIGHT.set_function(lambda limiter=limiter: limiter.in_flight,
+                                             app=app_name, endpoint_class=name)
+            ADMISSION_QUEUED.set_function(lambda limiter=limiter: limiter.queued,
+                                          app=app_name, endpoint_class=name)
+
+    async def __call__(self, scope, receive, send):
+        name = endpoint_class(scope['path']) if scope['type'] == 'http' else None
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        reason = await limiter.acquire()
+        if reason is not None:
+            ADMISSION_SHED.inc(app=self.app_name, endpoint_class=name, reason=reason)
+            await self._reject(send)
+            return
+
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, app=self.app_name, endpoint_class=name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _reject(self, send):
+        body = json.dumps({'detail': 'Server is overloaded, retry later'}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+                (b'retry-after', str(self.retry_after).encode('ascii'))
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def limits_from_env():
+    """
+    Get the admission limits configured by the FASHION_ADMISSION* environment variables
+
+    Returns:
+        dict: Mapping of endpoint class to (concurrency, queue depth, deadline in ms),
+            or None when FASHION_ADMISSION=0
+    """
+    if os.environ.get('FASHION_ADMISSION', '1') == '0':
+        return None
+    # Scoring is CPU-bound, so more concurrent requests than cores only adds latency
+    defaults = {'scoring': (os.cpu_count() or 1, 64, 1000.0), 'cheap': (32, 256, 2000.0)}
+    limits = {}
+    for name, default in defaults.items():
+        value = os.environ.get(f'FASHION_ADMISSION_{name.upper()}')
+        if value:
+            concurrency, queue_depth, deadline_ms = value.split(',')
+            limits[name] = (int(concurrency), int(queue_depth), float(deadline_ms))
+        else:
+            limits[name] = default
+    return limits
+
+
+def install_admission(app, app_name, limits=None, retry_after=None):
+    """
+    Add the admission control middleware to a FastAPI app
+
+    Install it before install_metrics() so shed requests still show up in the
+    request metrics and the slow-query log.
+
+    Args:
+        app (FastAPI): The app to protect
+        app_name (str): Value of the 'app' label of the admission metrics
+        limits (dict): Mapping of endpoint class to (concurrency, queue depth, deadline
+            in ms) (defaults to the FASHION_ADMISSION* environment variables)
+        retry_after (int): Retry-After of rejections in seconds
+            (defaults to FASHION_ADMISSION_RETRY_AFTER or 1)
+    """
+    if limits is None:
+        limits = limits_from_env()
+        if limits is None:
+            return
+    if retry_after is None:
+        retry_after = int(os.environ.get('FASHION_ADMISSION_RETRY_AFTER', 1))
+    app.add_middleware(AdmissionMiddleware, app_name=app_name, limits=limits, retry_after=retry_after)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation ANN Index
+
+This module provides an inverted-file (IVF) index over the recommender's tag matrix.
+Items are clustered offline with spherical k-means and stored grouped by cluster, with
+a per-item bitmask of item types so every cluster doubles as a set of per-category
+posting lists. A query only scores the items of the n_probe clusters whose centroids
+are closest to it, which trades a little recall for much lower latency on large catalogs.
+
+Build the index next to the dataset and compare it against exact search with:
+
+    python fashion_ann_index.py build --dataset fashion_dataset_updated.csv
+    python fashion_ann_index.py report --dataset fashion_dataset_updated.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+
+from fashion_recommender import FashionRecommender, freeze_arrays, top_k
+
+
+# Number of rows assigned to clusters at a time while building the index
+ASSIGN_BLOCK_SIZE = 65536
+
+
+def default_index_path(dataset_path):
+    """
+    Get the path the index of a dataset is persisted to by default
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+
+    Returns:
+        str: Path of the index file next to the dataset
+    """
+    return os.path.splitext(dataset_path)[0] + '.ivf.npz'
+
+
+def vocabulary_fingerprint(vectorizer, idf=False):
+    """
+    Hash a fitted vectorizer's vocabulary so stale indexes can be detected
+
+    Args:
+        vectorizer (TfidfVectorizer): Fitted vectorizer of the recommender
+        idf (bool): Also hash the IDF weights, for structures that store scores
+
+    Returns:
+        str: Hex digest of the vocabulary
+    """
+    vocabulary = sorted((term, int(column)) for term, column in vectorizer.vocabulary_.items())
+    digest = hashlib.sha1(json.dumps(vocabulary).encode('utf-8'))
+    if idf:
+        digest.update(np.ascontiguousarray(vectorizer.idf_, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class IVFIndex:
+    """Inverted-file index with per-category posting lists over a tag matrix."""
+
+    def __init__(self, centroids, cluster_offsets, order, offsets, meta):
+        """
+        Initialize the index from its arrays
+
+        Args:
+            centroids (np.ndarray): L2-normalized centroids of all clusters (n_clusters x n_features)
+            cluster_offsets (np.ndarray): Item type t owns clusters cluster_offsets[t]:cluster_offsets[t + 1]
+            order (np.ndarray): Catalog row ids grouped by cluster
+            offsets (np.ndarray): Cluster c owns order[offsets[c]:offsets[c + 1]]
+            meta (dict): Item types, catalog shape, vocabulary fingerprint and default n_probe
+        """
+        self.centroids = centroids
+        self.cluster_offsets = cluster_offsets
+        self.order = order
+        self.offsets = offsets
+        self.meta = meta
+        self.item_types = list(meta['item_types'])
+        self.default_n_probe = int(meta['default_n_probe'])
+
+        # Tag matrix rows permuted into cluster order, set by attach()
+        self.matrix = None
+
+    @property
+    def n_clusters(self):
+        return self.centroids.shape[0]
+
+    @property
+    def max_clusters_per_type(self):
+        return int(np.diff(self.cluster_offsets).max(initial=1))
+
+    @classmethod
+    def build(cls, recommender, clusters_per_type=None, n_probe=None, seed=42):
+        """
+        Cluster every item type of the recommender's catalog and build the posting lists
+
+        Args:
+            recommender (FashionRecommender): Recommender whose tag matrix is indexed
+            clusters_per_type (int): Clusters per item type (defaults to sqrt of its item count)
+            n_probe (int): Default number of clusters probed per item type and query
+            seed (int): Random seed for k-means
+
+        Returns:
+            IVFIndex: The built index, already attached to the recommender
+        """
+        tag_matrix = recommender.tag_matrix
+        item_types = list(recommender.category_mapping)
+
+        centroid_blocks, cluster_offsets = [], [0]
+        order_blocks, cluster_sizes = [], []
+        for item_type in item_types:
+            rows = recommender.category_indices[item_type]
+            if len(rows) == 0:
+                # Item types without items get no clusters at all
+                cluster_offsets.append(cluster_offsets[-1])
+                continue
+            n_clusters = clusters_per_type or int(np.sqrt(len(rows)))
+            n_clusters = max(1, min(n_clusters, len(rows)))
+            centroids, assignments = cls._cluster(tag_matrix[rows], n_clusters, seed)
+
+            # Group the item type's rows by cluster, keeping ids ascending within a cluster
+            grouped = np.argsort(assignments, kind='stable')
+            centroid_blocks.append(centroids)
+            cluster_offsets.append(cluster_offsets[-1] + n_clusters)
+            order_blocks.append(rows[grouped])
+            cluster_sizes.append(np.bincount(assignments, minlength=n_clusters))
+
+        if n_probe is None:
+            n_probe = max(1, max(np.diff(cluster_offsets)) // 3)
+
+        meta = {
+            'item_types': item_types,
+            'n_items': int(tag_matrix.shape[0]),
+            'n_features': int(tag_matrix.shape[1]),
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer),
+            'default_n_probe': int(n_probe)
+        }
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(cluster_sizes))]).astype(np.int64)
+        index = cls(np.vstack(centroid_blocks), np.asarray(cluster_offsets, dtype=np.int64),
+                    np.concatenate(order_blocks).astype(np.int64), offsets, meta)
+        index.attach(recommender)
+        return index
+
+    @staticmethod
+    def _cluster(matrix, n_clusters, seed):
+        """
+        Run spherical k-means over the rows of a TF-IDF matrix
+
+        Args:
+            matrix (scipy.sparse matrix): Unit-length rows to cluster
+            n_clusters (int): Number of clusters
+            seed (int): Random seed
+
+        Returns:
+            tuple: (L2-normalized centroids, cluster id of every row)
+        """
+        n_rows = matrix.shape[0]
+        if n_clusters == 1:
+            centroid = normalize(np.asarray(matrix.mean(axis=0)))
+            return centroid, np.zeros(n_rows, dtype=np.int64)
+
+        # TF-IDF rows are unit length, so normalized k-means centroids give
+        # spherical clusters under cosine similarity
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=seed, n_init=3,
+                                 batch_size=min(4096, n_rows))
+        kmeans.fit(matrix)
+        centroids = normalize(kmeans.cluster_centers_).astype(np.float64)
+
+        # Assign every row to its most similar centroid in bounded blocks
+        assignments = np.empty(n_rows, dtype=np.int64)
+        for start in range(0, n_rows, ASSIGN_BLOCK_SIZE):
+            block = matrix[start:start + ASSIGN_BLOCK_SIZE] @ centroids.T
+            assignments[start:start + ASSIGN_BLOCK_SIZE] = np.asarray(block).argmax(axis=1)
+        return centroids, assignments
+
+    def save(self, path):
+        """
+        Persist the index to an .npz file
+
+        Args:
+            path (str): Destination path
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, cluster_offsets=self.cluster_offsets,
+                     order=self.order, offsets=self.offsets, meta=np.array(json.dumps(self.meta)))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with save()
+
+        Args:
+            path (str): Path to the .npz file
+
+        Returns:
+            IVFIndex: The loaded index (call attach() before searching)
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['centroids'], data['cluster_offsets'], data['order'],
+                       data['offsets'], json.loads(str(data['meta'])))
+
+    def attach(self, recommender):
+        """
+        Bind the index to a recommender's tag matrix
+
+        Args:
+            recommender (FashionRecommender): Recommender built from the indexed dataset
+
+        Raises:
+            ValueError: If the index was built from a different catalog or vocabulary
+        """
+        tag_matrix = recommender.tag_matrix
+        expected = {
+            'item_types': list(recommender.category_mapping),
+            'n_items': tag_matrix.shape[0],
+            'n_features': tag_matrix.shape[1],
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer)
+        }
+        for key, value in expected.items():
+            if self.meta.get(key) != value:
+                raise ValueError(f"ANN index does not match the dataset ({key} differs); rebuild it")
+
+        self.matrix = tag_matrix[self.order]
+        freeze_arrays(self.matrix, self.centroids, self.cluster_offsets, self.order, self.offsets)
+
+    def search(self, query_vector, k, n_probe=None, exclude=None):
+        """
+        Rank the items of every item type within its closest clusters
+
+        Args:
+            query_vector (scipy.sparse matrix): TF-IDF vector of the query
+            k (int): Number of items to keep per item type
+            n_probe (int): Number of clusters to probe per item type (None for the index default)
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+
+        Returns:
+            dict: Mapping of item type to (row ids, similarity scores) in descending order
+        """
+        n_probe = n_probe or self.default_n_probe
+        query = np.asarray(query_vector.todense()).ravel()
+        centroid_scores = self.centroids @ query
+
+        # Pick the closest clusters of every item type
+        probes, type_ends = [], []
+        for position in range(len(self.item_types)):
+            first, last = self.cluster_offsets[position], self.cluster_offsets[position + 1]
+            probes.append(first + top_k(centroid_scores[first:last], n_probe)[0])
+            type_ends.append(sum(len(p) for p in probes))
+        probes = np.concatenate(probes)
+        starts = self.offsets[probes]
+        lengths = self.offsets[probes + 1] - starts
+
+        # Expand the probed clusters into positions of the permuted matrix
+        ends = np.cumsum(lengths)
+        positions = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        scores = self.matrix[positions] @ query
+        row_ids = self.order[positions]
+        if exclude is not None:
+            scores[exclude[row_ids]] = 0.0
+
+        # Probed clusters are laid out item type by item type; item types without
+        # clusters probe nothing and get empty bounds
+        ranked = {}
+        bounds = np.concatenate([[0], np.concatenate([[0], ends])[np.asarray(type_ends)]]).astype(np.int64)
+        for position, item_type in enumerate(self.item_types):
+            first, last = bounds[position], bounds[position + 1]
+            ranked[item_type] = top_k(scores[first:last], k, row_ids[first:last])
+        return ranked
+
+
+def sample_queries(recommender, n_queries, tags_per_query=3, seed=7):
+    """
+    Sample realistic tag queries from the catalog's own tag lists
+
+    Args:
+        recommender (FashionRecommender): Recommender whose dataset is sampled
+        n_queries (int): Number of queries to generate
+        tags_per_query (int): Maximum number of tags per query
+        seed (int): Random seed
+
+    Returns:
+        list: Lists of tags
+    """
+    rng = random.Random(seed)
+    tag_lists = recommender.df['Tags'].str.split(',').tolist()
+    queries = []
+    for _ in range(n_queries):
+        tags = rng.choice(tag_lists)
+        queries.append(rng.sample(tags, min(tags_per_query, len(tags))))
+    return queries
+
+
+def recall_report(recommender, index, queries, k=7, probes=None):
+    """
+    Measure tie-aware recall@k and queries per second of the index against exact search
+
+    Args:
+        recommender (FashionRecommender): Recommender the index is attached to
+        index (IVFIndex): Index to evaluate
+        queries (list): Lists of tags to search for
+        k (int): Number of items kept per item type
+        probes (list): n_probe values to evaluate (defaults to powers of two)
+
+    Returns:
+        list: One dict per setting with n_probe, recall, qps and speedup
+    """
+    if probes is None:
+        probes = sorted({min(2 ** p, index.max_clusters_per_type) for p in range(12)})
+    vectors = [recommender.vectorizer.transform([' '.join(tags)]) for tags in queries]
+
+    # Exact rankings are the ground truth
+    start = time.perf_counter()
+    exact = [recommender.rank_candidates(vector, k, exact=True) for vector in vectors]
+    exact_qps = len(vectors) / (time.perf_counter() - start)
+    rows = [{'n_probe': 'exact', 'recall': 1.0, 'qps': exact_qps, 'speedup': 1.0}]
+
+    for n_probe in probes:
+        start = time.perf_counter()
+        approximate = [index.search(vector, k, n_probe=n_probe) for vector in vectors]
+        qps = len(vectors) / (time.perf_counter() - start)
+
+        # Tag vectors produce many equal scores, so a result counts as a hit
+        # when it scores at least as high as the exact k-th result
+        hits, total = 0, 0
+        for truth, found in zip(exact, approximate):
+            for item_type, (_, truth_scores) in truth.items():
+                if len(truth_scores):
+                    found_scores = found[item_type][1]
+                    hits += int(np.sum(found_scores >= truth_scores[-1] - 1e-9))
+                    total += len(truth_scores)
+        rows.append({
+            'n_probe': n_probe,
+            'recall': hits / total if total else 1.0,
+            'qps': qps,
+            'speedup': qps / exact_qps
+        })
+    return rows
+
+
+def main():
+    """Main function to build or evaluate the ANN index."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation ANN Index")
+    parser.add_argument("command", choices=["build", "report"], help="Build the index or report recall vs. QPS")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv",
+                       help="Path to dataset CSV file")
+    parser.add_argument("--index", "-i", help="Index path (defaults to <dataset>.ivf.npz)")
+    parser.add_argument("--clusters", type=int, help="Clusters per item type (defaults to sqrt of its item count)")
+    parser.add_argument("--n-probe", type=int, help="Default number of clusters probed per item type and query")
+    parser.add_argument("--queries", type=int, default=500, help="Number of sampled queries for the report")
+    parser.add_argument("--k", type=int, default=7, help="Items kept per item type for recall@k")
+    parser.add_argument("--output", "-o", choices=["json", "text"], default="text",
+                       help="Report output format (json or text)")
+
+    args = parser.parse_args()
+    index_path = args.index or default_index_path(args.dataset)
+
+    try:
+        recommender = FashionRecommender(args.dataset)
+    except Exception as e:
+        print(f"Error loading dataset: {e}")
+        sys.exit(1)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = IVFIndex.build(recommender, clusters_per_type=args.clusters, n_probe=args.n_probe)
+        index.save(index_path)
+        print(f"Built {index.n_clusters} clusters over {index.meta['n_items']} items "
+              f"in {time.perf_counter() - start:.2f}s -> {index_path}")
+        return
+
+    try:
+        index = IVFIndex.load(index_path)
+        index.attach(recommender)
+    except Exception as e:
+        print(f"Error loading index {index_path}: {e}")
+        sys.exit(1)
+
+    queries = sample_queries(recommender, args.queries)
+    rows = recall_report(recommender, index, queries, k=args.k)
+
+    if args.output == "json":
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"Recall@{args.k} vs. QPS over {len(queries)} queries "
+              f"({index.n_clusters} clusters over {len(index.item_types)} item types, "
+              f"{index.meta['n_items']} items)\n")
+        print(f"{'n_probe':>8}  {'recall':>8}  {'qps':>10}  {'speedup':>8}")
+        for row in rows:
+            print(f"{row['n_probe']:>8}  {row['recall']:>8.3f}  {row['qps']:>10.1f}  {row['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Benchmark Suite
+
+This script replays a corpus of realistic tag, question and preference requests through
+FashionRecommender directly and through both FastAPI apps in-process, and reports
+throughput and p50/p95/p99 latency per stage. Results can be stored as a JSON baseline
+and later runs fail when a stage regresses past a configurable threshold:
+
+    python fashion_benchmark.py --save-baseline
+    python fashion_benchmark.py --threshold 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from fashion_recommender import FashionRecommender
+from fashion_questionnaire import FashionQuestionnaire
+
+
+# Get the default paths relative to this script
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATASET = os.path.join(current_dir, "fashion_dataset_updated.csv")
+DEFAULT_PREFERENCES = os.path.join(current_dir, "examples", "sample_preferences.json")
+DEFAULT_BASELINE = os.path.join(current_dir, "benchmark_baseline.json")
+
+# Questions without any known tag, which take the question-similarity fallback
+VAGUE_QUESTIONS = [
+    "What should I wear tonight?",
+    "Help me pick something nice",
+    "What looks good for the weekend?",
+    "I need an outfit for meeting friends"
+]
+
+
+def build_corpus(recommender, n_requests=200, preferences_path=DEFAULT_PREFERENCES, seed=0):
+    """
+    Generate a replayable corpus of tag, question and preference requests
+
+    Tag requests sample tags from catalog rows, questions mix dataset questions with
+    vague ones that hit the fallback path, and preferences start from the sample
+    preferences file and randomize the questionnaire answers.
+
+    Args:
+        recommender (FashionRecommender): Recommender whose dataset is sampled
+        n_requests (int): Number of requests of each kind
+        preferences_path (str): Path to a sample preferences JSON file
+        seed (int): Random seed
+
+    Returns:
+        list: Request dicts with 'kind' and 'payload'
+    """
+    rng = random.Random(seed)
+    questionnaire = FashionQuestionnaire(recommender)
+    tag_lists = recommender.df['Tags'].str.split(',').tolist()
+    questions = recommender.df['QuestionText'].tolist()
+
+    with open(preferences_path, 'r') as f:
+        sample_preferences = json.load(f)
+
+    corpus = []
+    for i in range(n_requests):
+        tags = rng.choice(tag_lists)
+        corpus.append({'kind': 'tags', 'payload': rng.sample(tags, rng.randint(1, min(4, len(tags))))})
+
+        question = rng.choice(VAGUE_QUESTIONS) if i % 10 == 0 else rng.choice(questions)
+        corpus.append({'kind': 'question', 'payload': question})
+
+        if i == 0:
+            preferences = dict(sample_preferences)
+        else:
+            item_types = rng.sample(questionnaire.ITEM_TYPES, rng.randint(1, 4))
+            preferences = {
+                'gender': rng.choice(questionnaire.GENDERS),
+                'item_types': item_types,
+                'style_vibes': rng.sample(questionnaire.STYLES, rng.randint(0, 3)),
+                'favorite_colors': rng.sample(questionnaire.COLORS, rng.randint(0, 5)),
+                'preferred_materials': rng.sample(questionnaire.MATERIALS, rng.randint(0, 3)),
+                'key_occasions': rng.sample(questionnaire.OCCASIONS, rng.randint(0, 3)),
+                'primary_seasons': rng.sample(questionnaire.SEASONS, rng.randint(0, 2)),
+                'specific_occasion': rng.choice(questionnaire.OCCASIONS),
+                'casual_outfit_style': rng.choice(questionnaire.STYLES),
+                'formal_outfit_color': rng.choice(questionnaire.COLORS),
+                'item_specific_preferences': {
+                    item: {'colors': rng.sample(questionnaire.COLORS, rng.randint(0, 3))}
+                    for item in item_types if rng.random() < 0.5
+                }
+            }
+        corpus.append({'kind': 'preferences', 'payload': preferences})
+    return corpus
+
+
+def save_corpus(corpus, path):
+    """Write a corpus as JSONL."""
+    with open(path, 'w') as f:
+        for request in corpus:
+            f.write(json.dumps(request) + "\n")
+
+
+def load_corpus(path):
+    """Read a JSONL corpus written by save_corpus()."""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ASGIReplayer:
+    """Minimal in-process ASGI client that calls an app without any network I/O."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.close()
+
+    def request(self, method, path, payload=None, headers=None):
+        """
+        Send one request through the app
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path, optionally with a query string
+            payload: JSON-serializable request body
+            headers (dict): Extra request headers
+
+        Returns:
+            tuple: (status code, response body bytes)
+        """
+        return self.loop.run_until_complete(self._request(method, path, payload, headers or {}))
+
+    async def _request(self, method, path, payload, headers):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        path, _, query_string = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode('utf-8'),
+            'query_string': query_string.encode('utf-8'),
+            'root_path': '',
+            'headers': [
+                (b'host', b'benchmark'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii'))
+            ] + [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+            'client': ('127.0.0.1', 0),
+            'server': ('benchmark', 80)
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {'status': None, 'body': []}
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return response['status'], b''.join(response['body'])
+
+
+def replay_recommender(recommender, corpus):
+    """
+    Replay a corpus through FashionRecommender directly
+
+    Args:
+        recommender (FashionRecommender): Recommender under test
+        corpus (list): Request dicts
+
+    Returns:
+        dict: Stage name to list of latencies in seconds
+    """
+    timings = {
+        'recommender.tags': [],
+        'recommender.question': [],
+        'recommender.preferences': [],
+        'recommender.format': []
+    }
+    for request in corpus:
+        start = time.perf_counter()
+        if request['kind'] == 'tags':
+            outfits = recommender.get_recommendations_from_tags(request['payload'])
+        elif request['kind'] == 'question':
+            outfits = recommender.get_recommendations_from_question(request['payload'])
+        else:
+            tags = recommender.process_user_preferences(request['payload'])
+            outfits = recommender.get_recommendations_from_tags(tags)
+        timings[f"recommender.{request['kind']}"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        recommender.format_outfit_recommendations(outfits)
+        timings['recommender.format'].append(time.perf_counter() - start)
+    return timings
+
+
+def replay_recommender_api(app, corpus):
+    """
+    Replay a corpus through the recommendation API in-process
+
+    Args:
+        app (FastAPI): The fashion_recommender_api app
+        corpus (list): Request dicts
+
+    Returns:
+        dict: Stage name to list of latencies in seconds
+    """
+    client = ASGIReplayer(app)
+    timings = {'api.tags': [], 'api.question': [], 'api.preferences': []}
+    try:
+        for request in corpus:
+            if request['kind'] == 'tags':
+                path, body = '/recommendations/tags', {'tags': request['payload']}
+            elif request['kind'] == 'question':
+                path, body = '/recommendations/question', {'text': request['payload']}
+            else:
+                path, body = '/recommendations/preferences', {'preferences': request['payload']}
+
+            start = time.perf_counter()
+            status, _ = client.request('POST', path, body)
+            timings[f"api.{request['kind']}"].append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"POST {path} returned {status}")
+    finally:
+        client.close()
+    return timings
+
+
+def replay_questionnaire_api(app, corpus):
+    """
+    Replay the preference requests of a corpus through the questionnaire API in-process
+
+    Args:
+        app (FastAPI): The fashion_questionnaire_api app
+        corpus (list): Request dicts
+
+    Returns:
+        dict: Stage name to list of latencies in seconds
+    """
+    client = ASGIReplayer(app)
+    timings = {'questionnaire_api.preferences': [], 'questionnaire_api.recommendations': []}
+    try:
+        for request in corpus:
+            if request['kind'] != 'preferences':
+                continue
+            for stage, method, path, body in (
+                ('questionnaire_api.preferences', 'POST', '/preferences', request['payload']),
+                ('questionnaire_api.recommendations', 'GET', '/recommendations', None)
+            ):
+                start = time.perf_counter()
+                status, _ = client.request(method, path, body)
+                timings[stage].append(time.perf_counter() - start)
+                if status != 200:
+                    raise RuntimeError(f"{method} {path} returned {status}")
+    finally:
+        client.close()
+    return timings
+
+
+def summarize(timings):
+    """
+    Summarize per-stage latencies
+
+    Args:
+        timings (dict): Stage name to list of latencies in seconds
+
+    Returns:
+        dict: Stage name to count, throughput and p50/p95/p99 in milliseconds
+    """
+    summary = {}
+    for stage, samples in timings.items():
+        if not samples:
+            continue
+        samples_ms = np.asarray(samples) * 1000.0
+        p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+        summary[stage] = {
+            'count': len(samples),
+            'throughput': len(samples) / (samples_ms.sum() / 1000.0),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99)
+        }
+    return summary
+
+
+def find_regressions(summary, baseline, threshold, metrics=('p50_ms', 'p95_ms')):
+    """
+    Compare a summary against a baseline
+
+    Args:
+        summary (dict): Current per-stage summary
+        baseline (dict): Baseline per-stage summary
+        threshold (float): Allowed relative slowdown (0.25 allows 25% slower)
+        metrics (tuple): Latency metrics that are gated
+
+    Returns:
+        list: Human-readable descriptions of every regression
+    """
+    regressions = []
+    for stage, stats in summary.items():
+        if stage not in baseline:
+            continue
+        for metric in metrics:
+            limit = baseline[stage][metric] * (1.0 + threshold)
+            if stats[metric] > limit:
+                regressions.append(f"{stage} {metric}: {stats[metric]:.3f}ms > {limit:.3f}ms "
+                                   f"(baseline {baseline[stage][metric]:.3f}ms + {threshold:.0%})")
+    return regressions
+
+
+def run_benchmark(corpus, recommender, targets=('recommender', 'api', 'questionnaire_api'), warmup=20):
+    """
+    Replay a corpus through the selected targets
+
+    Args:
+        corpus (list): Request dicts
+        recommender (FashionRecommender): Recommender for the direct target
+        targets (tuple): Any of 'recommender', 'api' and 'questionnaire_api'
+        warmup (int): Number of requests replayed before measuring
+
+    Returns:
+        dict: Per-stage summary
+    """
+    timings = {}
+    if 'recommender' in targets:
+        replay_recommender(recommender, corpus[:warmup])
+        timings.update(replay_recommender(recommender, corpus))
+    if 'api' in targets:
+        import fashion_recommender_api
+        fashion_recommender_api.app.state.warmup.wait()
+        replay_recommender_api(fashion_recommender_api.app, corpus[:warmup])
+        timings.update(replay_recommender_api(fashion_recommender_api.app, corpus))
+    if 'questionnaire_api' in targets:
+        import fashion_questionnaire_api
+        fashion_questionnaire_api.app.state.warmup.wait()
+        replay_questionnaire_api(fashion_questionnaire_api.app, corpus[:warmup])
+        timings.update(replay_questionnaire_api(fashion_questionnaire_api.app, corpus))
+    return summarize(timings)
+
+
+def main():
+    """Main function to run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Benchmark Suite")
+    parser.add_argument("--dataset", "-d", default=DEFAULT_DATASET, help="Path to dataset CSV file")
+    parser.add_argument("--corpus", help="Replay this JSONL corpus instead of generating one")
+    parser.add_argument("--write-corpus", help="Write the generated corpus to this JSONL file")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Generated requests of each kind")
+    parser.add_argument("--targets", default="recommender,api,questionnaire_api",
+                       help="Comma-separated targets: recommender, api, questionnaire_api")
+    parser.add_argument("--baseline", "-b", default=DEFAULT_BASELINE, help="Baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", "-t", type=float, default=0.25,
+                       help="Allowed relative slowdown before a stage counts as regressed")
+    parser.add_argument("--metrics", default="p50_ms,p95_ms", help="Comma-separated gated metrics")
+    parser.add_argument("--output", "-o", choices=["json", "text"], default="text",
+                       help="Output format (json or text)")
+
+    args = parser.parse_args()
+
+    recommender = FashionRecommender(args.dataset)
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = build_corpus(recommender, args.requests)
+        if args.write_corpus:
+            save_corpus(corpus, args.write_corpus)
+
+    summary = run_benchmark(corpus, recommender, targets=tuple(args.targets.split(",")))
+
+    if args.output == "json":
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{'stage':<36}{'count':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, stats in summary.items():
+            print(f"{stage:<36}{stats['count']:>7}{stats['throughput']:>10.1f}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'stages': summary
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['stages']
+        regressions = find_regressions(summary, baseline, args.threshold, tuple(args.metrics.split(",")))
+        if regressions:
+            print("\nPerformance regressions:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Fashion Catalog Generator
+
+This script writes synthetic catalogs in the QuestionText,AnswerText,Tags schema of
+fashion_dataset_updated.csv at arbitrary sizes. Tags follow the structure and value
+frequencies of the real file (item, style, color, material, occasion, season,
+descriptive extras, gender), smoothed over the vocabularies of FashionRecommender so
+every known value can appear, and questions reuse the real question templates.
+
+It also runs a scaling report that measures load time, index build time, memory and
+query latency for several catalog sizes:
+
+    python fashion_catalog_generator.py generate --rows 100000 --output catalog_100k.csv
+    python fashion_catalog_generator.py report --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from fashion_recommender import FashionRecommender
+
+
+# Rows generated and written at a time
+CHUNK_SIZE = 100000
+
+# Structured tag fields in the order they appear in a row's Tags
+FIELDS = ['item', 'style', 'color', 'material', 'occasion', 'season']
+
+# Fields substituted into question templates, most specific first
+TEMPLATE_FIELDS = ['item', 'occasion', 'season', 'color', 'style', 'material']
+
+
+def _distribution(counter, vocabulary=()):
+    """
+    Turn value counts into a probability table, adding one to every vocabulary value
+
+    Args:
+        counter (Counter): Observed value counts
+        vocabulary (iterable): Values that must be possible even if never observed
+
+    Returns:
+        tuple: (list of values, np.ndarray of probabilities)
+    """
+    counts = Counter(counter)
+    for value in vocabulary:
+        counts[value] += 1
+    values = sorted(counts)
+    weights = np.array([counts[value] for value in values], dtype=np.float64)
+    return values, weights / weights.sum()
+
+
+class CatalogProfile:
+    """Tag, question and duplication statistics learned from a real catalog."""
+
+    def __init__(self, fields, extras, extra_counts, genders, templates, duplicate_rate):
+        """
+        Initialize the profile
+
+        Args:
+            fields (dict): Field name to (values, probabilities)
+            extras (tuple): Descriptive extra tags and their probabilities
+            extra_counts (tuple): Number of extra tags per row and their probabilities
+            genders (tuple): Gender tag suffixes (comma-joined) and their probabilities
+            templates (tuple): Question templates and their probabilities
+            duplicate_rate (float): Fraction of rows that repeat an earlier item
+        """
+        self.fields = fields
+        self.extras = extras
+        self.extra_counts = extra_counts
+        self.genders = genders
+        self.templates = templates
+        self.duplicate_rate = duplicate_rate
+
+    @classmethod
+    def from_recommender(cls, recommender):
+        """
+        Learn a profile from a recommender's dataset and vocabularies
+
+        Args:
+            recommender (FashionRecommender): Recommender built from the real catalog
+
+        Returns:
+            CatalogProfile: The learned profile
+        """
+        vocabularies = {
+            'item': recommender.item_types,
+            'style': recommender.styles,
+            'color': recommender.colors,
+            'material': recommender.materials,
+            'occasion': recommender.occasions,
+            'season': recommender.seasons
+        }
+        field_counts = {field: Counter() for field in FIELDS}
+        extras, extra_counts, genders, templates = Counter(), Counter(), Counter(), Counter()
+
+        for question, tags in zip(recommender.df['QuestionText'], recommender.df['Tags'].str.split(',')):
+            # Only rows with the full item,style,color,material,occasion,season prefix are used
+            if len(tags) < len(FIELDS) or tags[0] not in vocabularies['item']:
+                continue
+            values = dict(zip(FIELDS, tags))
+            for field, value in values.items():
+                field_counts[field][value] += 1
+
+            rest = tags[len(FIELDS):]
+            gender = [tag for tag in rest if tag in ('men', 'women')]
+            extra = [tag for tag in rest if tag not in ('men', 'women')]
+            genders[','.join(gender)] += 1
+            extra_counts[len(extra)] += 1
+            extras.update(extra)
+            templates[cls._template(question, values)] += 1
+
+        n_rows = len(recommender.df)
+        return cls(
+            fields={field: _distribution(field_counts[field], vocabularies[field]) for field in FIELDS},
+            extras=_distribution(extras),
+            extra_counts=_distribution(extra_counts),
+            genders=_distribution(genders),
+            templates=_distribution(templates),
+            duplicate_rate=1.0 - recommender.df['AnswerText'].nunique() / n_rows if n_rows else 0.0
+        )
+
+    @staticmethod
+    def _template(question, values):
+        """Replace the row's field values in a question with {field} placeholders."""
+        template = question.replace('{', '{{').replace('}', '}}')
+        for field in TEMPLATE_FIELDS:
+            template = re.sub(rf'\b{re.escape(values[field])}\b', '{' + field + '}', template, count=1)
+        return template
+
+    def to_dict(self):
+        """Serialize the profile to JSON-compatible data."""
+        def table(distribution):
+            values, probabilities = distribution
+            return {'values': list(values), 'probabilities': probabilities.tolist()}
+        return {
+            'fields': {field: table(distribution) for field, distribution in self.fields.items()},
+            'extras': table(self.extras),
+            'extra_counts': table(self.extra_counts),
+            'genders': table(self.genders),
+            'templates': table(self.templates),
+            'duplicate_rate': self.duplicate_rate
+        }
+
+    def generate(self, n_rows, seed=0, chunk_size=CHUNK_SIZE):
+        """
+        Generate catalog rows chunk by chunk
+
+        Args:
+            n_rows (int): Total number of rows
+            seed (int): Random seed
+            chunk_size (int): Rows per yielded chunk
+
+        Yields:
+            pd.DataFrame: Chunks with QuestionText, AnswerText and Tags columns
+        """
+        rng = np.random.default_rng(seed)
+        for first in range(0, n_rows, chunk_size):
+            yield self._generate_chunk(rng, first, min(chunk_size, n_rows - first))
+
+    def _sample(self, rng, distribution, size):
+        values, probabilities = distribution
+        return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=probabilities)]
+
+    def _generate_chunk(self, rng, first, size):
+        columns = {field: self._sample(rng, self.fields[field], size) for field in FIELDS}
+        genders = self._sample(rng, self.genders, size)
+        n_extras = self._sample(rng, self.extra_counts, size).astype(np.int64)
+        extra_tags = self._sample(rng, self.extras, int(n_extras.sum()))
+        extra_bounds = np.concatenate([[0], np.cumsum(n_extras)])
+        sku = np.arange(first, first + size)
+
+        # Duplicate rows repeat the item of another, original row of the same chunk
+        duplicates = rng.random(size) < self.duplicate_rate
+        duplicates[0] = False
+        originals = np.flatnonzero(~duplicates)
+        source = np.arange(size)
+        source[duplicates] = originals[rng.integers(0, len(originals), int(duplicates.sum()))]
+
+        tags, answers = [], []
+        for row in range(size):
+            src = source[row]
+            row_tags = [columns[field][src] for field in FIELDS]
+            row_tags.extend(extra_tags[extra_bounds[src]:extra_bounds[src + 1]])
+            if genders[src]:
+                row_tags.append(genders[src])
+            tags.append(','.join(row_tags))
+            answers.append(f"{columns['style'][src]} {columns['color'][src]} "
+                           f"{columns['material'][src]} {columns['item'][src]} #{sku[src]}")
+
+        templates = self._sample(rng, self.templates, size)
+        questions = [
+            template.format(**{field: columns[field][source[row]] for field in FIELDS})
+            for row, template in enumerate(templates)
+        ]
+        return pd.DataFrame({'QuestionText': questions, 'AnswerText': answers, 'Tags': tags})
+
+
+def generate_catalog(profile, n_rows, output_path, seed=0):
+    """
+    Write a synthetic catalog CSV
+
+    Args:
+        profile (CatalogProfile): Learned catalog profile
+        n_rows (int): Number of rows
+        output_path (str): Destination CSV path
+        seed (int): Random seed
+    """
+    with open(output_path, 'w', newline='') as f:
+        for position, chunk in enumerate(profile.generate(n_rows, seed=seed)):
+            chunk.to_csv(f, index=False, header=position == 0)
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def scaling_report(profile, sizes, n_queries=200, with_ann=False, seed=0):
+    """
+    Measure load, index build, memory and query latency at several catalog sizes
+
+    Args:
+        profile (CatalogProfile): Learned catalog profile
+        sizes (list): Catalog sizes in rows
+        n_queries (int): Number of timed tag queries per size
+        with_ann (bool): Also build and query the IVF index
+        seed (int): Random seed
+
+    Returns:
+        list: One dict of measurements per size
+    """
+    from fashion_ann_index import IVFIndex, sample_queries
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"catalog_{size}.csv")
+            start = time.perf_counter()
+            generate_catalog(profile, size, path, seed=seed)
+            row = {'rows': size, 'generate_s': time.perf_counter() - start,
+                   'file_mb': os.path.getsize(path) / 1e6}
+
+            start = time.perf_counter()
+            pd.read_csv(path)
+            row['load_s'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            recommender = FashionRecommender(path)
+            row['index_s'] = max(0.0, time.perf_counter() - start - row['load_s'])
+            matrix = recommender.tag_matrix
+            row['dataframe_mb'] = recommender.df.memory_usage(deep=True).sum() / 1e6
+            row['matrix_mb'] = (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1e6
+
+            queries = sample_queries(recommender, n_queries, seed=seed)
+            latencies = []
+            for tags in queries:
+                start = time.perf_counter()
+                recommender.get_recommendations_from_tags(tags, seed=0)
+                latencies.append(time.perf_counter() - start)
+            row['query_p50_ms'], row['query_p95_ms'] = (np.percentile(latencies, [50, 95]) * 1000).tolist()
+
+            if with_ann:
+                start = time.perf_counter()
+                recommender.ann_index = IVFIndex.build(recommender)
+                row['ann_build_s'] = time.perf_counter() - start
+                latencies = []
+                for tags in queries:
+                    start = time.perf_counter()
+                    recommender.get_recommendations_from_tags(tags, seed=0)
+                    latencies.append(time.perf_counter() - start)
+                row['ann_query_p50_ms'] = float(np.percentile(latencies, 50) * 1000)
+
+            row['peak_rss_mb'] = _peak_rss_mb()
+            rows.append(row)
+            del recommender
+            os.remove(path)
+    return rows
+
+
+def plot_report(rows, output_path):
+    """
+    Plot the scaling curves of a report on log-log axes
+
+    Args:
+        rows (list): Output of scaling_report()
+        output_path (str): Destination image path
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    sizes = [row['rows'] for row in rows]
+    fig, (time_ax, latency_ax) = plt.subplots(1, 2, figsize=(11, 4))
+    for key, label in (('load_s', 'CSV load'), ('index_s', 'Index build'), ('ann_build_s', 'IVF build')):
+        if key in rows[0]:
+            time_ax.plot(sizes, [row[key] for row in rows], marker='o', label=label)
+    time_ax.set(xscale='log', yscale='log', xlabel='Catalog rows', ylabel='Seconds', title='Startup')
+    time_ax.legend()
+
+    for key, label in (('query_p50_ms', 'Exact p50'), ('query_p95_ms', 'Exact p95'), ('ann_query_p50_ms', 'IVF p50')):
+        if key in rows[0]:
+            latency_ax.plot(sizes, [row[key] for row in rows], marker='o', label=label)
+    latency_ax.set(xscale='log', yscale='log', xlabel='Catalog rows', ylabel='Milliseconds', title='Query latency')
+    latency_ax.legend()
+
+    fig.tight_layout()
+    fig.savefig(output_path)
+
+
+def main():
+    """Main function to generate synthetic catalogs or run the scaling report."""
+    parser = argparse.ArgumentParser(description="Fashion Catalog Generator")
+    parser.add_argument("command", choices=["generate", "profile", "report"],
+                       help="Write a catalog, print the learned profile, or run the scaling report")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv",
+                       help="Path to the real dataset CSV the profile is learned from")
+    parser.add_argument("--rows", "-r", type=int, default=100000, help="Number of rows to generate")
+    parser.add_argument("--output", "-o", help="Output CSV path for generate (defaults to catalog_<rows>.csv)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated catalog sizes for report")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per size for report")
+    parser.add_argument("--ann", action="store_true", help="Include IVF index build and query times in report")
+    parser.add_argument("--plot", help="Save report curves to this image file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args()
+
+    try:
+        profile = CatalogProfile.from_recommender(FashionRecommender(args.dataset))
+    except Exception as e:
+        print(f"Error loading dataset: {e}")
+        sys.exit(1)
+
+    if args.command == "profile":
+        print(json.dumps(profile.to_dict(), indent=2))
+    elif args.command == "generate":
+        output_path = args.output or f"catalog_{args.rows}.csv"
+        start = time.perf_counter()
+        generate_catalog(profile, args.rows, output_path, seed=args.seed)
+        print(f"Wrote {args.rows} rows to {output_path} in {time.perf_counter() - start:.2f}s")
+    else:
+        rows = scaling_report(profile, [int(size) for size in args.sizes.split(",")],
+                              n_queries=args.queries, with_ann=args.ann, seed=args.seed)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            columns = ['rows', 'file_mb', 'load_s', 'index_s', 'dataframe_mb', 'matrix_mb',
+                       'query_p50_ms', 'query_p95_ms', 'ann_build_s', 'ann_query_p50_ms', 'peak_rss_mb']
+            columns = [column for column in columns if column in rows[0]]
+            print("".join(f"{column:>17}" for column in columns))
+            for row in rows:
+                print("".join(f"{row[column]:>17.3f}" if isinstance(row[column], float) else f"{row[column]:>17}"
+                              for column in columns))
+        if args.plot:
+            plot_report(rows, args.plot)
+            print(f"\nSaved scaling curves to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
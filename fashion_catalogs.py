@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Catalog Registry
+
+Each API process serves the dataset it was started with, plus any number of
+additional catalogs (per region, season, ...) registered by id. Requests pick one with
+the `catalog` query parameter of the recommendation routes. A catalog's recommender is
+built the first time it is requested; concurrent first requests wait for the same
+build instead of starting their own.
+
+Loaded catalogs count their index memory against a budget. When a load takes the
+total over the budget, the least recently used catalogs are dropped until it fits
+again; they are rebuilt on their next request. Requests still using a dropped
+recommender finish with it undisturbed.
+
+Catalogs are configured through the environment of the API process:
+
+    FASHION_CATALOGS=eu-summer=catalogs/eu_summer.parquet,us-winter=catalogs/us_winter.csv
+    FASHION_CATALOG_BUDGET_MB=2048
+
+Per-catalog state is listed by GET /catalogs, and loads, hits and evictions are
+exported on /metrics.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+from fashion_metrics import REGISTRY
+
+CATALOG_LOADS = REGISTRY.counter(
+    'fashion_catalog_loads_total', 'Catalog recommender builds by outcome (ok or error)', ['app', 'catalog', 'outcome'])
+CATALOG_LOAD_SECONDS = REGISTRY.histogram(
+    'fashion_catalog_load_seconds', 'Time taken to build a catalog recommender', ['app', 'catalog'])
+CATALOG_REQUESTS = REGISTRY.counter(
+    'fashion_catalog_requests_total', 'Catalog lookups by result (hit, miss or shared when waiting for a running build)',
+    ['app', 'catalog', 'result'])
+CATALOG_EVICTIONS = REGISTRY.counter(
+    'fashion_catalog_evictions_total', 'Catalogs dropped to stay within the memory budget', ['app', 'catalog'])
+CATALOG_BYTES = REGISTRY.gauge(
+    'fashion_catalog_bytes', 'Index memory of loaded catalogs', ['app', 'catalog'])
+
+
+def recommender_bytes(recommender):
+    """
+    Get the memory a recommender's index holds
+
+    Args:
+        recommender (FashionRecommender): Built recommender
+
+    Returns:
+        int: Bytes reported by memory_report()
+    """
+    return recommender.memory_report()['total_bytes']
+
+
+class _Build:
+    """A catalog build in progress that concurrent requests wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.recommender = None
+        self.error = None
+
+
+class CatalogRegistry:
+    """Catalogs by id, built on first use and evicted least recently used first."""
+
+    def __init__(self, catalogs, app_name, memory_budget=None, build=None, sizeof=recommender_bytes):
+        """
+        Initialize the registry; nothing is loaded until it is requested
+
+        Args:
+            catalogs (dict): Mapping of catalog id to dataset path
+            app_name (str): Value of the 'app' label of the catalog metrics
+            memory_budget (int): Bytes the loaded catalogs may hold together (None for no limit);
+                the most recently loaded catalog is kept even if it alone exceeds it
+            build (callable): Builds a recommender from a dataset path
+                (defaults to fashion_startup.default_build())
+            sizeof (callable): Bytes a built recommender counts against the budget
+        """
+        self.catalogs = dict(catalogs)
+        self.app_name = app_name
+        self.memory_budget = memory_budget
+        self.build = build
+        self.sizeof = sizeof
+        # Loaded catalogs as id -> (recommender, bytes), least recently used first
+        self._loaded = collections.OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._stats = {catalog_id: {'loads': 0, 'load_errors': 0, 'load_seconds': None, 'hits': 0, 'misses': 0,
+                                    'shared': 0, 'evictions': 0}
+                       for catalog_id in self.catalogs}
+        for catalog_id in self.catalogs:
+            CATALOG_BYTES.set_function(lambda catalog_id=catalog_id: self.loaded_bytes(catalog_id),
+                                       app=app_name, catalog=catalog_id)
+
+    def __contains__(self, catalog_id):
+        return catalog_id in self.catalogs
+
+    def loaded_bytes(self, catalog_id=None):
+        """
+        Get the memory held by loaded catalogs
+
+        Args:
+            catalog_id (str): Catalog to report (defaults to all of them)
+
+        Returns:
+            int: Bytes counted against the budget
+        """
+        with self._lock:
+            if catalog_id is None:
+                return sum(size for _, size in self._loaded.values())
+            return self._loaded[catalog_id][1] if catalog_id in self._loaded else 0
+
+    def get(self, catalog_id):
+        """
+        Get the recommender of a catalog, building it if it is not loaded
+
+        Blocks until the build finishes; call it from a worker thread.
+
+        Args:
+            catalog_id (str): Registered catalog id
+
+        Returns:
+            FashionRecommender: The catalog's recommender
+        """
+        if catalog_id not in self.catalogs:
+            raise KeyError(f"Unknown catalog: {catalog_id}")
+
+        with self._lock:
+            stats = self._stats[catalog_id]
+            loaded = self._loaded.get(catalog_id)
+            if loaded is not None:
+                self._loaded.move_to_end(catalog_id)
+                stats['hits'] += 1
+                result = 'hit'
+            else:
+                build = self._building.get(catalog_id)
+                owner = build is None
+                if owner:
+                    build = self._building[catalog_id] = _Build()
+                    stats['misses'] += 1
+                    result = 'miss'
+                else:
+                    stats['shared'] += 1
+                    result = 'shared'
+        CATALOG_REQUESTS.inc(app=self.app_name, catalog=catalog_id, result=result)
+        if loaded is not None:
+            return loaded[0]
+
+        if owner:
+            self._load(catalog_id, build)
+        build.done.wait()
+        if build.error is not None:
+            raise RuntimeError(f"Catalog {catalog_id} failed to load") from build.error
+        return build.recommender
+
+    def _load(self, catalog_id, build):
+        """Build a catalog, publish it to the waiting requests and enforce the budget."""
+        start = time.perf_counter()
+        try:
+            if self.build is None:
+                from fashion_startup import default_build
+                self.build = default_build()
+            recommender = self.build(self.catalogs[catalog_id])
+            size = self.sizeof(recommender)
+        except Exception as e:
+            build.error = e
+            with self._lock:
+                self._stats[catalog_id]['load_errors'] += 1
+                # Not cached, so the next request tries again
+                del self._building[catalog_id]
+            CATALOG_LOADS.inc(app=self.app_name, catalog=catalog_id, outcome='error')
+            build.done.set()
+            return
+
+        seconds = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[catalog_id]
+            stats['loads'] += 1
+            stats['load_seconds'] = seconds
+            self._loaded[catalog_id] = (recommender, size)
+            del self._building[catalog_id]
+            evicted = self._evict(keep=catalog_id)
+        build.recommender = recommender
+        build.done.set()
+
+        CATALOG_LOADS.inc(app=self.app_name, catalog=catalog_id, outcome='ok')
+        CATALOG_LOAD_SECONDS.observe(seconds, app=self.app_name, catalog=catalog_id)
+        print(f"{self.app_name} loaded catalog {catalog_id} in {seconds:.2f}s ({size / 2**20:.1f} MiB)",
+              file=sys.stderr)
+        for evicted_id in evicted:
+            CATALOG_EVICTIONS.inc(app=self.app_name, catalog=evicted_id)
+            print(f"{self.app_name} evicted catalog {evicted_id} to stay within the memory budget", file=sys.stderr)
+
+    def _evict(self, keep):
+        """Drop least recently used catalogs until the budget is met; call with the lock held."""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        total = sum(size for _, size in self._loaded.values())
+        for catalog_id in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if catalog_id == keep:
+                continue
+            total -= self._loaded.pop(catalog_id)[1]
+            self._stats[catalog_id]['evictions'] += 1
+            evicted.append(catalog_id)
+        return evicted
+
+    def status(self):
+        """
+        Describe every registered catalog for GET /catalogs
+
+        Returns:
+            dict: Budget, bytes in use and per-catalog state and counters
+        """
+        with self._lock:
+            catalogs = {}
+            for catalog_id, path in self.catalogs.items():
+                loaded = self._loaded.get(catalog_id)
+                state = 'loaded' if loaded is not None else 'loading' if catalog_id in self._building else 'unloaded'
+                catalogs[catalog_id] = dict(self._stats[catalog_id], dataset=path, state=state,
+                                            bytes=loaded[1] if loaded is not None else 0)
+            return {
+                'memory_budget_bytes': self.memory_budget,
+                'loaded_bytes': sum(size for _, size in self._loaded.values()),
+                # Least recently used first, i.e. in eviction order
+                'lru': list(self._loaded),
+                'catalogs': catalogs
+            }
+
+
+def catalogs_from_env():
+    """
+    Get the catalogs configured by FASHION_CATALOGS
+
+    Returns:
+        dict: Mapping of catalog id to dataset path
+    """
+    catalogs = {}
+    for entry in os.environ.get('FASHION_CATALOGS', '').split(','):
+        if entry.strip():
+            catalog_id, path = entry.split('=', 1)
+            catalogs[catalog_id.strip()] = path.strip()
+    return catalogs
+
+
+def memory_budget_from_env():
+    """Catalog memory budget in bytes configured by FASHION_CATALOG_BUDGET_MB (default unlimited)."""
+    budget_mb = os.environ.get('FASHION_CATALOG_BUDGET_MB')
+    return int(float(budget_mb) * 2**20) if budget_mb else None
+
+
+def install_catalogs(app, app_name, registry=None):
+    """
+    Attach a catalog registry to an app and add GET /catalogs
+
+    Args:
+        app (FastAPI): The app to extend
+        app_name (str): Value of the 'app' label of the catalog metrics
+        registry (CatalogRegistry): Registry to serve (defaults to the catalogs and
+            budget configured by FASHION_CATALOGS and FASHION_CATALOG_BUDGET_MB)
+    """
+    if registry is None:
+        registry = CatalogRegistry(catalogs_from_env(), app_name, memory_budget=memory_budget_from_env())
+    app.state.catalogs = registry
+
+    @app.get("/catalogs", tags=["Catalogs"])
+    def list_catalogs():
+        """Registered catalogs with their load state, memory and load/hit/eviction counters."""
+        return registry.status()
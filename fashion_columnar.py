@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Columnar Catalogs
+
+Parsing the CSV dataset is a large part of startup, and it grows with the catalog.
+This module converts the CSV into Parquet or Feather (Arrow IPC) files that
+FashionRecommender loads directly, reading only the catalog columns. The Tags column
+is stored pre-tokenized as a list of dictionary-encoded tags, so the TF-IDF matrix and
+the item type postings are built from the few distinct tags of the dictionary instead
+of by tokenizing every row again; the result is identical to building from the CSV.
+
+    python fashion_columnar.py convert --dataset fashion_dataset_updated.csv --format parquet
+    python fashion_columnar.py benchmark --sizes 10000,100000,1000000
+
+Requires pyarrow.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv
+import pyarrow.feather
+import pyarrow.parquet
+
+from fashion_recommender import CATALOG_COLUMNS, FashionRecommender
+
+# File formats of the columnar extensions FashionRecommender recognizes
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def convert_csv(csv_path, output_path, compression='zstd'):
+    """
+    Convert a catalog CSV into a Parquet or Feather file with pre-tokenized tags
+
+    Args:
+        csv_path (str): Path to the catalog CSV
+        output_path (str): Destination path; the format follows its extension
+        compression (str): Compression codec of the file
+
+    Returns:
+        int: Number of rows written
+    """
+    table = pyarrow.csv.read_csv(csv_path, convert_options=pyarrow.csv.ConvertOptions(
+        include_columns=CATALOG_COLUMNS, column_types={column: pa.string() for column in CATALOG_COLUMNS}))
+
+    # Split every Tags string on commas and dictionary-encode the individual tags
+    tags = pc.split_pattern(table.column('Tags').combine_chunks(), ',')
+    tokens = pa.ListArray.from_arrays(tags.offsets, pc.dictionary_encode(tags.flatten()), mask=tags.is_null())
+    table = table.set_column(CATALOG_COLUMNS.index('Tags'), 'Tags', tokens)
+
+    if COLUMNAR_FORMATS[os.path.splitext(output_path)[1].lower()] == 'parquet':
+        pyarrow.parquet.write_table(table, output_path, compression=compression)
+    else:
+        pyarrow.feather.write_feather(table, output_path, compression=compression)
+    return table.num_rows
+
+
+def _tag_codes(column):
+    """
+    Get the tag codes of a pre-tokenized Tags column
+
+    Row groups of a file may carry different dictionaries, so every chunk's codes are
+    mapped onto one dictionary shared by the whole column.
+
+    Args:
+        column (pa.ChunkedArray): list<dictionary<string>> Tags column
+
+    Returns:
+        tuple: (row pointers, tag codes, list of distinct tags)
+    """
+    dictionary = {}
+    lengths, codes = [], []
+    for chunk in column.chunks:
+        values = chunk.flatten()
+        mapping = np.array([dictionary.setdefault(tag, len(dictionary))
+                            for tag in values.dictionary.to_pylist()], dtype=np.int32)
+        codes.append(mapping[values.indices.to_numpy(zero_copy_only=False)])
+        lengths.append(pc.list_value_length(chunk).fill_null(0).to_numpy(zero_copy_only=False))
+    indptr = np.concatenate([[0], np.cumsum(np.concatenate(lengths or [[]]))]).astype(np.int64)
+    return indptr, np.concatenate(codes or [np.empty(0, dtype=np.int32)]), list(dictionary)
+
+
+class TagCodes:
+    """Pre-tokenized Tags column: the tag codes of every row over a tag dictionary."""
+
+    def __init__(self, indptr, codes, dictionary):
+        """
+        Build the row-by-tag matrix
+
+        Args:
+            indptr (np.ndarray): Start of every row's codes, plus the total length
+            codes (np.ndarray): Tag codes of all rows in their original order, concatenated
+            dictionary (list): Distinct tags; tag i has code i
+        """
+        from scipy.sparse import csr_matrix
+
+        self.indptr = indptr
+        self.codes = codes
+        self.dictionary = dictionary
+        self.matrix = csr_matrix((np.ones(len(codes), dtype=np.int64), codes, indptr),
+                                 shape=(len(indptr) - 1, len(dictionary)))
+
+    def rows_matching(self, substring):
+        """
+        Get the rows whose Tags string contains a substring without commas
+
+        Args:
+            substring (str): Text to look for
+
+        Returns:
+            np.ndarray: Sorted row ids
+        """
+        matching = np.array([substring in tag for tag in self.dictionary], dtype=np.int64)
+        return np.flatnonzero(self.matrix @ matching)
+
+    def fit_tfidf(self):
+        """
+        Fit a TF-IDF vectorizer equivalent to TfidfVectorizer().fit_transform(tags)
+
+        Only the distinct tags are tokenized. The term counts of every row are laid out
+        exactly like CountVectorizer's, so the row norms and therefore the weights match
+        the CSV build bit for bit.
+
+        Returns:
+            tuple: (fitted TfidfVectorizer, TF-IDF tag matrix)
+        """
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+        analyzer = TfidfVectorizer().build_analyzer()
+        tag_terms = [analyzer(tag) for tag in self.dictionary]
+        used = np.bincount(self.codes, minlength=len(self.dictionary)) > 0
+        vocabulary = {term: column for column, term in enumerate(sorted(
+            {term for code, terms in enumerate(tag_terms) if used[code] for term in terms}))}
+
+        # Term columns of every tag, as a ragged array indexed by tag code
+        n_terms = np.array([len(terms) for terms in tag_terms], dtype=np.int64)
+        term_starts = np.concatenate([[0], np.cumsum(n_terms)[:-1]]).astype(np.int64)
+        term_columns = np.array([vocabulary.get(term, -1) for terms in tag_terms for term in terms], dtype=np.int64)
+
+        # Expand every row's tags into its term sequence
+        lengths = n_terms[self.codes]
+        first_term = np.repeat(term_starts[self.codes] - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        columns = term_columns[first_term + np.arange(lengths.sum())]
+        n_rows = len(self.indptr) - 1
+        rows = np.repeat(np.repeat(np.arange(n_rows), np.diff(self.indptr)), lengths)
+
+        # CountVectorizer numbers terms in order of first occurrence in the corpus and sorts
+        # every row by that number before renumbering alphabetically; do the same
+        n_vocabulary = len(vocabulary)
+        first_seen = np.full(n_vocabulary, len(columns), dtype=np.int64)
+        np.minimum.at(first_seen, columns, np.arange(len(columns)))
+        seen_order = np.argsort(first_seen, kind='stable')
+        rank = np.empty(n_vocabulary, dtype=np.int64)
+        rank[seen_order] = np.arange(n_vocabulary)
+
+        keys, counts = np.unique(rows * n_vocabulary + rank[columns], return_counts=True)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(keys // n_vocabulary, minlength=n_rows))])
+        counts = csr_matrix((counts.astype(np.float64), seen_order[keys % n_vocabulary], indptr),
+                            shape=(n_rows, n_vocabulary))
+
+        transformer = TfidfTransformer().fit(counts)
+        vectorizer = TfidfVectorizer(vocabulary=vocabulary)
+        vectorizer.idf_ = transformer.idf_
+        return vectorizer, transformer.transform(counts)
+
+
+def read_columnar(dataset_path, rows=None):
+    """
+    Read the catalog columns of a Parquet or Feather file
+
+    Args:
+        dataset_path (str): Path to the file
+        rows (np.ndarray): Optional sorted row ids to keep
+
+    Returns:
+        tuple: (pd.DataFrame with the catalog columns, TagCodes of its rows)
+    """
+    if COLUMNAR_FORMATS[os.path.splitext(dataset_path)[1].lower()] == 'parquet':
+        table = pyarrow.parquet.read_table(dataset_path, columns=CATALOG_COLUMNS)
+    else:
+        table = pyarrow.feather.read_table(dataset_path, columns=CATALOG_COLUMNS, memory_map=True)
+    if rows is not None:
+        table = table.take(pa.array(rows, type=pa.int64()))
+
+    tag_codes = TagCodes(*_tag_codes(table.column('Tags')))
+    # Joining the tags again restores the original strings exactly
+    tags = pc.binary_join(table.column('Tags').cast(pa.list_(pa.string())), ',')
+    df = table.set_column(CATALOG_COLUMNS.index('Tags'), 'Tags', tags).to_pandas()
+    return df, tag_codes
+
+
+def load_benchmark(profile, sizes, formats=('csv', 'parquet', 'feather'), seed=0):
+    """
+    Measure catalog read and index build times per file format at several sizes
+
+    Args:
+        profile (CatalogProfile): Learned catalog profile of the synthetic catalogs
+        sizes (list): Catalog sizes in rows
+        formats (tuple): File formats to compare
+        seed (int): Random seed
+
+    Returns:
+        list: One dict of measurements per size and format
+    """
+    from fashion_catalog_generator import generate_catalog
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            csv_path = os.path.join(tmp_dir, f"catalog_{size}.csv")
+            generate_catalog(profile, size, csv_path, seed=seed)
+            for file_format in formats:
+                path = os.path.splitext(csv_path)[0] + '.' + file_format
+                if file_format != 'csv':
+                    convert_csv(csv_path, path)
+                start = time.perf_counter()
+                recommender = FashionRecommender(path)
+                results.append({'rows': size, 'format': file_format, 'file_mb': os.path.getsize(path) / 1e6,
+                                'load_s': time.perf_counter() - start})
+                del recommender
+                if file_format != 'csv':
+                    os.remove(path)
+            os.remove(csv_path)
+    return results
+
+
+def main():
+    """Main function to convert a catalog or benchmark its load time per format."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Columnar Catalogs")
+    parser.add_argument("command", choices=["convert", "benchmark"],
+                       help="Convert the CSV dataset or compare load times per format")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv", help="Path to dataset CSV file")
+    parser.add_argument("--format", "-f", choices=["parquet", "feather"], default="parquet",
+                       help="Output format of convert")
+    parser.add_argument("--output", "-o", help="Output path of convert (defaults to the dataset with the "
+                                               "format's extension)")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated catalog sizes for benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        output_path = args.output or os.path.splitext(args.dataset)[0] + '.' + args.format
+        start = time.perf_counter()
+        n_rows = convert_csv(args.dataset, output_path)
+        print(f"Wrote {n_rows} rows to {output_path} ({os.path.getsize(output_path) / 1e6:.2f} MB) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return
+
+    from fashion_catalog_generator import CatalogProfile
+
+    try:
+        profile = CatalogProfile.from_recommender(FashionRecommender(args.dataset))
+    except Exception as e:
+        print(f"Error loading dataset: {e}")
+        sys.exit(1)
+
+    results = load_benchmark(profile, [int(size) for size in args.sizes.split(",")], seed=args.seed)
+    print(f"{'rows':>10}{'format':>10}{'file_mb':>10}{'load_s':>10}{'speedup':>10}")
+    csv_times = {row['rows']: row['load_s'] for row in results if row['format'] == 'csv'}
+    for row in results:
+        print(f"{row['rows']:>10}{row['format']:>10}{row['file_mb']:>10.2f}{row['load_s']:>10.3f}"
+              f"{csv_times[row['rows']] / row['load_s']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
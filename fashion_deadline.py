@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Deadlines
+
+Callers with a hard latency budget would rather get a cheaper answer than a late one.
+A request may carry a deadline; the recommender then checks before each expensive
+step whether its recent cost still fits into the time left and, if it does not, takes
+a cheaper route and records what it gave up:
+
+    depth               fewer candidates per item type (a shallower cached ranking,
+                        or fewer items built into candidates)
+    question_fallback   no closest-question search for questions without known tags
+    scoring             no live scoring when it cannot finish in time
+
+Degraded responses have fewer or no outfits instead of arriving late; the names of
+the degraded steps are returned with them.
+
+Step costs are learned from the requests themselves. The first run of a step pays for
+lazy imports and cold caches, so it is not taken as its cost. A skipped step is folded
+into its average as if it took no time: the estimate drifts down until a request runs
+the step again and measures it, so one slow period never disables a step for good.
+"""
+import threading
+import time
+
+from fashion_metrics import REGISTRY, annotate
+
+DEGRADED = REGISTRY.counter(
+    'fashion_deadline_degraded_total', 'Pipeline steps cut short or skipped to meet a request deadline', ['step'])
+
+
+class Deadline:
+    """Time budget of one request and the steps degraded to meet it."""
+
+    def __init__(self, deadline_ms, degraded=None):
+        """
+        Start the budget now
+
+        Args:
+            deadline_ms (float): Budget in milliseconds
+            degraded (list): List collecting the names of degraded steps (a new one if None)
+        """
+        self.expires = time.perf_counter() + deadline_ms / 1000.0
+        self.degraded = degraded if degraded is not None else []
+
+    def remaining(self):
+        """Seconds left before the deadline (negative once it passed)."""
+        return self.expires - time.perf_counter()
+
+    def allows(self, seconds):
+        """Whether a step expected to take the given time finishes before the deadline."""
+        return seconds <= self.remaining()
+
+    def degrade(self, step):
+        """
+        Record that a step was cut short or skipped
+
+        Args:
+            step (str): Name of the step
+        """
+        if step not in self.degraded:
+            self.degraded.append(step)
+            DEGRADED.inc(step=step)
+            annotate(degraded=list(self.degraded))
+
+
+class StageCosts:
+    """Exponentially weighted moving averages of recent step durations."""
+
+    def __init__(self, weight=0.1, cold_samples=1):
+        """
+        Args:
+            weight (float): Weight of the newest observation
+            cold_samples (int): First observations of every step that are ignored
+        """
+        self.weight = weight
+        self.cold_samples = cold_samples
+        self._costs = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, step, seconds):
+        """Fold a measured duration of a step into its average."""
+        with self._lock:
+            samples = self._samples.get(step, 0) + 1
+            self._samples[step] = samples
+            if samples <= self.cold_samples:
+                return
+            cost = self._costs.get(step)
+            self._costs[step] = seconds if cost is None else cost + self.weight * (seconds - cost)
+
+    def skipped(self, step):
+        """Fold a skipped run of a step into its average as if it took no time."""
+        with self._lock:
+            cost = self._costs.get(step)
+            if cost is not None:
+                self._costs[step] = cost - self.weight * cost
+
+    def estimate(self, step, default=0.0):
+        """
+        Get the expected duration of a step
+
+        Args:
+            step (str): Name of the step
+            default (float): Value for steps that were never measured
+
+        Returns:
+            float: Expected seconds
+        """
+        return self._costs.get(step, default)
+
+    def snapshot(self):
+        """Current averages by step in seconds."""
+        with self._lock:
+            return dict(self._costs)
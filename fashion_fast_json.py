@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Fast JSON Responses
+
+For small payloads, FastAPI's response_model validation and JSON encoding of the
+formatted outfits take longer than scoring them. This module provides an opt-in
+response path: the JSON string of every catalog item is encoded once when the index
+is built, and recommendation responses are assembled by concatenating those
+fragments into bytes that are returned as they are, without validation.
+
+The bytes are identical to what FastAPI produces for RecommendationResponse and
+RecommendationsResponse (compact separators, non-ASCII characters unescaped), which
+tests/test_fast_json.py checks against the installed FastAPI version.
+
+Enable it with FASHION_FAST_JSON=1 in the environment of the API process.
+"""
+import json
+
+from fashion_metrics import stage
+
+# Encoded JSON keys of the outfit categories, in the order outfits list them
+_CATEGORY_KEYS = {category: json.dumps(category).encode('utf-8')
+                  for category in ('topwear', 'bottomwear', 'footwear', 'accessory')}
+
+
+def encode_fragment(value):
+    """
+    Encode a value as compact JSON bytes like FastAPI's JSONResponse does
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode('utf-8')
+
+
+def encode_item_fragments(items):
+    """
+    Encode the JSON string of every distinct item once
+
+    Args:
+        items (iterable): Item descriptions (AnswerText)
+
+    Returns:
+        dict: Mapping of item description to its encoded JSON string
+    """
+    return {item: encode_fragment(item) for item in dict.fromkeys(items)}
+
+
+def outfits_json(outfits, item_json):
+    """
+    Assemble the JSON array of formatted outfits from pre-encoded item fragments
+
+    Produces the same bytes as encoding format_outfit_recommendations(outfits).
+
+    Args:
+        outfits (list): Outfit dictionaries from the recommender
+        item_json (dict): Item fragments from encode_item_fragments()
+
+    Returns:
+        bytes: JSON array of outfits
+    """
+    encoded = []
+    for number, outfit in enumerate(outfits, 1):
+        components = b','.join(
+            (_CATEGORY_KEYS.get(category) or encode_fragment(category))
+            + b':' + (item_json.get(item['item']) or encode_fragment(item['item']))
+            for category, item in outfit.items() if item
+        )
+        item_ids = b','.join(
+            (_CATEGORY_KEYS.get(category) or encode_fragment(category)) + b':%d' % item['row']
+            for category, item in outfit.items() if item and 'row' in item
+        )
+        if item_ids:
+            encoded.append(b'{"outfit_number":%d,"components":{%s},"item_ids":{%s}}' % (number, components, item_ids))
+        else:
+            encoded.append(b'{"outfit_number":%d,"components":{%s}}' % (number, components))
+    return b'[' + b','.join(encoded) + b']'
+
+
+def recommendation_response(outfits, item_json, source=None, degraded=None, cursor=None):
+    """
+    Build a raw JSON response of outfits, bypassing response_model validation
+
+    Args:
+        outfits (list): Outfit dictionaries from the recommender
+        item_json (dict): Item fragments from encode_item_fragments()
+        source (str): Value of the 'source' field, omitted if None
+        degraded (list): Value of the 'degraded' field, omitted if None
+        cursor (str): Value of the 'cursor' field, omitted if None
+
+    Returns:
+        Response: application/json response
+    """
+    from fastapi import Response
+
+    with stage('formatting'):
+        body = b'{"outfits":' + outfits_json(outfits, item_json)
+        if source is not None:
+            body += b',"source":' + encode_fragment(source)
+        if degraded is not None:
+            body += b',"degraded":' + encode_fragment(degraded)
+        if cursor is not None:
+            body += b',"cursor":' + encode_fragment(cursor)
+        body += b'}'
+    return Response(content=body, media_type='application/json')
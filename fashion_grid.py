@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Materialized Grid
+
+Most questionnaire sessions fall into a small number of (specific_occasion, gender,
+season, style) cells, and every one of them ranks the same candidates again. This
+module precomputes the ranked per-item-type candidates of those cells offline and
+stores them in a compact SQLite file. A recommender with the grid attached answers
+any tag list that matches a stored cell from the file and scores everything else live.
+
+Cells are keyed by their sorted tag list: the TF-IDF query vector and the outfit
+assembly do not depend on tag order, so a stored ranking is exactly the ranking live
+scoring would produce. Only the outfit draw runs per request. Rows a session has
+already seen are dropped from the stored ranking, as long as enough remain.
+
+    python fashion_grid.py build --dataset fashion_dataset_updated.csv
+    python fashion_grid.py build --from-log slow_queries.jsonl --top 500
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from fashion_recommender import FashionRecommender
+from fashion_questionnaire import FashionQuestionnaire, preference_tags
+
+# Depth of the stored rankings; requests for up to this many items per type are served.
+# Four requests' worth, so sessions still hit the grid after their seen items are dropped
+DEFAULT_DEPTH = 28
+
+
+def default_grid_path(dataset_path):
+    """
+    Get the path the grid of a dataset is persisted to by default
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+
+    Returns:
+        str: Path of the grid file next to the dataset
+    """
+    return os.path.splitext(dataset_path)[0] + '.grid.sqlite'
+
+
+def cell_key(tags):
+    """
+    Get the canonical key of a tag list
+
+    Args:
+        tags (list): Tags of a query
+
+    Returns:
+        str: The sorted tags joined by commas
+    """
+    return ','.join(sorted(tags))
+
+
+def questionnaire_cells():
+    """
+    Enumerate the (specific_occasion, gender, season, style) questionnaire cells
+
+    Returns:
+        list: Preference dicts, one per cell
+    """
+    options = FashionQuestionnaire(None)
+    return [
+        {'specific_occasion': occasion, 'gender': gender, 'primary_seasons': [season], 'style_vibes': [style]}
+        for occasion, gender, season, style in itertools.product(
+            options.OCCASIONS, options.GENDERS, options.SEASONS, options.STYLES)
+    ]
+
+
+def logged_cells(log_path, top):
+    """
+    Get the most frequent tag lists of a slow-query log (see fashion_slow_log.py)
+
+    Args:
+        log_path (str): Path of the JSONL log
+        top (int): Number of tag lists to keep
+
+    Returns:
+        list: Tag lists, most frequent first
+    """
+    from fashion_slow_log import read_log
+
+    counts = collections.Counter(cell_key(record['tags']) for record in read_log(log_path) if record.get('tags'))
+    return [key.split(',') for key, _ in counts.most_common(top)]
+
+
+def _pack(ranked, item_types):
+    """Pack a ranking into offsets, row ids and scores in item type order."""
+    ids = [ranked[item_type][0] for item_type in item_types]
+    offsets = np.cumsum([0] + [len(type_ids) for type_ids in ids]).astype(np.int32)
+    return (offsets.tobytes()
+            + np.concatenate(ids).astype(np.int32).tobytes()
+            + np.concatenate([ranked[item_type][1] for item_type in item_types]).astype(np.float64).tobytes())
+
+
+def _unpack(blob, item_types):
+    """Unpack a ranking packed by _pack()."""
+    n_offsets = len(item_types) + 1
+    offsets = np.frombuffer(blob, dtype=np.int32, count=n_offsets)
+    n_items = int(offsets[-1])
+    ids = np.frombuffer(blob, dtype=np.int32, count=n_items, offset=4 * n_offsets)
+    scores = np.frombuffer(blob, dtype=np.float64, count=n_items, offset=4 * (n_offsets + n_items))
+    return {item_type: (ids[offsets[i]:offsets[i + 1]], scores[offsets[i]:offsets[i + 1]])
+            for i, item_type in enumerate(item_types)}
+
+
+def build_grid(recommender, tag_lists, grid_path, depth=DEFAULT_DEPTH, chunk_size=64):
+    """
+    Rank the candidates of every tag list and write them to a grid file
+
+    Rankings are always exact, even when the recommender has an ANN index attached.
+
+    Args:
+        recommender (FashionRecommender): Recommender built from the dataset
+        tag_lists (list): Tag lists to materialize
+        grid_path (str): Path of the SQLite file to (re)write
+        depth (int): Number of candidates stored per item type
+        chunk_size (int): Number of tag lists ranked together
+
+    Returns:
+        int: Number of distinct cells written
+    """
+    from fashion_ann_index import vocabulary_fingerprint
+    from fashion_neighbours import catalog_digest, item_fingerprints
+
+    keys = list(dict.fromkeys(cell_key(tags) for tags in tag_lists))
+    item_types = list(recommender.category_mapping)
+
+    if os.path.exists(grid_path):
+        os.remove(grid_path)
+    with sqlite3.connect(grid_path) as conn:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE cells (key TEXT PRIMARY KEY, ranking BLOB)")
+        meta = {
+            'depth': depth,
+            'item_types': item_types,
+            'n_items': recommender.tag_matrix.shape[0],
+            # Stored scores depend on the IDF weights and the tags of every item
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer, idf=True),
+            'catalog': catalog_digest(item_fingerprints(recommender))
+        }
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [(key, json.dumps(value)) for key, value in meta.items()])
+
+        for first in range(0, len(keys), chunk_size):
+            chunk = keys[first:first + chunk_size]
+            query_vectors = recommender.vectorizer.transform([' '.join(key.split(',')) for key in chunk])
+            ranked_batch = recommender.rank_candidates_batch(query_vectors, depth, exact=True)
+            conn.executemany("INSERT INTO cells VALUES (?, ?)",
+                             [(key, _pack(ranked, item_types)) for key, ranked in zip(chunk, ranked_batch)])
+    return len(keys)
+
+
+class RecommendationGrid:
+    """Read-only view of a grid file attached to a FashionRecommender."""
+
+    def __init__(self, grid_path):
+        """
+        Open a grid file
+
+        Args:
+            grid_path (str): Path of the SQLite file written by build_grid()
+        """
+        self.path = grid_path
+        self._local = threading.local()
+        self.meta = {key: json.loads(value) for key, value in self._connection().execute("SELECT key, value FROM meta")}
+        self.depth = self.meta['depth']
+        self.item_types = self.meta['item_types']
+        self.n_cells = self._connection().execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+
+    def _connection(self):
+        # SQLite connections are kept per thread and per process, so the grid can be
+        # opened in a server master and used from forked workers and threadpools
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def validate(self, recommender):
+        """
+        Check that the grid was built from the recommender's catalog and vocabulary
+
+        Args:
+            recommender (FashionRecommender): Recommender the grid is attached to
+
+        Raises:
+            ValueError: If the item types, the catalog or the IDF weights differ
+        """
+        from fashion_ann_index import vocabulary_fingerprint
+        from fashion_neighbours import catalog_digest, item_fingerprints
+
+        expected = {
+            'item_types': list(recommender.category_mapping),
+            'n_items': recommender.tag_matrix.shape[0],
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer, idf=True),
+            'catalog': catalog_digest(item_fingerprints(recommender))
+        }
+        for key, value in expected.items():
+            if self.meta.get(key) != value:
+                raise ValueError(f"Grid {self.path} does not match the dataset ({key} differs); rebuild it")
+
+    def lookup(self, tags, n_per_type, exclude=None, partial=False):
+        """
+        Get the stored ranking of a tag list
+
+        Args:
+            tags (list): Tags of the query
+            n_per_type (int): Number of items wanted per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows to leave out
+            partial (bool): Accept fewer than n_per_type items where excluded rows
+                thin out a stored ranking
+
+        Returns:
+            dict: Mapping of item type to (row ids, similarity scores), or None if the
+                tag list is not materialized or the grid is not deep enough
+        """
+        if n_per_type > self.depth:
+            return None
+        row = self._connection().execute("SELECT ranking FROM cells WHERE key = ?", (cell_key(tags),)).fetchone()
+        if row is None:
+            return None
+        ranking = _unpack(row[0], self.item_types)
+        if exclude is not None:
+            filtered = {}
+            for item_type, (ids, scores) in ranking.items():
+                keep = ~exclude[ids]
+                # A full stored list may hide unseen rows ranked below its depth
+                if not partial and len(ids) == self.depth and np.count_nonzero(keep) < n_per_type:
+                    return None
+                filtered[item_type] = (ids[keep], scores[keep])
+            ranking = filtered
+        # Rankings are sorted with ties broken by row id, so a prefix is the top n
+        return {item_type: (ids[:n_per_type], scores[:n_per_type]) for item_type, (ids, scores) in ranking.items()}
+
+def main():
+    """Main function to build or inspect a materialized grid."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Materialized Grid")
+    parser.add_argument("command", choices=["build", "info"], help="Build the grid or describe an existing one")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv", help="Path to dataset CSV file")
+    parser.add_argument("--grid", "-g", help="Grid file (defaults to <dataset>.grid.sqlite)")
+    parser.add_argument("--from-log", help="Materialize the most frequent tag lists of a slow-query log "
+                                           "instead of the questionnaire cells")
+    parser.add_argument("--top", type=int, default=1000, help="Number of logged tag lists to materialize")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Candidates stored per item type")
+
+    args = parser.parse_args()
+    grid_path = args.grid or default_grid_path(args.dataset)
+
+    if args.command == "info":
+        grid = RecommendationGrid(grid_path)
+        print(f"{grid_path}: {grid.n_cells} cells, depth {grid.depth}, "
+              f"{os.path.getsize(grid_path) / 1024:.0f} KiB, built for {grid.meta['n_items']} items")
+        return
+
+    start = time.perf_counter()
+    recommender = FashionRecommender(args.dataset)
+    if args.from_log:
+        tag_lists = logged_cells(args.from_log, args.top)
+    else:
+        tag_lists = [preference_tags(recommender, preferences) for preferences in questionnaire_cells()]
+    n_cells = build_grid(recommender, tag_lists, grid_path, depth=args.depth)
+    print(f"Materialized {n_cells} cells in {time.perf_counter() - start:.1f}s -> {grid_path} "
+          f"({os.path.getsize(grid_path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
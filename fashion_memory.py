@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Memory Accounting
+
+This module measures how much memory the recommender's data structures hold, so
+containers can be sized from numbers rather than guesses. It provides byte counts for
+numpy arrays, sparse matrices and nested Python containers, the resident set size of
+the process, and a tracemalloc-based leak tracker that diffs allocations between a
+baseline snapshot and now.
+"""
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+
+def _is_sparse(obj):
+    # Checked by module so scipy is not imported just to rule sparse matrices out
+    return type(obj).__module__.startswith('scipy.sparse')
+
+
+def array_bytes(array):
+    """
+    Count the bytes held by a numpy array or a sparse matrix
+
+    Args:
+        array: np.ndarray or scipy.sparse matrix
+
+    Returns:
+        int: Bytes of the array buffers
+    """
+    if _is_sparse(array):
+        return int(sum(getattr(array, name).nbytes for name in ('data', 'indices', 'indptr', 'row', 'col')
+                       if hasattr(array, name)))
+    return int(np.asarray(array).nbytes)
+
+
+def object_array_bytes(array):
+    """
+    Count the bytes held by an object array and the distinct objects it references
+
+    Args:
+        array (np.ndarray): Array of Python objects, e.g. strings
+
+    Returns:
+        int: Bytes of the pointer buffer and the referenced objects
+    """
+    distinct = {id(item): item for item in array}
+    return array_bytes(array) + sum(sys.getsizeof(item) for item in distinct.values())
+
+
+def deep_sizeof(obj, _seen=None):
+    """
+    Estimate the bytes held by a Python object and everything it references
+
+    Containers, dataclass-like objects with __dict__ and Pydantic models are followed;
+    objects reachable twice are only counted once.
+
+    Args:
+        obj: Object to measure
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray) or _is_sparse(obj):
+        return array_bytes(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def resident_bytes():
+    """
+    Get the resident set size of the current process
+
+    Returns:
+        int: Resident bytes, or None where the platform does not report it
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is the peak, in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def session_report(sessions):
+    """
+    Summarize the memory held by a sessions dict
+
+    Args:
+        sessions (dict): Session id to session state
+
+    Returns:
+        dict: count, total_bytes and average_bytes
+    """
+    sizes = [deep_sizeof(key) + deep_sizeof(value) for key, value in list(sessions.items())]
+    total = sys.getsizeof(sessions) + sum(sizes)
+    return {
+        'count': len(sizes),
+        'total_bytes': total,
+        'average_bytes': sum(sizes) / len(sizes) if sizes else 0.0
+    }
+
+
+class LeakTracker:
+    """Diff tracemalloc snapshots to find allocations that grow across requests."""
+
+    def __init__(self, frames=10):
+        """
+        Initialize the tracker
+
+        Args:
+            frames (int): Number of stack frames tracemalloc keeps per allocation
+        """
+        self.frames = frames
+        self.baseline = None
+        self._started_tracing = False
+
+    @property
+    def active(self):
+        return self.baseline is not None
+
+    def start(self):
+        """Start tracing allocations (if needed) and take the baseline snapshot."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.baseline = self._snapshot()
+
+    def stop(self):
+        """Drop the baseline and stop tracing if this tracker started it."""
+        self.baseline = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @staticmethod
+    def _snapshot():
+        # Leave out the tracer's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+    def diff(self, top=20, group_by='lineno'):
+        """
+        Compare current allocations with the baseline
+
+        Args:
+            top (int): Number of allocation sites to return
+            group_by (str): 'lineno', 'filename' or 'traceback'
+
+        Returns:
+            dict: Total growth in bytes and the top growing allocation sites
+        """
+        if self.baseline is None:
+            raise RuntimeError("No baseline snapshot; call start() first")
+        stats = self._snapshot().compare_to(self.baseline, group_by)
+        return {
+            'size_diff_bytes': sum(stat.size_diff for stat in stats),
+            'count_diff': sum(stat.count_diff for stat in stats),
+            'top': [{
+                'location': str(stat.traceback[0]) if group_by != 'traceback' else stat.traceback.format(),
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'size_bytes': stat.size
+            } for stat in stats[:top]]
+        }
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Metrics
+
+This module provides low-overhead timing hooks for the stages of the recommendation
+pipeline, aggregated into Prometheus-style histograms, counters and gauges, plus an
+ASGI middleware and /metrics route for the FastAPI apps.
+
+Stages are timed with the stage() context manager. Every observation updates a shared
+histogram; while a request is being traced (see start_trace()) the per-stage times are
+also collected for that request.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Latency buckets in seconds, from 100µs to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set FASHION_METRICS=0 to turn all timing hooks into no-ops
+ENABLED = os.environ.get('FASHION_METRICS', '1') != '0'
+
+# Stage timings of the request currently being handled, if it is traced
+_current_trace = ContextVar('fashion_trace', default=None)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter of the given label values."""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Current value for the given label values."""
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._functions = {}
+
+    def set_function(self, function, **labels):
+        """
+        Read the gauge for the given label values from a callback
+
+        Args:
+            function (callable): Returns the current value
+            **labels: Label values
+        """
+        self._functions[tuple(labels[name] for name in self.labelnames)] = function
+
+    def render(self):
+        lines = []
+        for key, function in sorted(self._functions.items()):
+            try:
+                value = function()
+            except Exception:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogram of observations with fixed buckets and optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation for the given label values."""
+        key = tuple(labels[name] for name in self.labelnames)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        """Number of observations for the given label values."""
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in sorted(self._series.items())]
+        lines = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: The exposition text
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'fashion_stage_duration_seconds', 'Time spent in each stage of the recommendation pipeline', ['stage'])
+RECOMMENDATION_PATHS = REGISTRY.counter(
+    'fashion_recommendation_path_total', 'Recommendations by code path taken', ['path'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'fashion_cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result'])
+REQUEST_SECONDS = REGISTRY.histogram(
+    'fashion_http_request_duration_seconds', 'HTTP request latency by route', ['app', 'route', 'method', 'status'])
+SESSIONS = REGISTRY.gauge(
+    'fashion_sessions', 'Questionnaire sessions held in memory', ['app'])
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a pipeline stage
+
+    Args:
+        name (str): Stage name used as the histogram label
+    """
+    # A traced request is timed for the slow-query log even with metrics turned off
+    trace = _current_trace.get()
+    if not ENABLED and trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if ENABLED:
+            STAGE_SECONDS.observe(elapsed, stage=name)
+        if trace is not None:
+            stages = trace['stages']
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def timed(name):
+    """
+    Decorate a function so every call is timed as a pipeline stage
+
+    Args:
+        name (str): Stage name used as the histogram label
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_path(path):
+    """Count a recommendation taking the given code path."""
+    if ENABLED:
+        RECOMMENDATION_PATHS.inc(path=path)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace['paths'].append(path)
+
+
+def count_cache(cache, hit):
+    """Count a cache lookup as a hit or a miss."""
+    if ENABLED:
+        CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def annotate(**fields):
+    """Attach extra fields (tags, candidate counts, ...) to the current request's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+def start_trace():
+    """
+    Start collecting stage timings for the current request
+
+    Returns:
+        tuple: (trace dict, token to pass to end_trace())
+    """
+    trace = {'stages': {}, 'paths': []}
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    """Stop collecting stage timings for the current request."""
+    _current_trace.reset(token)
+
+
+def current_trace():
+    """The trace dict of the current request, or None if it is not traced."""
+    return _current_trace.get()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every request and its framework overhead."""
+
+    def __init__(self, app, app_name, slow_log=None):
+        self.app = app
+        self.app_name = app_name
+        self.slow_log = slow_log
+
+    async def __call__(self, scope, receive, send):
+        # The slow-query log keeps tracing requests when FASHION_METRICS=0
+        if scope['type'] != 'http' or not (ENABLED or self.slow_log):
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+        body = []
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        async def receive_wrapper():
+            # Keep the request body for the slow-query log
+            message = await receive()
+            if message['type'] == 'http.request' and sum(map(len, body)) < self.slow_log.MAX_BODY_BYTES:
+                body.append(message.get('body', b''))
+            return message
+
+        trace, token = start_trace()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper if self.slow_log else receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            end_trace(token)
+            route = scope.get('route')
+            route_path = getattr(route, 'path', 'unmatched')
+            if ENABLED:
+                REQUEST_SECONDS.observe(elapsed, app=self.app_name, route=route_path,
+                                        method=scope['method'], status=status['code'])
+
+            # Whatever the pipeline stages did not account for is spent in FastAPI
+            # itself: request parsing, response_model validation and JSON encoding
+            if trace['stages'] and route_path != '/metrics':
+                framework = max(0.0, elapsed - sum(trace['stages'].values()))
+                if ENABLED:
+                    STAGE_SECONDS.observe(framework, stage='framework')
+                trace['stages']['framework'] = framework
+
+            if self.slow_log and route_path != '/metrics':
+                query_string = scope.get('query_string', b'').decode('latin-1')
+                path = scope['path'] + (f'?{query_string}' if query_string else '')
+                self.slow_log.record(self.app_name, scope['method'], path, b''.join(body),
+                                     status['code'], elapsed, trace)
+
+
+def install_metrics(app, app_name, slow_log=None):
+    """
+    Add the metrics middleware and a GET /metrics route to a FastAPI app
+
+    Args:
+        app (FastAPI): The app to instrument
+        app_name (str): Value of the 'app' label of its request metrics
+        slow_log (SlowQueryLog): Log for slow requests (defaults to the one
+            configured by the FASHION_SLOW_LOG environment variables, if any)
+    """
+    from fastapi.responses import PlainTextResponse
+    from fashion_slow_log import SlowQueryLog
+
+    if slow_log is None:
+        slow_log = SlowQueryLog.from_env()
+    app.add_middleware(MetricsMiddleware, app_name=app_name, slow_log=slow_log)
+
+    @app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        """Prometheus metrics in the text exposition format."""
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
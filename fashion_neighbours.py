@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Item Neighbours
+
+"More like this" asks for the catalog items most similar to one item. Scoring the
+whole catalog per click is as expensive as any other query, so this module computes
+the top-K neighbours of every item offline and persists them as a table. A
+recommender with the table attached answers GET /items/{id}/similar from one row of
+it. Item ids are the row ids of the indexed catalog.
+
+Neighbours are ranked by the cosine similarity of the TF-IDF tag rows. Rows describing
+the same item (same AnswerText) are never neighbours of each other. All-pairs
+similarity is computed as sparse products of blocks of rows against the catalog.
+Block sizes are chosen so a block's product holds at most NEIGHBOUR_BLOCK_ENTRIES
+entries, whatever the catalog size.
+
+When the catalog changes, an existing table is updated instead of rebuilt. Items are
+matched by content. Changed and new items are ranked against the whole catalog. An
+unchanged item keeps its neighbours, rescored, and gains the changed items that come
+close enough. It is ranked again only if it lost a neighbour it cannot do without.
+The update is exact while the IDF weights are unchanged. A refitted vectorizer shifts
+every score a little; kept neighbours are rescored under the new weights, but an
+unchanged item is not searched again for unchanged items that moved into its top-K.
+`build --full` ranks everything again.
+
+    python fashion_neighbours.py build --dataset fashion_dataset_updated.csv
+    python fashion_neighbours.py build --dataset fashion_dataset_updated.csv --full
+    python fashion_neighbours.py info --dataset fashion_dataset_updated.csv
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from fashion_recommender import FashionRecommender, freeze_arrays, top_k
+
+# Neighbours kept per item
+DEFAULT_K = 20
+
+# Entries of the similarity block computed at a time while ranking neighbours
+NEIGHBOUR_BLOCK_ENTRIES = 1 << 23
+
+
+def default_neighbours_path(dataset_path):
+    """
+    Get the path the neighbour table of a dataset is persisted to by default
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+
+    Returns:
+        str: Path of the table file next to the dataset
+    """
+    return os.path.splitext(dataset_path)[0] + '.neighbours.npz'
+
+
+def item_fingerprints(recommender):
+    """
+    Hash the content of every catalog item, so changed items can be told apart
+
+    Args:
+        recommender (FashionRecommender): Recommender whose catalog is hashed
+
+    Returns:
+        np.ndarray: One uint64 hash of AnswerText and Tags per row
+    """
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(recommender.df[['AnswerText', 'Tags']], index=False).to_numpy()
+
+
+def catalog_digest(fingerprints):
+    """Hash the item fingerprints of a catalog into one hex digest."""
+    return hashlib.sha1(np.ascontiguousarray(fingerprints, dtype=np.uint64).tobytes()).hexdigest()
+
+
+def _item_codes(recommender):
+    """Number the distinct AnswerTexts, so rows of the same item are never neighbours."""
+    import pandas as pd
+
+    return pd.factorize(recommender.df['AnswerText'])[0]
+
+
+def _blocks(rows, n_columns):
+    """Split rows into blocks whose product with n_columns columns stays bounded."""
+    step = max(1, NEIGHBOUR_BLOCK_ENTRIES // max(1, n_columns))
+    for start in range(0, len(rows), step):
+        yield start, rows[start:start + step]
+
+
+def _store(ids, scores, position, found_ids, found_scores):
+    """Write one row's neighbours into the table arrays, padded with -1."""
+    ids[position, :len(found_ids)] = found_ids
+    scores[position, :len(found_scores)] = found_scores
+
+
+def rank_neighbours(recommender, rows, k, codes=None):
+    """
+    Rank the top-k neighbours of catalog rows against the whole catalog
+
+    Args:
+        recommender (FashionRecommender): Recommender whose tag matrix is ranked
+        rows (np.ndarray): Row ids to rank neighbours for
+        k (int): Neighbours kept per row
+        codes (np.ndarray): Item number of every row (see _item_codes())
+
+    Returns:
+        tuple: (row ids, similarity scores) arrays of shape (len(rows), k), best first,
+            padded with -1 and 0 when a row has fewer than k similar items
+    """
+    if codes is None:
+        codes = _item_codes(recommender)
+    tag_matrix = recommender.tag_matrix
+    transposed = tag_matrix.T.tocsr()
+    ids = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+
+    for start, block in _blocks(rows, tag_matrix.shape[0]):
+        # Rows are unit length, so the products are cosine similarities
+        product = (tag_matrix[block] @ transposed).tocsr()
+        for offset, row in enumerate(block):
+            columns = product.indices[product.indptr[offset]:product.indptr[offset + 1]]
+            similarities = product.data[product.indptr[offset]:product.indptr[offset + 1]]
+            keep = (similarities > 0) & (codes[columns] != codes[row])
+            _store(ids, scores, start + offset, *top_k(similarities[keep], k, columns[keep]))
+    return ids, scores
+
+
+class NeighbourTable:
+    """Top-K neighbours of every catalog item, persisted as an .npz file."""
+
+    def __init__(self, ids, scores, fingerprints, meta):
+        """
+        Initialize the table from its arrays
+
+        Args:
+            ids (np.ndarray): Neighbour row ids, one row of k per item, padded with -1
+            scores (np.ndarray): Similarity scores aligned with ids
+            fingerprints (np.ndarray): Content hash of every item (see item_fingerprints())
+            meta (dict): k, catalog shape, vocabulary fingerprint and catalog digest
+        """
+        self.ids = ids
+        self.scores = scores
+        self.fingerprints = fingerprints
+        self.meta = meta
+        self.k = int(meta['k'])
+        freeze_arrays(self.ids, self.scores, self.fingerprints)
+
+    @property
+    def n_items(self):
+        return self.ids.shape[0]
+
+    @classmethod
+    def _from_arrays(cls, recommender, ids, scores, fingerprints, k):
+        """Wrap freshly ranked arrays with the metadata of the recommender's catalog."""
+        from fashion_ann_index import vocabulary_fingerprint
+
+        meta = {
+            'k': int(k),
+            'n_items': int(recommender.tag_matrix.shape[0]),
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer, idf=True),
+            'catalog': catalog_digest(fingerprints)
+        }
+        return cls(ids, scores, fingerprints, meta)
+
+    @classmethod
+    def build(cls, recommender, k=DEFAULT_K):
+        """
+        Rank the neighbours of every item of the recommender's catalog
+
+        Args:
+            recommender (FashionRecommender): Recommender built from the dataset
+            k (int): Neighbours kept per item
+
+        Returns:
+            NeighbourTable: The built table
+        """
+        n_items = recommender.tag_matrix.shape[0]
+        ids, scores = rank_neighbours(recommender, np.arange(n_items), k)
+        return cls._from_arrays(recommender, ids, scores, item_fingerprints(recommender), k)
+
+    def update(self, recommender):
+        """
+        Update the table to a changed catalog, ranking only what the changes affect
+
+        Args:
+            recommender (FashionRecommender): Recommender built from the changed dataset
+
+        Returns:
+            tuple: (updated NeighbourTable, dict counting the changed, re-ranked and
+                merged items)
+        """
+        k = self.k
+        # Match unchanged items in catalog order; the extra slot maps the -1 padding to -1
+        fingerprints = item_fingerprints(recommender)
+        n_items = len(fingerprints)
+        rows_of_fingerprint = collections.defaultdict(collections.deque)
+        for row, fingerprint in enumerate(fingerprints):
+            rows_of_fingerprint[fingerprint].append(row)
+        new_of_old = np.full(self.n_items + 1, -1, dtype=np.int64)
+        for old_row, fingerprint in enumerate(self.fingerprints):
+            matches = rows_of_fingerprint.get(fingerprint)
+            if matches:
+                new_of_old[old_row] = matches.popleft()
+        old_of_new = np.full(n_items, -1, dtype=np.int64)
+        matched = np.flatnonzero(new_of_old[:-1] >= 0)
+        old_of_new[new_of_old[matched]] = matched
+        changed = np.flatnonzero(old_of_new < 0)
+        unchanged = np.flatnonzero(old_of_new >= 0)
+
+        # Unchanged items keep their surviving neighbours under their new ids; an item
+        # whose list was full and lost a neighbour may be missing one it never stored
+        old_ids = self.ids[old_of_new[unchanged]]
+        kept = new_of_old[old_ids]
+        lost = ((old_ids >= 0) & (kept < 0)).any(axis=1)
+        full = (old_ids >= 0).all(axis=1)
+        ranked = np.concatenate([changed, unchanged[lost & full]])
+        merged = ~(lost & full)
+
+        codes = _item_codes(recommender)
+        ids = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        ids[ranked], scores[ranked] = rank_neighbours(recommender, ranked, k, codes)
+        self._merge(recommender, unchanged[merged], kept[merged], changed, codes, ids, scores)
+
+        table = self._from_arrays(recommender, ids, scores, fingerprints, k)
+        return table, {'items': n_items, 'changed': len(changed), 'ranked': len(ranked),
+                       'merged': int(merged.sum())}
+
+    def _merge(self, recommender, rows, kept, changed, codes, ids, scores):
+        """Rank the kept neighbours of unchanged rows together with the changed items."""
+        tag_matrix = recommender.tag_matrix
+        changed_columns = tag_matrix[changed].T.tocsr()
+        k = self.k
+        for start, block in _blocks(rows, len(changed) + k):
+            block_kept = kept[start:start + len(block)]
+            # Rescore the kept neighbours with the current tag rows
+            pairs = tag_matrix[np.repeat(block, k)].multiply(tag_matrix[np.maximum(block_kept, 0).ravel()])
+            rescored = np.asarray(pairs.sum(axis=1)).reshape(len(block), k)
+            product = (tag_matrix[block] @ changed_columns).tocsr()
+            for offset, row in enumerate(block):
+                valid = block_kept[offset] >= 0
+                columns = changed[product.indices[product.indptr[offset]:product.indptr[offset + 1]]]
+                similarities = product.data[product.indptr[offset]:product.indptr[offset + 1]]
+                candidates = np.concatenate([block_kept[offset][valid], columns])
+                candidate_scores = np.concatenate([rescored[offset][valid], similarities])
+                keep = (candidate_scores > 0) & (codes[candidates] != codes[row])
+                _store(ids, scores, row, *top_k(candidate_scores[keep], k, candidates[keep]))
+
+    def save(self, path):
+        """
+        Persist the table to an .npz file
+
+        Args:
+            path (str): Destination path
+        """
+        with open(path, 'wb') as f:
+            np.savez(f, ids=self.ids, scores=self.scores, fingerprints=self.fingerprints,
+                     meta=np.array(json.dumps(self.meta)))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a table saved with save()
+
+        Args:
+            path (str): Path to the .npz file
+
+        Returns:
+            NeighbourTable: The loaded table
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['ids'], data['scores'], data['fingerprints'], json.loads(str(data['meta'])))
+
+    def validate(self, recommender):
+        """
+        Check that the table was built from the recommender's catalog and vocabulary
+
+        Args:
+            recommender (FashionRecommender): Recommender the table is attached to
+
+        Raises:
+            ValueError: If the catalog or the vocabulary differs
+        """
+        from fashion_ann_index import vocabulary_fingerprint
+
+        expected = {
+            'n_items': recommender.tag_matrix.shape[0],
+            'vocabulary': vocabulary_fingerprint(recommender.vectorizer, idf=True),
+            'catalog': catalog_digest(item_fingerprints(recommender))
+        }
+        for key, value in expected.items():
+            if self.meta.get(key) != value:
+                raise ValueError(f"Neighbour table does not match the dataset ({key} differs); rebuild it")
+
+    def similar(self, row, count=None):
+        """
+        Get the stored neighbours of an item
+
+        Args:
+            row (int): Row id of the item
+            count (int): Number of neighbours wanted (at most k; all stored if None)
+
+        Returns:
+            tuple: (row ids, similarity scores) arrays, best first
+
+        Raises:
+            IndexError: If the row is not in the catalog
+        """
+        if not 0 <= row < self.n_items:
+            raise IndexError(row)
+        ids = self.ids[row, :count]
+        # Neighbours come first and the padding last
+        n_found = int(np.count_nonzero(ids >= 0))
+        return ids[:n_found], self.scores[row, :n_found]
+
+
+def main():
+    """Main function to build, update or inspect a neighbour table."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Item Neighbours")
+    parser.add_argument("command", choices=["build", "info"], help="Build or update the table, or describe it")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv", help="Path to dataset CSV file")
+    parser.add_argument("--table", "-t", help="Table file (defaults to <dataset>.neighbours.npz)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Neighbours kept per item")
+    parser.add_argument("--full", action="store_true", help="Rank every item again instead of updating "
+                                                            "an existing table")
+
+    args = parser.parse_args()
+    table_path = args.table or default_neighbours_path(args.dataset)
+
+    if args.command == "info":
+        table = NeighbourTable.load(table_path)
+        print(f"{table_path}: {table.n_items} items, k={table.k}, "
+              f"{os.path.getsize(table_path) / 1024:.0f} KiB")
+        return
+
+    start = time.perf_counter()
+    recommender = FashionRecommender(args.dataset)
+    previous = None
+    if not args.full and os.path.exists(table_path):
+        previous = NeighbourTable.load(table_path)
+    if previous is not None and previous.k == args.k:
+        table, counts = previous.update(recommender)
+        summary = (f"Updated {counts['items']} items ({counts['changed']} changed, {counts['ranked']} ranked, "
+                   f"{counts['merged']} merged)")
+    else:
+        table = NeighbourTable.build(recommender, k=args.k)
+        summary = f"Ranked {table.n_items} items"
+    table.save(table_path)
+    print(f"{summary} in {time.perf_counter() - start:.1f}s -> {table_path} "
+          f"({os.path.getsize(table_path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Outfit Pagination
+
+A recommendation request may ask for a page of outfits instead of a single draw. The
+server then ranks a deeper candidate list once, shuffles every category's candidates
+within page-sized windows of the ranking and keeps the result as a snapshot. Outfit i
+of the snapshot is made of the i-th candidate of every category, so a page is a slice
+of positions: the first page draws from the same top candidates as an unpaginated
+response, follow-up pages continue down the ranking, cost O(page size), never rescore,
+and never repeat an item of an earlier page.
+
+Responses carry an opaque cursor naming the snapshot and the next position. Snapshots
+live in the memory of the worker that created them and expire when they have not been
+read for a while, so follow-up requests need to reach the same worker (sticky sessions
+when several workers serve the API).
+
+    FASHION_CURSOR_TTL=300          # seconds a snapshot survives without being read
+    FASHION_CURSOR_MAX=10000        # snapshots kept per worker, oldest dropped first
+    FASHION_CURSOR_DEPTH=50         # candidates ranked per item type for a snapshot
+"""
+import base64
+import collections
+import os
+import random
+import secrets
+import threading
+import time
+
+from fashion_metrics import REGISTRY, count_cache
+
+SNAPSHOTS = REGISTRY.gauge(
+    'fashion_cursor_snapshots', 'Candidate snapshots held for outfit pagination', ['app'])
+
+# Mandatory categories of an outfit; the accessory is added when the query asks for one
+MANDATORY_CATEGORIES = ('topwear', 'bottomwear', 'footwear')
+ACCESSORY_TAGS = ('jewelry', 'scarf')
+
+# Outfits per page, the same cap as an unpaginated response
+MAX_PAGE_SIZE = 7
+
+
+class CursorExpired(KeyError):
+    """Raised for cursors whose snapshot expired, was dropped or never existed."""
+
+
+def encode_cursor(snapshot_id, position):
+    """Encode a snapshot id and the position of the next outfit as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{position}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor()
+
+    Returns:
+        tuple: (snapshot id, position)
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        snapshot_id, position = text.rsplit(':', 1)
+        return snapshot_id, int(position)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorExpired(cursor)
+
+
+class Snapshot:
+    """Shuffled candidates of one query, drawn from by position."""
+
+    def __init__(self, recommendations, query_tags, rng, source=None, window=MAX_PAGE_SIZE):
+        """
+        Shuffle every category once, within windows of the ranking
+
+        Args:
+            recommendations (dict): Mapping of category to candidate item dicts, best first
+            query_tags (str): Space-separated query tags
+            rng (random.Random): Random generator of the shuffle
+            source (str): Description of the query returned with every page
+            window (int): Number of consecutive candidates shuffled together
+        """
+        self.candidates = {}
+        for category, items in recommendations.items():
+            # Rows repeating an item description would look like repeats across pages;
+            # keep the best ranked one
+            distinct = {}
+            for item in items:
+                distinct.setdefault(item['item'], item)
+            items = list(distinct.values())
+            # Shuffle only within windows, so earlier positions keep the better candidates
+            shuffled = []
+            for start in range(0, len(items), window):
+                chunk = items[start:start + window]
+                rng.shuffle(chunk)
+                shuffled.extend(chunk)
+            self.candidates[category] = shuffled
+        self.with_accessory = any(tag in query_tags for tag in ACCESSORY_TAGS)
+        self.source = source
+        # Complete outfits need one candidate of every mandatory category
+        self.n_outfits = min(len(self.candidates.get(category, [])) for category in MANDATORY_CATEGORIES)
+
+    def outfits(self, start, stop):
+        """
+        Get the outfits at positions [start, stop)
+
+        Returns:
+            list: Outfit dictionaries
+        """
+        accessories = self.candidates.get('accessory', []) if self.with_accessory else []
+        outfits = []
+        for position in range(start, min(stop, self.n_outfits)):
+            outfit = {category: self.candidates[category][position] for category in MANDATORY_CATEGORIES}
+            if position < len(accessories):
+                outfit['accessory'] = accessories[position]
+            outfits.append(outfit)
+        return outfits
+
+
+class CandidateSnapshots:
+    """Per-worker store of candidate snapshots, expiring by TTL and bounded in number."""
+
+    def __init__(self, ttl=300.0, max_snapshots=10000, depth=50):
+        """
+        Args:
+            ttl (float): Seconds a snapshot survives without being read
+            max_snapshots (int): Snapshots kept at most; the least recently read go first
+            depth (int): Candidates ranked per item type for a snapshot
+        """
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self.depth = depth
+        # Snapshot id -> (snapshot, expiry), least recently read first
+        self._snapshots = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a store configured by the FASHION_CURSOR_* environment variables."""
+        return cls(ttl=float(os.environ.get('FASHION_CURSOR_TTL', 300)),
+                   max_snapshots=int(os.environ.get('FASHION_CURSOR_MAX', 10000)),
+                   depth=int(os.environ.get('FASHION_CURSOR_DEPTH', 50)))
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def _expire(self, now):
+        """Drop expired snapshots and the oldest ones over the limit; call with the lock held."""
+        while self._snapshots:
+            snapshot_id, (_, expiry) = next(iter(self._snapshots.items()))
+            if expiry > now and len(self._snapshots) <= self.max_snapshots:
+                break
+            del self._snapshots[snapshot_id]
+
+    def create(self, recommendations, query_tags, page_size, seed=None, source=None):
+        """
+        Snapshot the candidates of a query and return its first page
+
+        Args:
+            recommendations (dict): Mapping of category to candidate item dicts
+            query_tags (str): Space-separated query tags
+            page_size (int): Number of outfits per page (at most MAX_PAGE_SIZE)
+            seed (int): Optional seed for a reproducible shuffle
+            source (str): Description of the query returned with every page
+
+        Returns:
+            tuple: (outfits of the first page, cursor of the next page or None)
+        """
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        snapshot = Snapshot(recommendations, query_tags, random.Random(seed), source, window=page_size)
+        if snapshot.n_outfits <= page_size:
+            # Everything fits on the first page, nothing to keep
+            return snapshot.outfits(0, page_size), None
+
+        snapshot_id = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._snapshots[snapshot_id] = (snapshot, now + self.ttl)
+            self._expire(now)
+        return snapshot.outfits(0, page_size), encode_cursor(snapshot_id, page_size)
+
+    def page(self, cursor, page_size):
+        """
+        Get the page of outfits a cursor points to
+
+        Args:
+            cursor (str): Cursor from create() or an earlier page
+            page_size (int): Number of outfits per page (at most MAX_PAGE_SIZE)
+
+        Returns:
+            tuple: (outfits, cursor of the next page or None, source of the snapshot)
+        """
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        snapshot_id, position = decode_cursor(cursor)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+            if entry is not None and entry[1] <= now:
+                del self._snapshots[snapshot_id]
+                entry = None
+            if entry is not None:
+                # Reading a snapshot keeps it alive
+                self._snapshots[snapshot_id] = (entry[0], now + self.ttl)
+                self._snapshots.move_to_end(snapshot_id)
+        count_cache('cursor', entry is not None)
+        if entry is None or position < 0:
+            raise CursorExpired(cursor)
+
+        snapshot = entry[0]
+        stop = position + page_size
+        cursor = encode_cursor(snapshot_id, stop) if stop < snapshot.n_outfits else None
+        return snapshot.outfits(position, stop), cursor, snapshot.source
+
+    def install_metrics(self, app_name):
+        """Export the number of held snapshots as fashion_cursor_snapshots."""
+        SNAPSHOTS.set_function(lambda: len(self), app=app_name)
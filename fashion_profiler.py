@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Sampling Profiler
+
+This module provides a statistical profiler for live API workers. A background thread
+wakes up at a fixed interval, snapshots the stack of every other thread with
+sys._current_frames() and counts each stack. The result is rendered in the collapsed
+stack format ("frame;frame;frame count" per line) understood by flamegraph.pl and
+speedscope.
+
+Unlike cProfile, sampling sees the threadpool threads FastAPI runs endpoints on, and
+its overhead is bounded by the sampling interval rather than by the number of calls.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class Sampler:
+    """Background thread that samples the stacks of all other threads."""
+
+    def __init__(self, interval=0.01):
+        """
+        Initialize the sampler
+
+        Args:
+            interval (float): Seconds between samples
+        """
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.n_samples = 0
+        self.overhead = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name='fashion-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.n_samples += 1
+            self.overhead += time.perf_counter() - start
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ';'.join(reversed(frames))
+
+    def collapsed(self):
+        """
+        Render the collected stacks in the collapsed stack format
+
+        Returns:
+            str: One "frame;frame;frame count" line per distinct stack
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile(seconds, interval=0.01):
+    """
+    Sample all threads of the current process for a while
+
+    Args:
+        seconds (float): Length of the profiling window
+        interval (float): Seconds between samples
+
+    Returns:
+        Sampler: The stopped sampler holding the collected stacks
+    """
+    sampler = Sampler(interval)
+    sampler.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler
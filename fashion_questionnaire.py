@@ -3,18 +3,178 @@
 Fashion Recommendation Questionnaire
 
 This script provides an interactive questionnaire to collect user preferences
-and generate personalized fashion recommendations.
+and generate personalized fashion recommendations. With --bulk it regenerates the
+recommendations of many saved preference files in one batched, restartable run.
 """
 import sys
 import json
 import argparse
 import os
-import pandas as pd
-import numpy as np
-from fashion_recommender import FashionRecommender
-import pandas as pd
-import numpy as np
-from fashion_recommender import FashionRecommender
+import time
+from fashion_recommender import FashionRecommender, run_batch
+
+def preference_tags(recommender, preferences, item_specific=True):
+    """
+    Get the tags for questionnaire preferences, including the occasion rules
+    
+    Args:
+        recommender (FashionRecommender): The fashion recommender instance
+        preferences (dict): Questionnaire preferences
+        item_specific (bool): Include the item-specific preferences in the tags
+            (pass False when they are scored as item overrides)
+        
+    Returns:
+        list: Tags for recommendation
+    """
+    # Process preferences to get tags
+    tags = recommender.process_user_preferences(preferences, item_specific=item_specific)
+    
+    # Add specific occasion if provided
+    if "specific_occasion" in preferences and preferences["specific_occasion"]:
+        tags.append(preferences["specific_occasion"].lower())
+    
+    # Add casual outfit style if provided
+    if "casual_outfit_style" in preferences and preferences["casual_outfit_style"]:
+        if "specific_occasion" in preferences and preferences["specific_occasion"] == "Casual":
+            tags.append(preferences["casual_outfit_style"].lower())
+    
+    # Add formal outfit color if provided
+    if "formal_outfit_color" in preferences and preferences["formal_outfit_color"]:
+        if "specific_occasion" in preferences and preferences["specific_occasion"] in ["Wedding", "Interview"]:
+            tags.append(preferences["formal_outfit_color"].lower())
+    
+    return tags
+
+
+def read_profiles(path):
+    """
+    Read saved preference profiles from a directory of JSON files or a JSONL file
+
+    Files in a directory are identified by their path relative to it. JSONL lines hold
+    either the preferences themselves or an object with 'id' and 'preferences'; lines
+    without an id are identified by their line number.
+
+    Args:
+        path (str): Directory of preference JSON files or JSONL file
+
+    Yields:
+        tuple: (profile id, preferences dict or the Exception raised reading it)
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith('.json'):
+                    continue
+                file_path = os.path.join(root, name)
+                try:
+                    with open(file_path, 'r') as f:
+                        preferences = json.load(f)
+                except Exception as e:
+                    preferences = e
+                yield os.path.relpath(file_path, path), preferences
+        return
+
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                profile = json.loads(line)
+            except Exception as e:
+                yield line_number, e
+                continue
+            if isinstance(profile, dict) and 'preferences' in profile:
+                yield profile.get('id', line_number), profile['preferences']
+            else:
+                yield line_number, profile
+
+
+def completed_profiles(output_path):
+    """
+    Get the ids of the profiles a previous bulk run already wrote results for
+
+    A trailing partial line left by a crash is cut off so the run can append to the file.
+    Profiles that failed are not done, so the next run retries them.
+
+    Args:
+        output_path (str): JSONL results file of the bulk run
+
+    Returns:
+        set: Profile ids with a successful result
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            f.truncate(complete)
+    results = (json.loads(line) for line in data[:complete].splitlines() if line.strip())
+    return {result['id'] for result in results if 'error' not in result}
+
+
+def score_profiles(recommender, profiles, output_path, n_workers=1, chunk_size=64, seed=None,
+                   recommender_args=None):
+    """
+    Regenerate the recommendations of saved profiles and append them to a JSONL file
+
+    Tags and item overrides are derived with preference_tags() and
+    preference_overrides(), the same rules as GET /recommendations of the
+    questionnaire API, and all profiles are scored through run_batch(). Results are
+    flushed as they are produced; profiles that already have a result in the output
+    file are skipped, so an interrupted run can simply be started again. Failed
+    profiles are retried, and their new result is appended after the error.
+
+    Args:
+        recommender (FashionRecommender): Recommender built from the dataset
+        profiles (iterable): (profile id, preferences) pairs, see read_profiles()
+        output_path (str): JSONL results file to append to
+        n_workers (int): Number of worker processes
+        chunk_size (int): Number of profiles scored together
+        seed (int): Optional seed for reproducible outfit draws
+        recommender_args (tuple): FashionRecommender arguments for workers that
+            cannot inherit the recommender
+
+    Returns:
+        dict: Counts of 'scored', 'failed' and 'skipped' profiles
+    """
+    done = completed_profiles(output_path)
+    counts = {'scored': 0, 'failed': 0, 'skipped': 0}
+    failed = []
+
+    def requests():
+        for profile_id, preferences in profiles:
+            if profile_id in done:
+                counts['skipped'] += 1
+                continue
+            try:
+                if isinstance(preferences, Exception):
+                    raise preferences
+                if not isinstance(preferences, dict):
+                    raise ValueError("preferences must be a JSON object")
+                tags = preference_tags(recommender, preferences, item_specific=False)
+                item_overrides = recommender.preference_overrides(preferences)
+            except Exception as e:
+                failed.append({'id': profile_id, 'error': str(e)})
+                continue
+            yield json.dumps({'id': profile_id, 'tags': tags, 'item_overrides': item_overrides, 'seed': seed})
+
+    with open(output_path, 'a') as out:
+        def write(result):
+            counts['failed' if 'error' in result else 'scored'] += 1
+            out.write(json.dumps(result) + "\n")
+
+        for result in run_batch(recommender, requests(), n_workers=n_workers, chunk_size=chunk_size,
+                                recommender_args=recommender_args):
+            write(result)
+            while failed:
+                write(failed.pop(0))
+            out.flush()
+        for result in failed:
+            write(result)
+    return counts
+
 
 class FashionQuestionnaire:
     """Interactive questionnaire for fashion recommendations."""
@@ -273,25 +433,12 @@ class FashionQuestionnaire:
         if not any(self.preferences.values()):
             self.run_questionnaire()
         
-        # Process preferences to get tags
-        tags = self.recommender.process_user_preferences(self.preferences)
-        
-        # Add specific occasion if provided
-        if "specific_occasion" in self.preferences and self.preferences["specific_occasion"]:
-            tags.append(self.preferences["specific_occasion"].lower())
-        
-        # Add casual outfit style if provided
-        if "casual_outfit_style" in self.preferences and self.preferences["casual_outfit_style"]:
-            if "specific_occasion" in self.preferences and self.preferences["specific_occasion"] == "Casual":
-                tags.append(self.preferences["casual_outfit_style"].lower())
-        
-        # Add formal outfit color if provided
-        if "formal_outfit_color" in self.preferences and self.preferences["formal_outfit_color"]:
-            if "specific_occasion" in self.preferences and self.preferences["specific_occasion"] in ["Wedding", "Interview"]:
-                tags.append(self.preferences["formal_outfit_color"].lower())
+        # Process preferences to get tags; item-specific answers only weigh on their own item type
+        tags = preference_tags(self.recommender, self.preferences, item_specific=False)
+        item_overrides = self.recommender.preference_overrides(self.preferences)
         
         # Get recommendations based on tags
-        outfits = self.recommender.get_recommendations_from_tags(tags)
+        outfits = self.recommender.get_recommendations_from_tags(tags, item_overrides=item_overrides)
         
         # Format recommendations for display
         return self.recommender.format_outfit_recommendations(outfits)
@@ -304,6 +451,12 @@ def main():
                        help="Path to dataset CSV file")
     parser.add_argument("--save", "-s", help="Save preferences to JSON file")
     parser.add_argument("--load", "-l", help="Load preferences from JSON file")
+    parser.add_argument("--bulk", "-b", help="Directory of saved preference files or JSONL of profiles "
+                                              "to score in one batched run")
+    parser.add_argument("--output", "-o", default="profile_recommendations.jsonl",
+                       help="JSONL results file of --bulk (appended to when a run is restarted)")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Worker processes for --bulk")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible outfit draws in --bulk")
     
     args = parser.parse_args()
     
@@ -311,6 +464,14 @@ def main():
         # Initialize the recommender
         recommender = FashionRecommender(args.dataset)
         
+        if args.bulk:
+            start = time.perf_counter()
+            counts = score_profiles(recommender, read_profiles(args.bulk), args.output, n_workers=args.workers,
+                                    seed=args.seed, recommender_args=(args.dataset,))
+            print(f"Scored {counts['scored']} profiles ({counts['failed']} failed, {counts['skipped']} "
+                  f"already done) in {time.perf_counter() - start:.2f}s -> {args.output}")
+            return
+        
         # Create the questionnaire
         questionnaire = FashionQuestionnaire(recommender)
         
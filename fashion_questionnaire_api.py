@@ -5,7 +5,7 @@ Fashion Recommendation Questionnaire API
 This script provides a FastAPI interface for the Fashion Recommendation Questionnaire,
 allowing users to answer questions and receive personalized recommendations via API endpoints.
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
@@ -13,32 +13,32 @@ import uvicorn
 import json
 import os
 
-from fashion_recommender import FashionRecommender
-from fashion_questionnaire import FashionQuestionnaire
+from fashion_questionnaire import FashionQuestionnaire, preference_tags
+from fashion_admin import install_admin
+from fashion_admission import install_admission
+from fashion_catalogs import install_catalogs
+from fashion_fast_json import recommendation_response
+from fashion_metrics import SESSIONS, annotate, install_metrics, stage
+from fashion_seen import SeenStore
+from fashion_speculation import Speculator
+from fashion_startup import Warmup, get_recommender, install_health, warmup_queries_from_env
 
-# Get the dataset path
+# Get the dataset path (FASHION_DATASET may name a CSV, Parquet or Feather catalog)
 current_dir = os.path.dirname(os.path.abspath(__file__))
-dataset_path = os.path.join(current_dir, "fashion_dataset_updated.csv")
-
-# Initialize the recommender and questionnaire
-recommender = FashionRecommender(dataset_path)
-questionnaire = FashionQuestionnaire(recommender)
-
-# Create FastAPI app
-app = FastAPI(
-    title="Fashion Questionnaire API",
-    description="API for collecting fashion preferences and providing personalized recommendations",
-    version="1.0.0"
-)
-
-# Add CORS middleware to allow cross-origin requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
-)
+dataset_path = os.environ.get('FASHION_DATASET', os.path.join(current_dir, "fashion_dataset_updated.csv"))
+
+# The questionnaire only supplies the option lists here; recommendations come from
+# the app's recommender, which is built in the background by create_app()
+questionnaire = FashionQuestionnaire(None)
+
+# Routes are collected on a router and mounted by create_app()
+router = APIRouter()
+
+# Catalog items each session has been shown or dismissed, left out of its recommendations
+seen = SeenStore.from_env()
+
+# Ranks the likely next answers of each session while it answers (None when disabled)
+speculator = Speculator.from_env(seen)
 
 # Define Pydantic models for request and response
 
@@ -130,9 +130,13 @@ class OutfitComponent(BaseModel):
 class OutfitRecommendation(BaseModel):
     outfit_number: int
     components: Dict[str, str]
+    # Catalog row id of every component, e.g. for POST /items/{id}/dismiss
+    item_ids: Optional[Dict[str, int]] = None
 
 class RecommendationsResponse(BaseModel):
     outfits: List[OutfitRecommendation]
+    # Steps cut short to meet the deadline, only present when a deadline was given
+    degraded: Optional[List[str]] = None
 
 class UserPreferences(BaseModel):
     gender: Optional[str] = None
@@ -149,8 +153,9 @@ class UserPreferences(BaseModel):
 
 # Global variable to store session state
 sessions = {}
+SESSIONS.set_function(lambda: len(sessions), app="questionnaire_api")
 
-@app.get("/", tags=["Root"])
+@router.get("/", tags=["Root"])
 def read_root():
     """Root endpoint with API information."""
     return {
@@ -165,13 +170,16 @@ def read_root():
             "GET /preferences": "Get current user preferences",
             "POST /preferences": "Submit complete user preferences",
             "GET /recommendations": "Get fashion recommendations based on current preferences",
-            "POST /reset": "Reset the questionnaire session"
+            "POST /reset": "Reset the questionnaire session",
+            "GET /metrics": "Prometheus metrics for the recommendation pipeline",
+            "GET /healthz": "Liveness probe",
+            "GET /readyz": "Readiness probe (recommender index loaded)"
         }
     }
 
 
 
-@app.get("/questions", tags=["Questions"], response_model=List[Dict[str, Any]])
+@router.get("/questions", tags=["Questions"], response_model=List[Dict[str, Any]])
 def get_all_questions():
     """Get all general questionnaire questions."""
     questions = [
@@ -188,7 +196,7 @@ def get_all_questions():
     ]
     return questions
 
-@app.get("/questions/{question_id}", tags=["Questions"])
+@router.get("/questions/{question_id}", tags=["Questions"])
 def get_question(question_id: str):
     """Get a specific questionnaire question."""
     questions_map = {
@@ -209,7 +217,7 @@ def get_question(question_id: str):
     
     return questions_map[question_id].dict()
 
-@app.post("/answers/{question_id}", tags=["Answers"])
+@router.post("/answers/{question_id}", tags=["Answers"])
 def submit_answer(question_id: str, user_selection: UserSelection):
     """Submit answer(s) to a specific question."""
     # Initialize session if needed
@@ -244,9 +252,12 @@ def submit_answer(question_id: str, user_selection: UserSelection):
         
         setattr(sessions[session_id], question_id, user_selection.selection)
     
+    if speculator is not None:
+        speculator.answered(session_id, sessions[session_id].dict(), question_id, user_selection.selection)
+    
     return {"message": f"Answer for {question_id} recorded successfully", "current_preferences": sessions[session_id]}
 
-@app.get("/item-specific-questions/{item_type}/{question_type}", tags=["Item-Specific Questions"])
+@router.get("/item-specific-questions/{item_type}/{question_type}", tags=["Item-Specific Questions"])
 def get_item_specific_question(item_type: str, question_type: str):
     """Get item-specific questions for a particular item type."""
     # Validate item type
@@ -284,7 +295,7 @@ def get_item_specific_question(item_type: str, question_type: str):
     
     return question.dict()
 
-@app.post("/item-specific-answers/{item_type}/{question_type}", tags=["Item-Specific Answers"])
+@router.post("/item-specific-answers/{item_type}/{question_type}", tags=["Item-Specific Answers"])
 def submit_item_specific_answer(item_type: str, question_type: str, user_selection: UserSelection):
     """Submit answer(s) to an item-specific question."""
     # Initialize session if needed
@@ -319,12 +330,15 @@ def submit_item_specific_answer(item_type: str, question_type: str, user_selecti
     # Store the answers
     sessions[session_id].item_specific_preferences[item_key][question_type] = user_selection.selection
     
+    if speculator is not None:
+        speculator.answered(session_id, sessions[session_id].dict())
+    
     return {
         "message": f"Item-specific answer for {item_type} {question_type} recorded successfully", 
         "current_preferences": sessions[session_id]
     }
 
-@app.get("/preferences", tags=["Preferences"], response_model=UserPreferences)
+@router.get("/preferences", tags=["Preferences"], response_model=UserPreferences)
 def get_preferences():
     """Get the current user preferences."""
     session_id = "default"
@@ -333,55 +347,148 @@ def get_preferences():
     
     return sessions[session_id]
 
-@app.post("/preferences", tags=["Preferences"])
+@router.post("/preferences", tags=["Preferences"])
 def set_preferences(preferences: UserPreferences):
     """Set complete user preferences."""
     session_id = "default"
     sessions[session_id] = preferences
     
+    if speculator is not None:
+        speculator.answered(session_id, preferences.dict())
+    
     return {"message": "Preferences updated successfully", "preferences": preferences}
 
-@app.get("/recommendations", tags=["Recommendations"], response_model=RecommendationsResponse)
-def get_recommendations():
+@router.get("/recommendations", tags=["Recommendations"], response_model=RecommendationsResponse,
+            response_model_exclude_none=True)
+def get_recommendations(recommender=Depends(get_recommender),
+                        deadline_ms: Optional[float] = Query(None, gt=0, description="Latency budget in milliseconds")):
     """Get fashion recommendations based on current preferences."""
     session_id = "default"
     if session_id not in sessions:
         raise HTTPException(status_code=400, detail="No preferences set. Please answer questionnaire first.")
     
     user_preferences = sessions[session_id].dict()
-    
-    # Process preferences to get tags
-    tags = recommender.process_user_preferences(user_preferences)
-    
-    # Add specific occasion if provided
-    if "specific_occasion" in user_preferences and user_preferences["specific_occasion"]:
-        tags.append(user_preferences["specific_occasion"].lower())
-    
-    # Add casual outfit style if provided
-    if "casual_outfit_style" in user_preferences and user_preferences["casual_outfit_style"]:
-        if "specific_occasion" in user_preferences and user_preferences["specific_occasion"] == "Casual":
-            tags.append(user_preferences["casual_outfit_style"].lower())
-    
-    # Add formal outfit color if provided
-    if "formal_outfit_color" in user_preferences and user_preferences["formal_outfit_color"]:
-        if "specific_occasion" in user_preferences and user_preferences["specific_occasion"] in ["Wedding", "Interview"]:
-            tags.append(user_preferences["formal_outfit_color"].lower())
-    
-    # Get recommendations based on tags
-    outfits = recommender.get_recommendations_from_tags(tags)
+    annotate(preferences=user_preferences)
+    
+    # Process preferences to get tags, including the occasion rules
+    # Item-specific answers only weigh on their own item type
+    tags = preference_tags(recommender, user_preferences, item_specific=False)
+    item_overrides = recommender.preference_overrides(user_preferences)
+    
+    # Get recommendations based on tags, leaving out what the session has already seen;
+    # the ranking is made ahead of time when speculation guessed the tags
+    exclude, seen_version = seen.snapshot(session_id, recommender)
+    degraded = [] if deadline_ms is not None else None
+    candidates = None
+    if speculator is not None and not item_overrides:
+        candidates = speculator.lookup(session_id, recommender, tags, seen_version)
+    if candidates is not None:
+        with stage('outfit_assembly'):
+            outfits = recommender.assemble_outfits(candidates, ' '.join(tags), 7)
+    else:
+        try:
+            outfits = recommender.get_recommendations_from_tags(tags, deadline_ms=deadline_ms, degraded=degraded,
+                                                                item_overrides=item_overrides, exclude=exclude)
+        except ValueError as e:
+            # Item-specific preferences the recommender cannot score (e.g. sharded catalogs)
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # The next request shows other garments; rank it while the user looks at these
+    seen.add(session_id, recommender, [item['row'] for outfit in outfits for item in outfit.values() if item])
+    if speculator is not None:
+        speculator.answered(session_id, user_preferences)
+    if recommender.item_json is not None:
+        return recommendation_response(outfits, recommender.item_json, degraded=degraded)
     
     # Format recommendations for display
     formatted_outfits = recommender.format_outfit_recommendations(outfits)
     
-    return {"outfits": formatted_outfits}
+    return {"outfits": formatted_outfits, "degraded": degraded}
 
-@app.post("/reset", tags=["Session"])
+@router.post("/reset", tags=["Session"])
 def reset_session():
     """Reset the questionnaire session."""
     session_id = "default"
     sessions[session_id] = UserPreferences()
+    seen.reset(session_id)
+    if speculator is not None:
+        speculator.reset(session_id)
     
     return {"message": "Session reset successfully"}
 
+@router.post("/items/{item_id}/dismiss", tags=["Session"])
+def dismiss_item(item_id: int, recommender=Depends(get_recommender)):
+    """Dismiss a catalog item so the session's recommendations no longer include it."""
+    session_id = "default"
+    if not 0 <= item_id < len(recommender.df):
+        raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+    seen.add(session_id, recommender, [item_id])
+    if speculator is not None and session_id in sessions:
+        speculator.answered(session_id, sessions[session_id].dict())
+    
+    return {"message": f"Item {item_id} dismissed", "seen_items": seen.stats(session_id)}
+
+@router.get("/speculation", tags=["Session"])
+def get_speculation():
+    """Get the hit rate and CPU time of the speculative rankings."""
+    if speculator is None:
+        return {"enabled": False}
+    return dict(speculator.stats(), enabled=True)
+
+def create_app(dataset_path=dataset_path, warmup_queries=None):
+    """
+    Create the API app; the recommender is built in the background once it starts
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        warmup_queries (int): Synthetic queries run before reporting ready
+            (defaults to FASHION_WARMUP_QUERIES)
+
+    Returns:
+        FastAPI: The app
+    """
+    app = FastAPI(
+        title="Fashion Questionnaire API",
+        description="API for collecting fashion preferences and providing personalized recommendations",
+        version="1.0.0"
+    )
+
+    # Shed load with quick 503s instead of queueing requests until clients time out;
+    # installed first so the CORS headers are added to the rejections as well
+    install_admission(app, "questionnaire_api")
+
+    # Add CORS middleware to allow cross-origin requests
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allows all origins
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods
+        allow_headers=["*"],  # Allows all headers
+    )
+    app.include_router(router)
+
+    if warmup_queries is None:
+        warmup_queries = warmup_queries_from_env()
+    warmup = Warmup(dataset_path, "questionnaire_api", warmup_queries=warmup_queries)
+    install_health(app, warmup)
+    if speculator is not None:
+        speculator.get_recommender = lambda: warmup.recommender
+
+    # Further catalogs selected with ?catalog=<id>, built on first use
+    install_catalogs(app, "questionnaire_api")
+
+    # Expose per-stage timings and request latency on GET /metrics
+    install_metrics(app, "questionnaire_api")
+    seen.install_metrics("questionnaire_api")
+
+    # Admin-only debugging routes, enabled by FASHION_ADMIN_TOKEN
+    install_admin(app, get_recommender=lambda: warmup.recommender, sessions=sessions)
+    return app
+
+
+# App for "uvicorn fashion_questionnaire_api:app"; importing it is cheap
+app = create_app()
+
+
 if __name__ == "__main__":
-    uvicorn.run("fashion_questionnaire_api:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("fashion_questionnaire_api:create_app", factory=True, host="0.0.0.0", port=8000, reload=True)
@@ -5,31 +5,258 @@ Fashion Recommendation System Core Module
 This module provides a fashion recommendation engine that suggests outfits based on 
 user input (questions, tags, or preferences).
 """
-import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from concurrent.futures import ThreadPoolExecutor
+import os
 import random
+import threading
+import time
 import json
 
+from fashion_deadline import Deadline, StageCosts
+from fashion_metrics import annotate, count_cache, count_path, stage, timed
+
+# pandas and scikit-learn are imported where they are first used, so importing this
+# module stays cheap and the API processes can open their port before loading them
+
+# Columns of the dataset the recommender uses; any other column is never parsed
+CATALOG_COLUMNS = ['QuestionText', 'AnswerText', 'Tags']
+
+# Extensions of the columnar catalog formats (see fashion_columnar.py)
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+
+# Facets whose TF-IDF columns can be weighted separately, in the order a term found in
+# several vocabularies is assigned ('casual' is a style before it is an occasion);
+# columns of no vocabulary form the 'other' facet
+FACETS = ('item_type', 'style', 'color', 'material', 'occasion', 'season', 'other')
+
+
+def top_k(scores, k, indices=None):
+    """
+    Select the k highest scores in descending order
+    
+    Ties are broken by the lower id, which matches a stable sort over ids in
+    ascending order.
+    
+    Args:
+        scores (np.ndarray): Scores to rank
+        k (int): Number of entries to keep
+        indices (np.ndarray): Ids aligned with scores (defaults to positions)
+        
+    Returns:
+        tuple: (ids, scores) arrays of the top k entries
+    """
+    scores = np.asarray(scores)
+    indices = np.arange(len(scores)) if indices is None else np.asarray(indices)
+    if k <= 0 or len(scores) == 0:
+        return indices[:0], scores[:0]
+    
+    if k < len(scores):
+        # Partition around the k-th largest score and fill the remaining
+        # slots from the ties with the lowest ids
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        ties = ties[np.argsort(indices[ties], kind='stable')][:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(len(scores))
+    
+    order = candidates[np.lexsort((indices[candidates], -scores[candidates]))]
+    return indices[order], scores[order]
+
+
+def read_csv_rows(dataset_path, rows, chunksize=100000):
+    """
+    Read only the given rows of a dataset CSV without holding the whole file in memory
+    
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        rows (np.ndarray): Sorted row ids to keep
+        chunksize (int): Number of rows parsed at a time
+        
+    Returns:
+        pd.DataFrame: The selected rows, renumbered from zero
+    """
+    import pandas as pd
+
+    rows = np.asarray(rows)
+    chunks = []
+    for chunk in pd.read_csv(dataset_path, usecols=CATALOG_COLUMNS, chunksize=chunksize):
+        first = chunk.index[0]
+        selected = rows[(rows >= first) & (rows < first + len(chunk))]
+        chunks.append(chunk.loc[selected])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def compact_catalog(df):
+    """
+    Merge the rows of a catalog that describe the same item
+
+    Rows with the same AnswerText become one canonical record, in order of first
+    occurrence, whose Tags are the union of the rows' tags (in order of first
+    occurrence) and whose QuestionText is that of its first row.
+
+    Args:
+        df (pd.DataFrame): Catalog with QuestionText, AnswerText and Tags columns
+
+    Returns:
+        tuple: (compacted pd.DataFrame with an added Multiplicity column,
+            np.ndarray mapping every source row to its compacted row)
+    """
+    import pandas as pd
+
+    item_of_row, answers = pd.factorize(df['AnswerText'])
+    tag_lists = df['Tags'].str.split(',')
+    tags = pd.DataFrame({
+        'item': np.repeat(item_of_row, tag_lists.str.len().to_numpy()),
+        'tag': [tag for tag_list in tag_lists for tag in tag_list]
+    }).drop_duplicates()
+
+    compacted = pd.DataFrame({
+        'QuestionText': df['QuestionText'].groupby(item_of_row).first().to_numpy(),
+        'AnswerText': np.asarray(answers, dtype=object),
+        'Tags': tags.groupby('item')['tag'].agg(','.join).to_numpy(),
+        'Multiplicity': np.bincount(item_of_row, minlength=len(answers))
+    })
+    return compacted, item_of_row.astype(np.int32)
+
+
+def freeze_arrays(*arrays):
+    """
+    Mark numpy arrays (or the buffers of sparse matrices) read-only
+    
+    Shared index structures are frozen after construction so that concurrent
+    requests can only read them.
+    
+    Args:
+        *arrays: numpy arrays or scipy sparse matrices
+    """
+    for array in arrays:
+        for buffer in (getattr(array, name, None) for name in ('data', 'indices', 'indptr')):
+            if isinstance(buffer, np.ndarray):
+                buffer.flags.writeable = False
+        if isinstance(array, np.ndarray):
+            array.flags.writeable = False
+
 
 class FashionRecommender:
     """Fashion recommendation engine that suggests outfits based on tags or questions."""
     
-    def __init__(self, dataset_path):
+    def __init__(self, dataset_path, ann_index_path=None, n_probe=None, rows=None, vectorizer=None,
+                 grid_path=None, compact=False, fast_json=False, neighbours_path=None):
         """
         Initialize the Fashion Recommender model
-        
+
         Args:
             dataset_path (str): Path to the fashion dataset CSV
+            ann_index_path (str): Optional path to a prebuilt IVF index (see fashion_ann_index.py)
+            n_probe (int): Number of IVF clusters to probe per query (None for the index default)
+            rows (np.ndarray): Optional sorted row ids to load instead of the whole dataset
+            vectorizer (TfidfVectorizer): Optional vectorizer already fitted on the full dataset
+            grid_path (str): Optional path to a materialized grid (see fashion_grid.py)
+            compact (bool): Merge rows describing the same item before indexing
+            fast_json (bool): Pre-encode the items for fast JSON responses (see fashion_fast_json.py)
+            neighbours_path (str): Optional path to a neighbour table (see fashion_neighbours.py)
         """
-        # Load the dataset
-        self.df = pd.read_csv(dataset_path)
-        
+        import pandas as pd
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        # Load the dataset; columnar catalogs come with their tags pre-tokenized
+        tag_codes = None
+        if os.path.splitext(dataset_path)[1].lower() in COLUMNAR_EXTENSIONS:
+            from fashion_columnar import read_columnar
+            self.df, tag_codes = read_columnar(dataset_path, rows)
+        elif rows is None:
+            self.df = pd.read_csv(dataset_path, usecols=CATALOG_COLUMNS)
+        else:
+            self.df = read_csv_rows(dataset_path, rows)
+
+        # Index one canonical record per item, keeping the map back to the source rows
+        self.item_of_row = None
+        self.compaction = None
+        if compact:
+            start = time.perf_counter()
+            source_rows = len(self.df)
+            self.source_questions = self.df['QuestionText'].to_numpy()
+            self.df, self.item_of_row = compact_catalog(self.df)
+            # Merged tags are no longer those of the pre-tokenized rows
+            tag_codes = None
+            self._item_sources = np.argsort(self.item_of_row, kind='stable')
+            self._item_offsets = np.concatenate([[0], np.cumsum(self.df['Multiplicity'].to_numpy())])
+            self.compaction = {'source_rows': source_rows, 'items': len(self.df),
+                               'seconds': time.perf_counter() - start}
+
         # Create tag embeddings
-        self.vectorizer = TfidfVectorizer()
-        self.tag_matrix = self.vectorizer.fit_transform(self.df['Tags'])
+        if vectorizer is not None:
+            self.vectorizer = vectorizer
+            self.tag_matrix = self.vectorizer.transform(self.df['Tags'])
+        elif tag_codes is not None:
+            self.vectorizer, self.tag_matrix = tag_codes.fit_tfidf()
+        else:
+            self.vectorizer = TfidfVectorizer()
+            self.tag_matrix = self.vectorizer.fit_transform(self.df['Tags'])
+
+        self._init_query_state()
+
+        # Precompute the row ids of the items belonging to each item type
+        if tag_codes is not None:
+            self.category_indices = {item_type: tag_codes.rows_matching(item_type)
+                                     for item_type in self.category_mapping}
+        else:
+            self.category_indices = {
+                item_type: np.flatnonzero(self.df['Tags'].str.contains(item_type).to_numpy())
+                for item_type in self.category_mapping
+            }
+
+        # Encode the JSON of every item once for the fast response path
+        if fast_json:
+            from fashion_fast_json import encode_item_fragments
+            self.item_json = encode_item_fragments(self.df['AnswerText'])
+        
+        # Load the approximate nearest-neighbour index if one was provided
+        self.n_probe = n_probe
+        if ann_index_path:
+            from fashion_ann_index import IVFIndex
+            self.ann_index = IVFIndex.load(ann_index_path)
+            self.ann_index.attach(self)
+        
+        # Attach the materialized grid of precomputed rankings if one was provided
+        if grid_path:
+            from fashion_grid import RecommendationGrid
+            self.grid = RecommendationGrid(grid_path)
+            self.grid.validate(self)
+        
+        # Attach the precomputed item-to-item neighbours if a table was provided
+        if neighbours_path:
+            from fashion_neighbours import NeighbourTable
+            self.neighbours = NeighbourTable.load(neighbours_path)
+            self.neighbours.validate(self)
+        
+        # The index is shared by concurrent requests and never modified after this point
+        freeze_arrays(self.tag_matrix, *self.category_indices.values())
+
+    def _init_query_state(self):
+        """Define the vocabularies and the per-process query state shared by every recommender."""
+        self._define_vocabularies()
+        self._define_facet_blocks()
+
+        # Optional structures, attached by the constructor when configured
+        self.item_json = None
+        self.ann_index = None
+        self.n_probe = None
+        self.grid = None
+        self.neighbours = None
         
+        # Question vectors for the no-tag fallback are built on first use
+        self._question_index = None
+        self._question_index_lock = threading.Lock()
+        
+        # Recent step durations, used to plan requests that carry a deadline
+        self.stage_costs = StageCosts()
+
+    def _define_vocabularies(self):
+        """Define the item type categories and the tag vocabularies used for extraction."""
         # Map item types to categories
         self.category_mapping = {
             'shirt': 'topwear', 'jacket': 'topwear', 'blazer': 'topwear', 'suit': 'topwear',
@@ -45,25 +272,335 @@ class FashionRecommender:
         self.materials = ['cotton', 'denim', 'leather', 'linen', 'nylon', 'silk', 'suede', 'wool']
         self.occasions = ['casual', 'concert', 'date', 'indoor', 'interview', 'office', 'outdoor', 'party', 'wedding']
         self.seasons = ['autumn', 'spring', 'summer', 'winter']
+
+    def _define_facet_blocks(self):
+        """Assign every TF-IDF column to the facet whose vocabulary contains its term."""
+        vocabularies = [self.item_types, self.styles, self.colors, self.materials, self.occasions, self.seasons]
+        vocabulary = self.vectorizer.vocabulary_
+        self.column_facet = np.full(len(vocabulary), FACETS.index('other'), dtype=np.int8)
+        # Assign in reverse so a term of several vocabularies ends up in the first one
+        for facet in reversed(range(len(vocabularies))):
+            self.column_facet[[vocabulary[term] for term in vocabularies[facet] if term in vocabulary]] = facet
+        self.facet_blocks = {facet: np.flatnonzero(self.column_facet == position)
+                             for position, facet in enumerate(FACETS)}
+
+    def facet_query_vectors(self, tags, facet_weights=None, item_overrides=None):
+        """
+        Build the weighted TF-IDF query vectors of a facet query
+        
+        Every column of a query vector is scaled by the weight of its facet's block. An
+        item type with an override gets its own query row, with the override's tags added
+        and its facet weights applied on top of the shared ones.
+        
+        Args:
+            tags (list): Tags shared by all item types
+            facet_weights (dict): Weight per facet name (see FACETS, default 1.0)
+            item_overrides (dict): Mapping of item type to a dict with extra 'tags' and
+                'facet_weights' for that item type only
+            
+        Returns:
+            tuple: (query matrix with the shared query in row 0, mapping of
+                overridden item type to its row)
+        """
+        from sklearn.preprocessing import normalize
+
+        rows = [(list(tags), dict(facet_weights or {}))]
+        row_of_type = {}
+        for item_type, override in (item_overrides or {}).items():
+            if item_type not in self.category_mapping:
+                raise ValueError(f"Unknown item type: {item_type}")
+            row_of_type[item_type] = len(rows)
+            rows.append((list(tags) + list(override.get('tags', [])),
+                         dict(rows[0][1], **override.get('facet_weights', {}))))
+        
+        with stage('vectorize'):
+            query_vectors = self.vectorizer.transform([' '.join(row_tags) for row_tags, _ in rows])
+            for position, (_, weights) in enumerate(rows):
+                unknown = set(weights) - set(FACETS)
+                if unknown:
+                    raise ValueError(f"Unknown facets: {', '.join(sorted(unknown))}")
+                if all(weight == 1.0 for weight in weights.values()):
+                    continue
+                # Scale the row's columns by their facet block's weight
+                block_weights = np.array([weights.get(facet, 1.0) for facet in FACETS])
+                start, end = query_vectors.indptr[position], query_vectors.indptr[position + 1]
+                query_vectors.data[start:end] *= block_weights[self.column_facet[query_vectors.indices[start:end]]]
+            query_vectors = normalize(query_vectors)
+        return query_vectors, row_of_type
+
+    def collect_facet_candidates(self, query_vectors, row_of_type, n_per_type, exclude=None):
+        """
+        Collect the candidates of a facet query from one sparse product of all its rows
+        
+        Args:
+            query_vectors (scipy.sparse matrix): Query rows from facet_query_vectors()
+            row_of_type (dict): Mapping of overridden item type to its query row
+            n_per_type (int): Number of items to keep per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+            
+        Returns:
+            dict: Mapping of category to candidate item dicts
+        """
+        if not row_of_type:
+            return self.collect_candidates(query_vectors, n_per_type, exclude)
+        ranked_rows = self.rank_candidates_batch(query_vectors, n_per_type, exclude=exclude)
+        with stage('candidate_build'):
+            return self.build_candidates({item_type: ranked_rows[row_of_type.get(item_type, 0)][item_type]
+                                          for item_type in self.category_mapping})
+
+    def rank_candidates(self, query_vector, n_per_type, exact=False, exclude=None):
+        """
+        Rank the items of every item type by similarity to a query vector
+        
+        Args:
+            query_vector (scipy.sparse matrix): TF-IDF vector of the query
+            n_per_type (int): Number of items to keep per item type
+            exact (bool): Ignore the ANN index and score the whole catalog
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+            
+        Returns:
+            dict: Mapping of item type to (row ids, similarity scores) in descending order
+        """
+        return self.rank_candidates_batch(query_vector, n_per_type, exact=exact, exclude=exclude)[0]
+    
+    def rank_candidates_batch(self, query_vectors, n_per_type, exact=False, exclude=None):
+        """
+        Rank the items of every item type for a batch of query vectors
         
-    def get_recommendations_from_tags(self, tags, n_recommendations=7):
+        Args:
+            query_vectors (scipy.sparse matrix): One TF-IDF row per query
+            n_per_type (int): Number of items to keep per item type
+            exact (bool): Ignore the ANN index and score the whole catalog
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return;
+                their scores are zeroed before the top-k selection
+            
+        Returns:
+            list: One mapping of item type to (row ids, similarity scores) per query
+        """
+        if self.ann_index is not None and not exact:
+            with stage('similarity'):
+                return [self.ann_index.search(query_vectors[position], n_per_type, n_probe=self.n_probe,
+                                              exclude=exclude)
+                        for position in range(query_vectors.shape[0])]
+        
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        # Calculate similarity scores of the whole batch against the whole catalog
+        with stage('similarity'):
+            similarities = cosine_similarity(query_vectors, self.tag_matrix)
+            if exclude is not None:
+                # Zero scores rank below every relevant item and are never built into candidates
+                similarities[:, exclude] = 0.0
+        
+        with stage('category_filter'):
+            return [
+                {
+                    item_type: top_k(row[indices], n_per_type, indices)
+                    for item_type, indices in self.category_indices.items()
+                }
+                for row in similarities
+            ]
+        
+    def get_recommendations_from_tags(self, tags, n_recommendations=7, seed=None, deadline_ms=None, degraded=None,
+                                      facet_weights=None, item_overrides=None, exclude=None):
         """
         Get fashion recommendations based on input tags
         
         Args:
             tags (list): List of tags (e.g., ['casual', 'summer', 'blue'])
             n_recommendations (int): Number of outfit combinations to recommend
+            seed (int): Optional seed for a reproducible outfit draw
+            deadline_ms (float): Optional latency budget; cheaper steps are taken to meet it
+                (see fashion_deadline.py)
+            degraded (list): Optional list collecting the steps degraded to meet the deadline
+            facet_weights (dict): Optional weight per facet (see facet_query_vectors())
+            item_overrides (dict): Optional extra tags and facet weights per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to recommend
             
         Returns:
             dict: Dictionary containing outfit recommendations
         """
-        query_tags = ' '.join(tags)
-        query_vector = self.vectorizer.transform([query_tags])
+        deadline = Deadline(deadline_ms, degraded) if deadline_ms is not None else None
+        return self._recommend_tags(tags, n_recommendations, seed, deadline, facet_weights, item_overrides, exclude)
+    
+    def _recommend_tags(self, tags, n_recommendations, seed, deadline, facet_weights=None, item_overrides=None,
+                        exclude=None):
+        """Score tags and draw outfits, degrading steps that do not fit into the deadline."""
+        recommendations = self.candidates_from_tags(tags, n_recommendations, deadline, facet_weights, item_overrides,
+                                                    exclude)
+        with stage('outfit_assembly'):
+            return self.assemble_outfits(recommendations, ' '.join(tags), n_recommendations, random.Random(seed))
+    
+    def candidates_from_tags(self, tags, n_per_type, deadline=None, facet_weights=None, item_overrides=None,
+                             exclude=None):
+        """
+        Collect the candidates of every category for input tags
         
-        # Calculate similarity scores
-        similarities = cosine_similarity(query_vector, self.tag_matrix).flatten()
+        Args:
+            tags (list): List of tags
+            n_per_type (int): Number of candidates to keep per item type
+            deadline (Deadline): Optional budget; cheaper steps are taken to meet it
+            facet_weights (dict): Optional weight per facet (see facet_query_vectors())
+            item_overrides (dict): Optional extra tags and facet weights per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+            
+        Returns:
+            dict: Mapping of category to candidate item dicts, best first
+        """
+        count_path('tags')
+        # Stored rankings and the plain query only cover unweighted tags
+        weighted = bool(item_overrides) or any(weight != 1.0 for weight in (facet_weights or {}).values())
+        
+        # Serve the ranking from the materialized grid when the tags match a stored cell;
+        # excluded rows are dropped from the stored ranking, which must still cover n_per_type
+        ranked = None
+        if self.grid is not None and not weighted:
+            with stage('grid_lookup'):
+                ranked = self.grid.lookup(tags, n_per_type, exclude)
+                if (ranked is None and deadline is not None
+                        and (n_per_type > self.grid.depth or exclude is not None)
+                        and not deadline.allows(self.stage_costs.estimate('ranking'))):
+                    # A shallower stored ranking is better than none when live scoring is too slow
+                    ranked = self.grid.lookup(tags, min(n_per_type, self.grid.depth), exclude, partial=True)
+                    if ranked is not None:
+                        deadline.degrade('depth')
+                        self.stage_costs.skipped('ranking')
+            count_cache('grid', ranked is not None)
+        
+        if ranked is not None:
+            count_path('grid')
+            with stage('candidate_build'):
+                recommendations = self.build_candidates(ranked)
+        else:
+            if deadline is not None:
+                n_per_type = self._deadline_depth(deadline, n_per_type)
+                if n_per_type == 0:
+                    count_path('deadline_skipped')
+                    annotate(tags=list(tags))
+                    return {category: [] for category in ('topwear', 'bottomwear', 'footwear', 'accessory')}
+            if weighted:
+                count_path('facets')
+                query_vectors, row_of_type = self.facet_query_vectors(tags, facet_weights, item_overrides)
+                recommendations = self.collect_facet_candidates(query_vectors, row_of_type, n_per_type, exclude)
+            else:
+                with stage('vectorize'):
+                    query_vector = self.vectorizer.transform([' '.join(tags)])
+                # Get recommendations for each category
+                recommendations = self.collect_candidates(query_vector, n_per_type, exclude)
+        annotate(tags=list(tags), candidates={category: len(items) for category, items in recommendations.items()})
+        return recommendations
+    
+    def _deadline_depth(self, deadline, n_per_type):
+        """
+        Get the number of candidates per item type live scoring can afford before a deadline
+        
+        Args:
+            deadline (Deadline): Budget of the request
+            n_per_type (int): Number of candidates requested per item type
+            
+        Returns:
+            int: Affordable depth, or 0 if scoring cannot finish in time
+        """
+        remaining = deadline.remaining() - self.stage_costs.estimate('ranking')
+        if remaining <= 0:
+            deadline.degrade('scoring')
+            # Let the estimate drift down so a later request measures scoring again
+            self.stage_costs.skipped('ranking')
+            return 0
+        # Building candidates costs the same for every item, so its share shrinks with the depth
+        per_type = self.stage_costs.estimate('candidate_build') * len(self.category_mapping)
+        if per_type * n_per_type > remaining:
+            deadline.degrade('depth')
+            return max(1, int(remaining / per_type))
+        return n_per_type
+    
+    def get_recommendations_batch(self, tag_lists, n_recommendations=7, seed=None, n_threads=1, chunk_size=64):
+        """
+        Get fashion recommendations for many tag lists at once
+        
+        Queries are vectorized and scored in chunks; with n_threads > 1 the chunks are
+        spread over a thread pool. Every query draws from its own RNG (seeded with
+        seed + position when a seed is given), so results do not depend on n_threads.
+        
+        Args:
+            tag_lists (list): Lists of tags, one per query
+            n_recommendations (int): Number of outfit combinations to recommend per query
+            seed (int): Optional base seed for reproducible outfit draws
+            n_threads (int): Number of threads scoring chunks in parallel
+            chunk_size (int): Number of queries scored together
+            
+        Returns:
+            list: Outfit lists in input order
+        """
+        query_tags = [' '.join(tags) for tags in tag_lists]
+        
+        def score_chunk(first):
+            chunk = query_tags[first:first + chunk_size]
+            with stage('vectorize'):
+                query_vectors = self.vectorizer.transform(chunk)
+            batch = self.collect_candidates_batch(query_vectors, n_recommendations)
+            with stage('outfit_assembly'):
+                return [
+                    self.assemble_outfits(recommendations, tags, n_recommendations,
+                                          random.Random(None if seed is None else seed + first + offset))
+                    for offset, (recommendations, tags) in enumerate(zip(batch, chunk))
+                ]
+        
+        firsts = range(0, len(query_tags), chunk_size)
+        if n_threads > 1:
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                chunks = list(executor.map(score_chunk, firsts))
+        else:
+            chunks = [score_chunk(first) for first in firsts]
+        return [outfits for chunk in chunks for outfits in chunk]
+    
+    def collect_candidates(self, query_vector, n_recommendations, exclude=None):
+        """
+        Collect the most similar items of every category for a query vector
+        
+        Args:
+            query_vector (scipy.sparse matrix): TF-IDF vector of the query
+            n_recommendations (int): Number of items to keep per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+            
+        Returns:
+            dict: Mapping of category to candidate item dicts
+        """
+        return self.collect_candidates_batch(query_vector, n_recommendations, exclude)[0]
+    
+    def collect_candidates_batch(self, query_vectors, n_recommendations, exclude=None):
+        """
+        Collect the most similar items of every category for a batch of query vectors
         
-        # Get recommendations for each category
+        Args:
+            query_vectors (scipy.sparse matrix): One TF-IDF row per query
+            n_recommendations (int): Number of items to keep per item type
+            exclude (np.ndarray): Optional boolean mask of catalog rows never to return
+            
+        Returns:
+            list: One mapping of category to freshly built candidate item dicts per query
+        """
+        start = time.perf_counter()
+        ranked_batch = self.rank_candidates_batch(query_vectors, n_recommendations, exclude=exclude)
+        ranked_at = time.perf_counter()
+        with stage('candidate_build'):
+            batch = [self.build_candidates(ranked) for ranked in ranked_batch]
+        n_candidates = sum(len(ids) for ranked in ranked_batch for ids, _ in ranked.values())
+        self.stage_costs.observe('ranking', (ranked_at - start) / len(ranked_batch))
+        if n_candidates:
+            self.stage_costs.observe('candidate_build', (time.perf_counter() - ranked_at) / n_candidates)
+        return batch
+    
+    def build_candidates(self, ranked):
+        """
+        Build the candidate item dicts of every category from ranked row ids
+        
+        Args:
+            ranked (dict): Mapping of item type to (row ids, similarity scores)
+            
+        Returns:
+            dict: Mapping of category to freshly built candidate item dicts
+        """
         recommendations = {
             'topwear': [],
             'bottomwear': [],
@@ -71,24 +608,33 @@ class FashionRecommender:
             'accessory': []
         }
         
-        # Filter dataset by categories and get the most similar items
-        for category, items in self.category_mapping.items():
-            category_df = self.df[self.df['Tags'].str.contains(category)]
-            if not category_df.empty:
-                category_indices = category_df.index.tolist()
-                category_similarities = [(idx, similarities[idx]) for idx in category_indices]
-                top_indices = sorted(category_similarities, key=lambda x: x[1], reverse=True)[:n_recommendations]
-                
-                # Add recommendations
-                category_type = self.category_mapping[category]
-                for idx, sim_score in top_indices:
-                    if sim_score > 0:  # Only consider somewhat relevant matches
-                        answer = self.df.iloc[idx]['AnswerText']
-                        recommendations[category_type].append({
-                            'item': answer,
-                            'similarity': float(sim_score),
-                            'tags': self.df.iloc[idx]['Tags']
-                        })
+        for item_type, (top_indices, top_scores) in ranked.items():
+            category_type = self.category_mapping[item_type]
+            for idx, sim_score in zip(top_indices, top_scores):
+                if sim_score > 0:  # Only consider somewhat relevant matches
+                    recommendations[category_type].append({
+                        'item': self.df['AnswerText'].iat[idx],
+                        'similarity': float(sim_score),
+                        'tags': self.df['Tags'].iat[idx],
+                        'row': int(idx)
+                    })
+        return recommendations
+    
+    def assemble_outfits(self, recommendations, query_tags, n_recommendations, rng=None):
+        """
+        Combine per-category candidates into complete outfits
+        
+        Args:
+            recommendations (dict): Mapping of category to candidate item dicts (consumed)
+            query_tags (str): Space-separated query tags
+            n_recommendations (int): Number of outfit combinations to recommend
+            rng (random.Random): Per-call random generator (a fresh one if None)
+            
+        Returns:
+            list: Outfit dictionaries
+        """
+        if rng is None:
+            rng = random.Random()
         
         # Create outfit combinations
         outfits = []
@@ -101,7 +647,7 @@ class FashionRecommender:
                     # Get random item from top recommendations if available
                     available_items = recommendations[category]
                     if available_items:
-                        item = random.choice(available_items)
+                        item = rng.choice(available_items)
                         outfit[category] = item
                         # Remove the item to avoid duplicates in other outfits
                         recommendations[category].remove(item)
@@ -110,7 +656,7 @@ class FashionRecommender:
             
             # Add accessory only if it's relevant to the query
             if recommendations['accessory'] and any(tag in query_tags for tag in ['jewelry', 'scarf']):
-                item = random.choice(recommendations['accessory'])
+                item = rng.choice(recommendations['accessory'])
                 outfit['accessory'] = item
                 recommendations['accessory'].remove(item)
             
@@ -120,69 +666,237 @@ class FashionRecommender:
         
         return outfits
     
-    def get_recommendations_from_question(self, question, n_recommendations=7):
+    def get_recommendations_from_question(self, question, n_recommendations=7, seed=None, deadline_ms=None,
+                                          degraded=None):
         """
         Get fashion recommendations based on a natural language question
         
         Args:
             question (str): Natural language question (e.g., "What should I wear for a casual summer event?")
             n_recommendations (int): Number of outfit combinations to recommend
+            seed (int): Optional seed for a reproducible outfit draw
+            deadline_ms (float): Optional latency budget; cheaper steps are taken to meet it
+                (see fashion_deadline.py)
+            degraded (list): Optional list collecting the steps degraded to meet the deadline
             
         Returns:
             dict: Dictionary containing outfit recommendations
         """
+        deadline = Deadline(deadline_ms, degraded) if deadline_ms is not None else None
+        # Get recommendations based on extracted tags
+        return self._recommend_tags(self.question_tags(question, deadline), n_recommendations, seed, deadline)
+    
+    def question_tags(self, question, deadline=None):
+        """
+        Get the tags to score a question with
+        
+        Args:
+            question (str): Natural language question
+            deadline (Deadline): Optional budget; the closest-question search is skipped
+                if it does not fit
+            
+        Returns:
+            list: Tags mentioned in the question, or the tags of the closest dataset
+                question if it mentions none
+        """
         # Extract tags from the question
+        with stage('tag_extraction'):
+            extracted_tags = self.extract_tags(question)
+        
+        # If no tags were extracted, try to find closest question in dataset
+        if not extracted_tags:
+            # Building the question index on first use never fits into a deadline
+            warm = self._question_index is not None
+            if deadline is not None and not (warm and deadline.allows(self.stage_costs.estimate('question_fallback'))):
+                deadline.degrade('question_fallback')
+                if warm:
+                    self.stage_costs.skipped('question_fallback')
+                return extracted_tags
+            count_path('question_fallback')
+            start = time.perf_counter()
+            with stage('question_fallback'):
+                extracted_tags = self.closest_question_tags(question)
+            if warm:
+                self.stage_costs.observe('question_fallback', time.perf_counter() - start)
+        else:
+            count_path('question_tags')
+        return extracted_tags
+    
+    def extract_tags(self, question):
+        """
+        Extract known item types, styles, colors, materials, occasions and seasons from a question
+        
+        Args:
+            question (str): Natural language question
+            
+        Returns:
+            list: Extracted tags
+        """
         extracted_tags = []
+        question = question.lower()
         
         # Extract item types
         for item in self.item_types:
-            if item in question.lower():
+            if item in question:
                 extracted_tags.append(item)
         
         # Extract styles
         for style in self.styles:
-            if style in question.lower():
+            if style in question:
                 extracted_tags.append(style)
         
         # Extract colors
         for color in self.colors:
-            if color in question.lower():
+            if color in question:
                 extracted_tags.append(color)
         
         # Extract materials
         for material in self.materials:
-            if material in question.lower():
+            if material in question:
                 extracted_tags.append(material)
         
         # Extract occasions
         for occasion in self.occasions:
-            if occasion in question.lower():
+            if occasion in question:
                 extracted_tags.append(occasion)
         
         # Extract seasons
         for season in self.seasons:
-            if season in question.lower():
+            if season in question:
                 extracted_tags.append(season)
         
-        # If no tags were extracted, try to find closest question in dataset
-        if not extracted_tags:
-            # Use TF-IDF vectorization for questions
-            question_vectorizer = TfidfVectorizer()
-            question_matrix = question_vectorizer.fit_transform(self.df['QuestionText'])
-            question_vector = question_vectorizer.transform([question])
-            
-            # Calculate similarity scores
-            similarities = cosine_similarity(question_vector, question_matrix).flatten()
-            top_idx = similarities.argsort()[-1]  # Get the most similar question
+        return extracted_tags
+    
+    def closest_question_tags(self, question):
+        """
+        Get the tags of the dataset question most similar to a question
+        
+        Args:
+            question (str): Natural language question
             
-            # Extract tags from the closest question's tags
-            closest_tags = self.df.iloc[top_idx]['Tags']
-            extracted_tags = closest_tags.split(',')
+        Returns:
+            list: Tags of the closest dataset question
+        """
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        # Use TF-IDF vectorization for questions
+        question_vectorizer, question_matrix = self.question_index()
+        question_vector = question_vectorizer.transform([question])
         
-        # Get recommendations based on extracted tags
-        return self.get_recommendations_from_tags(extracted_tags, n_recommendations)
+        # Calculate similarity scores
+        similarities = cosine_similarity(question_vector, question_matrix).flatten()
+        top_idx = similarities.argsort()[-1]  # Get the most similar question
+        
+        # Extract tags from the closest question's tags
+        if self.item_of_row is not None:
+            top_idx = self.item_of_row[top_idx]
+        closest_tags = self.df.iloc[top_idx]['Tags']
+        return closest_tags.split(',')
+    
+    def item_sources(self, row):
+        """
+        Get the source rows merged into an item of a compacted catalog
         
-    def process_user_preferences(self, preferences):
+        Args:
+            row (int): Row id of the item in the indexed catalog
+            
+        Returns:
+            list: (source row id, QuestionText) pairs, in source order
+        """
+        if self.item_of_row is None:
+            return [(row, self.df['QuestionText'].iat[row])]
+        source_rows = self._item_sources[self._item_offsets[row]:self._item_offsets[row + 1]]
+        return [(int(source_row), self.source_questions[source_row]) for source_row in source_rows]
+    
+    def question_index(self):
+        """
+        Get the TF-IDF index over the dataset questions, building it once on first use
+        
+        Returns:
+            tuple: (fitted question vectorizer, question matrix)
+        """
+        count_cache('question_index', self._question_index is not None)
+        if self._question_index is None:
+            with self._question_index_lock:
+                # Another thread may have built it while we waited
+                if self._question_index is None:
+                    from sklearn.feature_extraction.text import TfidfVectorizer
+                    question_vectorizer = TfidfVectorizer()
+                    # A compacted catalog still matches against every source question
+                    questions = self.df['QuestionText'] if self.item_of_row is None else self.source_questions
+                    question_matrix = question_vectorizer.fit_transform(questions)
+                    freeze_arrays(question_matrix)
+                    self._question_index = (question_vectorizer, question_matrix)
+        return self._question_index
+
+    def memory_report(self):
+        """
+        Break down the memory held by the recommender's data structures
+
+        Returns:
+            dict: Bytes per structure ('dataframe' per column, 'tag_matrix' per CSR
+                array, 'vocabulary', 'category_indices', 'caches', 'item_json',
+                'compaction', 'ann_index', 'neighbours'), their total and the process
+                resident set size
+        """
+        import sys
+
+        from fashion_memory import array_bytes, deep_sizeof, object_array_bytes, resident_bytes
+
+        report = {}
+        df = getattr(self, 'df', None)
+        if df is not None:
+            # deep=True counts the Python strings behind the object columns
+            columns = df.memory_usage(deep=True, index=False)
+            report['dataframe'] = {column: int(nbytes) for column, nbytes in columns.items()}
+            report['dataframe']['index'] = int(df.index.memory_usage(deep=True))
+        tag_matrix = getattr(self, 'tag_matrix', None)
+        if tag_matrix is not None:
+            report['tag_matrix'] = {name: int(getattr(tag_matrix, name).nbytes)
+                                    for name in ('data', 'indices', 'indptr')}
+        report['vocabulary'] = {
+            'vocabulary_dict': deep_sizeof(self.vectorizer.vocabulary_),
+            'idf': array_bytes(self.vectorizer.idf_)
+        }
+        if hasattr(self, 'category_indices'):
+            report['category_indices'] = sum(array_bytes(ids) for ids in self.category_indices.values())
+
+        question_index = getattr(self, '_question_index', None)
+        report['caches'] = {'question_index': 0 if question_index is None else (
+            deep_sizeof(question_index[0].vocabulary_) + array_bytes(question_index[0].idf_)
+            + array_bytes(question_index[1]))}
+
+        item_json = getattr(self, 'item_json', None)
+        if item_json is not None:
+            # The keys are the dataframe's AnswerText strings, counted there
+            report['item_json'] = sys.getsizeof(item_json) + sum(map(sys.getsizeof, item_json.values()))
+
+        if getattr(self, 'item_of_row', None) is not None:
+            report['compaction'] = {
+                'source_questions': object_array_bytes(self.source_questions),
+                'item_of_row': array_bytes(self.item_of_row),
+                'item_sources': array_bytes(self._item_sources) + array_bytes(self._item_offsets)
+            }
+
+        ann_index = getattr(self, 'ann_index', None)
+        if ann_index is not None:
+            report['ann_index'] = sum(array_bytes(array) for array in (
+                ann_index.centroids, ann_index.cluster_offsets, ann_index.order, ann_index.offsets, ann_index.matrix))
+
+        neighbours = getattr(self, 'neighbours', None)
+        if neighbours is not None:
+            report['neighbours'] = sum(array_bytes(array) for array in (
+                neighbours.ids, neighbours.scores, neighbours.fingerprints))
+
+        def total(value):
+            return sum(map(total, value.values())) if isinstance(value, dict) else value
+
+        report['total_bytes'] = total(report)
+        report['resident_bytes'] = resident_bytes()
+        return report
+
+    @timed('preference_processing')
+    def process_user_preferences(self, preferences, item_specific=True):
         """
         Process user preferences from form inputs
         
@@ -196,6 +910,8 @@ class FashionRecommender:
                 - key_occasions: list of selected occasions
                 - primary_seasons: list of selected seasons
                 - item_specific_preferences: dict of item-specific preferences
+            item_specific (bool): Add the item-specific preferences to the shared tags
+                (pass False when they are scored as item overrides, see preference_overrides())
                 
         Returns:
             list: Processed tags for recommendation
@@ -237,7 +953,7 @@ class FashionRecommender:
                 tags.append(season.lower())
         
         # Process item-specific preferences if available
-        if preferences.get('item_specific_preferences'):
+        if item_specific and preferences.get('item_specific_preferences'):
             for item, item_prefs in preferences['item_specific_preferences'].items():
                 # Only add item-specific tags if the item is selected
                 if item in preferences.get('item_types', []):
@@ -247,6 +963,29 @@ class FashionRecommender:
         
         return list(set(tags))  # Remove duplicates
     
+    def preference_overrides(self, preferences, facet_weights=None):
+        """
+        Turn item-specific preferences into item overrides that only affect their item type
+        
+        Args:
+            preferences (dict): Dictionary of user preferences (see process_user_preferences())
+            facet_weights (dict): Optional mapping of item type to facet weights for that item type
+            
+        Returns:
+            dict: Mapping of item type to {'tags', 'facet_weights'} for get_recommendations_from_tags()
+        """
+        selected = {item.lower() for item in preferences.get('item_types') or []}
+        overrides = {}
+        for item, item_prefs in (preferences.get('item_specific_preferences') or {}).items():
+            item = item.lower()
+            # Only selected items of a known item type get an override
+            if item in selected and item in self.category_mapping:
+                overrides[item] = {'tags': [value.lower() for values in item_prefs.values() for value in values]}
+        for item, weights in (facet_weights or {}).items():
+            overrides.setdefault(item.lower(), {'tags': []})['facet_weights'] = weights
+        return overrides
+    
+    @timed('formatting')
     def format_outfit_recommendations(self, outfits):
         """
         Format outfit recommendations for display
@@ -255,7 +994,8 @@ class FashionRecommender:
             outfits (list): List of outfit dictionaries
             
         Returns:
-            list: Formatted outfit recommendations
+            list: Formatted outfit recommendations, with the catalog row id of every
+                component under 'item_ids' (e.g. for POST /items/{id}/dismiss)
         """
         formatted_outfits = []
         
@@ -266,14 +1006,187 @@ class FashionRecommender:
             }
             
             # Format components
+            item_ids = {}
             for category, item in outfit.items():
                 if item:
                     formatted_outfit['components'][category] = item['item']
+                    if 'row' in item:
+                        item_ids[category] = item['row']
+            if item_ids:
+                formatted_outfit['item_ids'] = item_ids
             
             formatted_outfits.append(formatted_outfit)
         
         return formatted_outfits
 
+def compaction_report(dataset_path, n_queries=200, seed=7):
+    """
+    Compare the catalog and the scoring time with and without compaction
+
+    Args:
+        dataset_path (str): Path to the fashion dataset
+        n_queries (int): Number of sampled tag queries scored on each index
+        seed (int): Random seed of the sampled queries
+
+    Returns:
+        dict: Rows, tag matrix non-zeros and mean exact scoring time per query of
+            the 'source' and 'compacted' indexes
+    """
+    from fashion_ann_index import sample_queries
+
+    report = {}
+    queries = None
+    for name, compact in (('source', False), ('compacted', True)):
+        start = time.perf_counter()
+        recommender = FashionRecommender(dataset_path, compact=compact)
+        load_s = time.perf_counter() - start
+        queries = queries or sample_queries(recommender, n_queries, seed=seed)
+        query_vectors = recommender.vectorizer.transform([' '.join(tags) for tags in queries])
+
+        start = time.perf_counter()
+        for position in range(query_vectors.shape[0]):
+            recommender.rank_candidates(query_vectors[position], 7, exact=True)
+        report[name] = {
+            'rows': recommender.tag_matrix.shape[0],
+            'nnz': int(recommender.tag_matrix.nnz),
+            'load_s': load_s,
+            'scoring_ms': (time.perf_counter() - start) / len(queries) * 1000.0
+        }
+    return report
+
+
+# Recommender shared by the batch worker processes
+_batch_recommender = None
+
+
+def _init_batch_worker(recommender, recommender_args):
+    """Use the recommender inherited from the parent, or build one when not forked."""
+    global _batch_recommender
+    _batch_recommender = recommender if recommender is not None else FashionRecommender(*recommender_args)
+
+
+def _batch_request_tags(recommender, request):
+    """Resolve a batch request to its tags, item overrides and a description of its source."""
+    if 'query' in request:
+        return recommender.question_tags(request['query']), None, f"Question: {request['query']}"
+    if 'tags' in request:
+        tags = request['tags']
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',')]
+        return tags, request.get('item_overrides'), f"Tags: {', '.join(tags)}"
+    if 'preferences' in request:
+        # Item-specific preferences only weigh on their own item type, as in the APIs
+        tags = recommender.process_user_preferences(request['preferences'], item_specific=False)
+        item_overrides = recommender.preference_overrides(request['preferences'])
+        return tags, item_overrides, f"User preferences with {len(tags)} extracted tags"
+    raise ValueError("request needs one of 'query', 'tags' or 'preferences'")
+
+
+def _score_batch_chunk(chunk, recommender=None):
+    """
+    Score one chunk of batch requests with vectorized similarity
+
+    Args:
+        chunk (list): (line number, raw JSONL line) pairs
+        recommender (FashionRecommender): Recommender to use (defaults to the worker's)
+
+    Returns:
+        list: Result dicts in the order of the chunk
+    """
+    recommender = recommender or _batch_recommender
+    results = [None] * len(chunk)
+    groups = {}
+    for position, (line_number, line) in enumerate(chunk):
+        request_id = line_number
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get('id', line_number)
+            tags, item_overrides, source = _batch_request_tags(recommender, request)
+            count = int(request.get('count', 7))
+            if item_overrides:
+                # Item overrides add query rows of their own, so these are scored one by one
+                outfits = recommender.get_recommendations_from_tags(tags, count, seed=request.get('seed'),
+                                                                    item_overrides=item_overrides)
+        except Exception as e:
+            results[position] = {'id': request_id, 'error': str(e)}
+            continue
+        results[position] = {'id': request_id, 'source': source}
+        if item_overrides:
+            results[position]['outfits'] = recommender.format_outfit_recommendations(outfits)
+            continue
+        # Requests asking for the same number of items are scored together
+        groups.setdefault(count, []).append((position, tags, request.get('seed')))
+
+    for count, requests in groups.items():
+        query_tags = [' '.join(tags) for _, tags, _ in requests]
+        with stage('vectorize'):
+            query_vectors = recommender.vectorizer.transform(query_tags)
+        batch = recommender.collect_candidates_batch(query_vectors, count)
+        for (position, _, seed), recommendations, tags in zip(requests, batch, query_tags):
+            with stage('outfit_assembly'):
+                outfits = recommender.assemble_outfits(recommendations, tags, count, random.Random(seed))
+            results[position]['outfits'] = recommender.format_outfit_recommendations(outfits)
+    return results
+
+
+def run_batch(recommender, lines, n_workers=1, chunk_size=64, recommender_args=None):
+    """
+    Score a stream of JSONL requests and yield the results in input order
+
+    Every line is a JSON object with one of 'query', 'tags' (list or comma-separated
+    string, optionally with 'item_overrides', see facet_query_vectors()) or
+    'preferences', and optionally 'id', 'count' and 'seed'. Lines are
+    scored in chunks, spread over a process pool when n_workers > 1; with the fork
+    start method the workers share the already built recommender copy-on-write.
+    Only a bounded number of chunks is in flight, so input of any length is streamed.
+
+    Args:
+        recommender (FashionRecommender): Recommender built from the dataset
+        lines (iterable): JSONL request lines
+        n_workers (int): Number of worker processes
+        chunk_size (int): Number of requests scored together
+        recommender_args (tuple): FashionRecommender arguments used to build the
+            recommender in workers that cannot inherit it
+
+    Yields:
+        dict: One result per non-empty input line, with 'id' and either 'outfits'
+            and 'source' or 'error'
+    """
+    def chunks():
+        chunk = []
+        for line_number, line in enumerate(lines, 1):
+            if line.strip():
+                chunk.append((line_number, line))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if n_workers <= 1:
+        for chunk in chunks():
+            yield from _score_batch_chunk(chunk, recommender)
+        return
+
+    import collections
+    import multiprocessing
+
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    initargs = (recommender if fork else None, recommender_args)
+    with context.Pool(n_workers, initializer=_init_batch_worker, initargs=initargs) as pool:
+        pending = collections.deque()
+        for chunk in chunks():
+            pending.append(pool.apply_async(_score_batch_chunk, (chunk,)))
+            # Keep every worker busy without reading the whole input ahead
+            if len(pending) >= 2 * n_workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
 # Command-line interface for testing
 if __name__ == "__main__":
     import argparse
@@ -289,15 +1202,56 @@ if __name__ == "__main__":
                       help="Output format (json or text)")
     parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv", 
                       help="Path to dataset CSV file")
+    parser.add_argument("--ann-index", help="Path to a prebuilt IVF index (see fashion_ann_index.py)")
+    parser.add_argument("--n-probe", type=int, help="Number of IVF clusters to probe per query")
+    parser.add_argument("--batch", "-b",
+                      help="JSONL file of requests to score in batch mode ('-' for stdin)")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Worker processes for batch mode")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Requests scored together in batch mode")
+    parser.add_argument("--compaction-report", action="store_true",
+                      help="Compare row counts and scoring time with and without catalog compaction")
     
     args = parser.parse_args()
     
+    if args.compaction_report:
+        report = compaction_report(args.dataset)
+        print(f"{'':>10}{'rows':>10}{'nnz':>10}{'load_s':>10}{'scoring_ms':>12}")
+        for name, row in report.items():
+            print(f"{name:>10}{row['rows']:>10}{row['nnz']:>10}{row['load_s']:>10.3f}{row['scoring_ms']:>12.3f}")
+        source, compacted = report['source'], report['compacted']
+        print(f"Compaction removed {1 - compacted['rows'] / source['rows']:.1%} of the rows and "
+              f"{1 - compacted['scoring_ms'] / source['scoring_ms']:.1%} of the scoring time")
+        sys.exit(0)
+    
     # Initialize recommender
+    load_start = time.perf_counter()
     try:
-        recommender = FashionRecommender(args.dataset)
+        recommender = FashionRecommender(args.dataset, ann_index_path=args.ann_index, n_probe=args.n_probe)
     except Exception as e:
         print(f"Error loading dataset: {e}")
         sys.exit(1)
+    load_time = time.perf_counter() - load_start
+    
+    if args.batch:
+        # Stream one JSONL result per request to stdout, stats to stderr
+        batch_input = sys.stdin if args.batch == '-' else open(args.batch, 'r')
+        start = time.perf_counter()
+        n_results = n_errors = 0
+        try:
+            for result in run_batch(recommender, batch_input, n_workers=args.workers, chunk_size=args.chunk_size,
+                                    recommender_args=(args.dataset, args.ann_index, args.n_probe)):
+                n_results += 1
+                n_errors += 'error' in result
+                sys.stdout.write(json.dumps(result) + "\n")
+        finally:
+            if batch_input is not sys.stdin:
+                batch_input.close()
+        sys.stdout.flush()
+        elapsed = time.perf_counter() - start
+        print(f"Scored {n_results} requests ({n_errors} errors) in {elapsed:.2f}s "
+              f"({n_results / elapsed if elapsed else 0.0:.1f} requests/s, {args.workers} workers, "
+              f"index loaded in {load_time:.2f}s)", file=sys.stderr)
+        sys.exit(0)
     
     outfits = None
     
@@ -311,13 +1265,15 @@ if __name__ == "__main__":
         try:
             with open(args.preferences, 'r') as f:
                 user_preferences = json.load(f)
-            tags = recommender.process_user_preferences(user_preferences)
-            outfits = recommender.get_recommendations_from_tags(tags, args.count)
+            # Item-specific preferences only weigh on their own item type, as in the APIs
+            tags = recommender.process_user_preferences(user_preferences, item_specific=False)
+            outfits = recommender.get_recommendations_from_tags(
+                tags, args.count, item_overrides=recommender.preference_overrides(user_preferences))
         except Exception as e:
             print(f"Error processing preferences file: {e}")
             sys.exit(1)
     else:
-        print("Please provide either a query, tags, or preferences file.")
+        print("Please provide either a query, tags, preferences file or batch file.")
         parser.print_help()
         sys.exit(1)
     
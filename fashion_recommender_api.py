@@ -5,41 +5,64 @@ Fashion Recommendation System API
 This script provides a FastAPI interface for the Fashion Recommendation System,
 which can be used for external communication.
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 import uvicorn
 import json
 
 import os
-from fashion_recommender import FashionRecommender
+from fashion_admin import install_admin
+from fashion_admission import install_admission
+from fashion_catalogs import install_catalogs
+from fashion_deadline import Deadline
+from fashion_fast_json import recommendation_response
+from fashion_metrics import install_metrics, stage
+from fashion_pagination import MAX_PAGE_SIZE, CandidateSnapshots, CursorExpired
+from fashion_startup import Warmup, get_recommender, install_health, warmup_queries_from_env
 
-# Get the dataset path
+# Get the dataset path (FASHION_DATASET may name a CSV, Parquet or Feather catalog)
 current_dir = os.path.dirname(os.path.abspath(__file__))
-dataset_path = os.path.join(current_dir, "fashion_dataset_updated.csv")
+dataset_path = os.environ.get('FASHION_DATASET', os.path.join(current_dir, "fashion_dataset_updated.csv"))
 
-# Initialize the recommender
-recommender = FashionRecommender(dataset_path)
+# Routes are collected on a router and mounted by create_app()
+router = APIRouter()
 
-# Create FastAPI app
-app = FastAPI(
-    title="Fashion Recommendation API",
-    description="API for recommending personalized fashion wardrobe pieces",
-    version="1.0.0"
-)
+# Candidate snapshots behind the pagination cursors of this worker
+snapshots = CandidateSnapshots.from_env()
 
 # Define Pydantic models for request and response
 class TagRequest(BaseModel):
     tags: List[str] = Field(..., description="List of tags to use for recommendations")
     count: int = Field(7, description="Number of recommendations to generate")
+    paginate: bool = Field(False, description="Snapshot the candidates and return a cursor for further pages "
+                                              "of count outfits")
+    deadline_ms: Optional[float] = Field(None, gt=0, description="Latency budget in milliseconds; "
+                                         "cheaper steps are taken to meet it")
 
 class QuestionRequest(BaseModel):
     text: str = Field(..., description="Natural language question for fashion recommendations")
     count: int = Field(7, description="Number of recommendations to generate")
+    paginate: bool = Field(False, description="Snapshot the candidates and return a cursor for further pages "
+                                              "of count outfits")
+    deadline_ms: Optional[float] = Field(None, gt=0, description="Latency budget in milliseconds; "
+                                         "cheaper steps are taken to meet it")
 
 class PreferencesRequest(BaseModel):
     preferences: Dict[str, Any] = Field(..., description="User preferences for fashion recommendations")
     count: int = Field(7, description="Number of recommendations to generate")
+    paginate: bool = Field(False, description="Snapshot the candidates and return a cursor for further pages "
+                                              "of count outfits")
+    facet_weights: Optional[Dict[str, float]] = Field(None, description="Weight per facet (item_type, style, color, "
+                                                                        "material, occasion, season, other)")
+    item_facet_weights: Optional[Dict[str, Dict[str, float]]] = Field(None, description="Facet weights for single "
+                                                                                        "item types")
+    deadline_ms: Optional[float] = Field(None, gt=0, description="Latency budget in milliseconds; "
+                                         "cheaper steps are taken to meet it")
+
+class NextPageRequest(BaseModel):
+    cursor: str = Field(..., description="Cursor of a previous recommendation response")
+    count: int = Field(7, ge=1, le=MAX_PAGE_SIZE, description="Number of outfits on the page")
 
 class OutfitComponent(BaseModel):
     category: str = Field(..., description="Category of the clothing item")
@@ -48,13 +71,28 @@ class OutfitComponent(BaseModel):
 class Outfit(BaseModel):
     outfit_number: int = Field(..., description="Number of the outfit")
     components: Dict[str, str] = Field(..., description="Components of the outfit")
+    item_ids: Optional[Dict[str, int]] = Field(None, description="Catalog row id of every component, "
+                                                                 "as used by /items/{id}/...")
 
 class RecommendationResponse(BaseModel):
     outfits: List[Outfit] = Field(..., description="List of recommended outfits")
     source: str = Field(..., description="Source of the recommendations")
+    degraded: Optional[List[str]] = Field(None, description="Steps cut short to meet the deadline "
+                                                            "(only present when a deadline was given)")
+    cursor: Optional[str] = Field(None, description="Cursor of the next page (only present when there is one)")
+
+class SimilarItem(BaseModel):
+    id: int = Field(..., description="Row id of the item in the catalog")
+    item: str = Field(..., description="Description of the clothing item")
+    similarity: float = Field(..., description="Cosine similarity of the item's tags")
+
+class SimilarItemsResponse(BaseModel):
+    id: int = Field(..., description="Row id of the requested item")
+    item: str = Field(..., description="Description of the requested item")
+    similar: List[SimilarItem] = Field(..., description="Most similar items, best first")
 
 
-@app.get("/")
+@router.get("/")
 def read_root():
     """Root endpoint with API information"""
     return {
@@ -64,48 +102,162 @@ def read_root():
     }
 
 
-@app.post("/recommendations/question", response_model=RecommendationResponse)
-def get_recommendations_from_question(request: QuestionRequest):
+def outfits_response(recommender, outfits, source, degraded=None, cursor=None):
+    """Format outfits for a RecommendationResponse, pre-encoded when fast JSON is enabled."""
+    if recommender.item_json is not None:
+        return recommendation_response(outfits, recommender.item_json, source, degraded, cursor)
+    return {
+        "outfits": recommender.format_outfit_recommendations(outfits),
+        "source": source,
+        "degraded": degraded,
+        "cursor": cursor
+    }
+
+
+def first_page(recommender, request, tags, source, deadline, **query):
+    """Snapshot the candidates of tags and respond with the first page of outfits and a cursor."""
+    recommendations = recommender.candidates_from_tags(tags, max(request.count, snapshots.depth), deadline, **query)
+    with stage('outfit_assembly'):
+        outfits, cursor = snapshots.create(recommendations, ' '.join(tags), request.count, source=source)
+    return outfits_response(recommender, outfits, source, deadline.degraded if deadline else None, cursor)
+
+
+@router.post("/recommendations/question", response_model=RecommendationResponse, response_model_exclude_none=True)
+def get_recommendations_from_question(request: QuestionRequest, recommender=Depends(get_recommender)):
     """Get recommendations based on a natural language question"""
     try:
-        outfits = recommender.get_recommendations_from_question(request.text, request.count)
-        formatted_outfits = recommender.format_outfit_recommendations(outfits)
-        return {
-            "outfits": formatted_outfits,
-            "source": f"Question: {request.text}"
-        }
+        source = f"Question: {request.text}"
+        if request.paginate:
+            deadline = Deadline(request.deadline_ms) if request.deadline_ms is not None else None
+            return first_page(recommender, request, recommender.question_tags(request.text, deadline), source,
+                              deadline)
+        degraded = [] if request.deadline_ms is not None else None
+        outfits = recommender.get_recommendations_from_question(request.text, request.count,
+                                                                deadline_ms=request.deadline_ms, degraded=degraded)
+        return outfits_response(recommender, outfits, source, degraded)
+    except ValueError as e:
+        # Questions the recommender cannot answer (e.g. without known tags on sharded catalogs)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
-@app.post("/recommendations/tags", response_model=RecommendationResponse)
-def get_recommendations_from_tags(request: TagRequest):
+@router.post("/recommendations/tags", response_model=RecommendationResponse, response_model_exclude_none=True)
+def get_recommendations_from_tags(request: TagRequest, recommender=Depends(get_recommender)):
     """Get recommendations based on a list of tags"""
     try:
-        outfits = recommender.get_recommendations_from_tags(request.tags, request.count)
-        formatted_outfits = recommender.format_outfit_recommendations(outfits)
-        return {
-            "outfits": formatted_outfits,
-            "source": f"Tags: {', '.join(request.tags)}"
-        }
+        source = f"Tags: {', '.join(request.tags)}"
+        if request.paginate:
+            deadline = Deadline(request.deadline_ms) if request.deadline_ms is not None else None
+            return first_page(recommender, request, request.tags, source, deadline)
+        degraded = [] if request.deadline_ms is not None else None
+        outfits = recommender.get_recommendations_from_tags(request.tags, request.count,
+                                                            deadline_ms=request.deadline_ms, degraded=degraded)
+        return outfits_response(recommender, outfits, source, degraded)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
-@app.post("/recommendations/preferences", response_model=RecommendationResponse)
-def get_recommendations_from_preferences(request: PreferencesRequest):
+@router.post("/recommendations/preferences", response_model=RecommendationResponse,
+             response_model_exclude_none=True)
+def get_recommendations_from_preferences(request: PreferencesRequest, recommender=Depends(get_recommender)):
     """Get recommendations based on user preferences"""
     try:
-        tags = recommender.process_user_preferences(request.preferences)
-        outfits = recommender.get_recommendations_from_tags(tags, request.count)
-        formatted_outfits = recommender.format_outfit_recommendations(outfits)
-        return {
-            "outfits": formatted_outfits,
-            "source": f"User preferences with {len(tags)} extracted tags"
-        }
+        # Item-specific preferences only weigh on their own item type
+        tags = recommender.process_user_preferences(request.preferences, item_specific=False)
+        item_overrides = recommender.preference_overrides(request.preferences, request.item_facet_weights)
+        source = f"User preferences with {len(tags)} extracted tags"
+        if request.paginate:
+            deadline = Deadline(request.deadline_ms) if request.deadline_ms is not None else None
+            return first_page(recommender, request, tags, source, deadline,
+                              facet_weights=request.facet_weights, item_overrides=item_overrides)
+        degraded = [] if request.deadline_ms is not None else None
+        outfits = recommender.get_recommendations_from_tags(tags, request.count,
+                                                            deadline_ms=request.deadline_ms, degraded=degraded,
+                                                            facet_weights=request.facet_weights,
+                                                            item_overrides=item_overrides)
+        return outfits_response(recommender, outfits, source, degraded)
+    except ValueError as e:
+        # Unknown facets or item types
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
+@router.post("/recommendations/next", response_model=RecommendationResponse, response_model_exclude_none=True)
+def get_next_recommendations(request: NextPageRequest, recommender=Depends(get_recommender)):
+    """Get the next page of outfits of a paginated recommendation without scoring again"""
+    try:
+        with stage('outfit_assembly'):
+            outfits, cursor, source = snapshots.page(request.cursor, request.count)
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Cursor expired; request the recommendations again")
+    return outfits_response(recommender, outfits, source, cursor=cursor)
+
+
+@router.get("/items/{item_id}/similar", response_model=SimilarItemsResponse)
+def get_similar_items(item_id: int, count: Optional[int] = Query(None, ge=1, description="Number of similar items "
+                                                                                         "(all stored if omitted)"),
+                      recommender=Depends(get_recommender)):
+    """Get the items most similar to a catalog item from the precomputed neighbour table"""
+    neighbours = getattr(recommender, 'neighbours', None)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="No neighbour table attached; build one with fashion_neighbours.py")
+    try:
+        ids, scores = neighbours.similar(item_id, count)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"Item {item_id} not found")
+    answers = recommender.df['AnswerText']
+    return {
+        "id": item_id,
+        "item": answers.iat[item_id],
+        "similar": [{"id": int(row), "item": answers.iat[row], "similarity": float(score)}
+                    for row, score in zip(ids, scores)]
+    }
+
+
+def create_app(dataset_path=dataset_path, warmup_queries=None):
+    """
+    Create the API app; the recommender is built in the background once it starts
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        warmup_queries (int): Synthetic queries run before reporting ready
+            (defaults to FASHION_WARMUP_QUERIES)
+
+    Returns:
+        FastAPI: The app
+    """
+    app = FastAPI(
+        title="Fashion Recommendation API",
+        description="API for recommending personalized fashion wardrobe pieces",
+        version="1.0.0"
+    )
+    app.include_router(router)
+
+    if warmup_queries is None:
+        warmup_queries = warmup_queries_from_env()
+    warmup = Warmup(dataset_path, "recommender_api", warmup_queries=warmup_queries)
+    install_health(app, warmup)
+
+    # Further catalogs selected with ?catalog=<id>, built on first use
+    install_catalogs(app, "recommender_api")
+
+    # Shed load with quick 503s instead of queueing requests until clients time out
+    install_admission(app, "recommender_api")
+
+    # Expose per-stage timings and request latency on GET /metrics
+    install_metrics(app, "recommender_api")
+    snapshots.install_metrics("recommender_api")
+
+    # Admin-only debugging routes, enabled by FASHION_ADMIN_TOKEN
+    install_admin(app, get_recommender=lambda: warmup.recommender)
+    return app
+
+
+# App for "uvicorn fashion_recommender_api:app"; importing it is cheap
+app = create_app()
+
+
 if __name__ == "__main__":
-    uvicorn.run("fashion_recommender_api:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("fashion_recommender_api:create_app", factory=True, host="0.0.0.0", port=8000, reload=True)
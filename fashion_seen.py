@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Seen Items
+
+A questionnaire session records the catalog items it has been shown or has dismissed
+in a bitmask over catalog row ids. Its next recommendations are ranked with those
+rows masked out of the similarity scores, before the top-k selection, so every request
+still gets its full depth of candidates it has not seen. Rows describing the same item
+(same AnswerText) are marked together, so a garment is not shown again under another row.
+
+A bitmask takes one bit per catalog item and is capped per session. For a catalog
+larger than the cap, the bitmask is folded: row r is tracked by bit r mod the number
+of bits. A folded mask may also hide a few unseen items, but it never shows a seen one.
+
+    FASHION_SEEN_MAX_BYTES=65536        # bitmask bytes per session (524288 items unfolded)
+
+POST /reset forgets what a session has seen.
+"""
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from fashion_metrics import REGISTRY
+
+SEEN_BYTES = REGISTRY.gauge(
+    'fashion_seen_bytes', 'Bytes held by the seen-item bitmasks of all sessions', ['app'])
+
+
+class SeenItems:
+    """Bitmask of the catalog rows one session has seen, bound to one recommender."""
+
+    def __init__(self, recommender, max_bytes):
+        """
+        Args:
+            recommender (FashionRecommender): Recommender whose row ids are tracked
+            max_bytes (int): Size cap of the bitmask
+        """
+        self.n_items = recommender.tag_matrix.shape[0]
+        self.n_bits = max(1, min(self.n_items, max_bytes * 8))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        # Changes whenever rows are added, so rankings made with an older mask can be told apart
+        self.version = 0
+        # Catalogs may be evicted; the bitmask must not keep them alive
+        self._recommender = weakref.ref(recommender)
+
+    def belongs_to(self, recommender):
+        return self._recommender() is recommender
+
+    @property
+    def folded(self):
+        return self.n_bits < self.n_items
+
+    def add(self, rows):
+        """Mark catalog rows as seen."""
+        bits = np.asarray(rows, dtype=np.int64) % self.n_bits
+        if len(bits):
+            np.bitwise_or.at(self.bits, bits >> 3, (0x80 >> (bits & 7)).astype(np.uint8))
+            self.version += 1
+
+    def mask(self):
+        """
+        Expand the bitmask over the catalog
+
+        Returns:
+            np.ndarray: Boolean mask of the seen rows
+        """
+        bits = np.unpackbits(self.bits, count=self.n_bits).astype(bool)
+        # Folded bits repeat over the catalog
+        return np.resize(bits, self.n_items) if self.folded else bits
+
+    def count(self):
+        """Number of bits set."""
+        return int(np.unpackbits(self.bits).sum())
+
+
+class SeenStore:
+    """Seen-item bitmasks of all sessions of a worker."""
+
+    def __init__(self, max_bytes=65536):
+        """
+        Args:
+            max_bytes (int): Size cap of each session's bitmask
+        """
+        self.max_bytes = max_bytes
+        self._sessions = {}
+        # Recommender -> (item number of every row, rows sorted by item, offsets per item)
+        self._items_of = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a store configured by FASHION_SEEN_MAX_BYTES."""
+        return cls(max_bytes=int(os.environ.get('FASHION_SEEN_MAX_BYTES', 65536)))
+
+    def _items(self, session_id, recommender):
+        """Get the bitmask of a session for a recommender; call with the lock held."""
+        seen = self._sessions.get(session_id)
+        if seen is None or not seen.belongs_to(recommender):
+            # Row ids of another catalog mean nothing here
+            seen = self._sessions[session_id] = SeenItems(recommender, self.max_bytes)
+        return seen
+
+    def _same_item_rows(self, recommender, rows):
+        """Expand rows to every row of the same items; call with the lock held."""
+        groups = self._items_of.get(recommender)
+        if groups is None:
+            import pandas as pd
+
+            codes = pd.factorize(recommender.df['AnswerText'])[0]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(codes))])
+            groups = self._items_of[recommender] = (codes, np.argsort(codes, kind='stable'), offsets)
+        codes, order, offsets = groups
+        return np.concatenate([order[offsets[code]:offsets[code + 1]] for code in codes[rows]])
+
+    def add(self, session_id, recommender, rows):
+        """
+        Mark catalog rows, and the other rows of the same items, as seen by a session
+
+        Args:
+            session_id (str): Session that saw the rows
+            recommender (FashionRecommender): Recommender the row ids belong to
+            rows (list): Catalog row ids
+        """
+        if len(rows) == 0:
+            return
+        with self._lock:
+            self._items(session_id, recommender).add(self._same_item_rows(recommender, np.asarray(rows)))
+
+    def snapshot(self, session_id, recommender):
+        """
+        Get the mask to rank a session's recommendations with
+
+        Args:
+            session_id (str): Session asking for recommendations
+            recommender (FashionRecommender): Recommender serving the request
+
+        Returns:
+            tuple: (boolean mask of the seen rows, or None when there are none; version
+                of the bitmask)
+        """
+        with self._lock:
+            seen = self._sessions.get(session_id)
+            if seen is None or not seen.belongs_to(recommender) or seen.version == 0:
+                return None, 0
+            return seen.mask(), seen.version
+
+    def stats(self, session_id):
+        """Size and fill of a session's bitmask."""
+        with self._lock:
+            seen = self._sessions.get(session_id)
+            if seen is None:
+                return {'seen': 0, 'bytes': 0, 'folded': False}
+            return {'seen': seen.count(), 'bytes': int(seen.bits.nbytes), 'folded': seen.folded}
+
+    def reset(self, session_id):
+        """Forget what a session has seen."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def nbytes(self):
+        """Bytes held by all bitmasks."""
+        with self._lock:
+            return sum(seen.bits.nbytes for seen in self._sessions.values())
+
+    def install_metrics(self, app_name):
+        """Export the bytes held by the bitmasks as fashion_seen_bytes."""
+        SEEN_BYTES.set_function(self.nbytes, app=app_name)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Sharded Catalog
+
+This module partitions the catalog into N shards, each served by its own worker
+process that only loads its own rows. Queries are vectorized once in the coordinator,
+fanned out to every shard, and the per-shard top-k lists of each item type are
+merged with a heap, so scoring uses one core per shard and no single process has to
+hold the whole catalog.
+
+The shard assignment and the vectorizer fitted on the full catalog are persisted next
+to the dataset so every restart reuses the same partitioning:
+
+    python fashion_shards.py assign --dataset fashion_dataset_updated.csv --shards 4
+    python fashion_shards.py benchmark --dataset fashion_dataset_updated.csv --rows 1000000
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from fashion_recommender import FashionRecommender
+from fashion_metrics import stage
+from fashion_catalog_generator import CatalogProfile, generate_catalog
+
+
+def default_manifest_path(dataset_path, n_shards):
+    """
+    Get the path the shard manifest of a dataset is persisted to by default
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        n_shards (int): Number of shards
+
+    Returns:
+        str: Path of the manifest file next to the dataset
+    """
+    return os.path.splitext(dataset_path)[0] + f'.shards-{n_shards}.pkl'
+
+
+def dataset_digest(dataset_path):
+    """
+    Hash the contents of a dataset file so a manifest of an edited catalog is never reused
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+
+    Returns:
+        str: Hex digest of the file
+    """
+    digest = hashlib.sha1()
+    with open(dataset_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def assign_shards(answers, n_shards):
+    """
+    Assign every item to a shard by hashing its answer text
+
+    Hashing the item text keeps repeated items on the same shard and keeps existing
+    assignments stable when rows are appended to the catalog.
+
+    Args:
+        answers (iterable): AnswerText of every row
+        n_shards (int): Number of shards
+
+    Returns:
+        np.ndarray: Shard id of every row
+    """
+    return np.fromiter((zlib.crc32(str(answer).encode('utf-8')) % n_shards for answer in answers),
+                       dtype=np.int32)
+
+
+def build_manifest(dataset_path, n_shards):
+    """
+    Fit the shared vectorizer and compute the shard assignment of a dataset
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        n_shards (int): Number of shards
+
+    Returns:
+        dict: Manifest with n_shards, n_items, dataset_digest, assignment and vectorizer
+    """
+    # Only the columns needed for partitioning and the global IDF are read
+    df = pd.read_csv(dataset_path, usecols=['AnswerText', 'Tags'])
+    vectorizer = TfidfVectorizer()
+    vectorizer.fit(df['Tags'])
+    return {
+        'n_shards': n_shards,
+        'n_items': len(df),
+        'dataset_digest': dataset_digest(dataset_path),
+        'assignment': assign_shards(df['AnswerText'], n_shards),
+        'vectorizer': vectorizer
+    }
+
+
+def load_manifest(dataset_path, n_shards, manifest_path=None, rebuild=False):
+    """
+    Load the persisted shard manifest, building and saving it when missing
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        n_shards (int): Number of shards
+        manifest_path (str): Manifest path (defaults to <dataset>.shards-<n>.pkl)
+        rebuild (bool): Rebuild the manifest even if one exists
+
+    Returns:
+        dict: The shard manifest
+    """
+    manifest_path = manifest_path or default_manifest_path(dataset_path, n_shards)
+    if not rebuild and os.path.exists(manifest_path):
+        with open(manifest_path, 'rb') as f:
+            manifest = pickle.load(f)
+        # A catalog that changed on disk needs a new assignment and vectorizer,
+        # even when the edit kept the file size
+        if manifest['n_shards'] == n_shards and manifest.get('dataset_digest') == dataset_digest(dataset_path):
+            return manifest
+
+    manifest = build_manifest(dataset_path, n_shards)
+    with open(manifest_path, 'wb') as f:
+        pickle.dump(manifest, f)
+    return manifest
+
+
+def _shard_worker(conn, dataset_path, rows, vectorizer):
+    """
+    Serve ranking requests for one shard until the coordinator sends None
+
+    Args:
+        conn (multiprocessing.Connection): Pipe to the coordinator
+        dataset_path (str): Path to the fashion dataset CSV
+        rows (np.ndarray): Global row ids owned by this shard
+        vectorizer (TfidfVectorizer): Vectorizer fitted on the full catalog
+    """
+    recommender = FashionRecommender(dataset_path, rows=rows, vectorizer=vectorizer)
+    answers = recommender.df['AnswerText'].to_numpy()
+    tags = recommender.df['Tags'].to_numpy()
+    conn.send(len(rows))
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        query_vectors, n_per_type, exclude = message
+        if exclude is not None:
+            exclude = exclude[rows]
+
+        # Score the whole batch in one product, and return global row ids together
+        # with the item payload so the coordinator never needs the catalog itself
+        ranked_batch = recommender.rank_candidates_batch(query_vectors, n_per_type, exclude=exclude)
+        conn.send([
+            {
+                item_type: [(float(score), int(rows[idx]), answers[idx], tags[idx])
+                            for idx, score in zip(ids, scores)]
+                for item_type, (ids, scores) in ranked.items()
+            }
+            for ranked in ranked_batch
+        ])
+    conn.close()
+
+
+class ShardedRecommender(FashionRecommender):
+    """
+    Fashion recommender that scatters scoring across per-shard worker processes.
+
+    The coordinator holds no catalog rows, so questions without any known tags
+    (which fall back to matching dataset questions) and item-specific overrides are
+    not supported; both raise ValueError.
+    """
+
+    def __init__(self, dataset_path, n_shards=None, manifest_path=None):
+        """
+        Initialize the coordinator and start one worker process per shard
+
+        Args:
+            dataset_path (str): Path to the fashion dataset CSV
+            n_shards (int): Number of shards (defaults to the number of CPUs)
+            manifest_path (str): Manifest path (defaults to <dataset>.shards-<n>.pkl)
+        """
+        self.n_shards = n_shards or os.cpu_count() or 1
+        manifest = load_manifest(dataset_path, self.n_shards, manifest_path)
+        self.vectorizer = manifest['vectorizer']
+        self.n_items = manifest['n_items']
+        # Grid hits, item fragments and the ANN index are built from catalog rows,
+        # which only the shards hold, so they stay unset
+        self._init_query_state()
+
+        self.lock = threading.Lock()
+        self.workers = []
+        self.connections = []
+        for shard in range(self.n_shards):
+            rows = np.flatnonzero(manifest['assignment'] == shard)
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_worker, daemon=True,
+                                             args=(child_conn, dataset_path, rows, self.vectorizer))
+            worker.start()
+            child_conn.close()
+            self.workers.append(worker)
+            self.connections.append(parent_conn)
+
+        # Wait for every shard to finish loading
+        self.shard_sizes = [conn.recv() for conn in self.connections]
+
+    def close(self):
+        """Stop the shard worker processes."""
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.workers, self.connections = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def collect_candidates_batch(self, query_vectors, n_recommendations, exclude=None):
+        """
+        Scatter a batch of queries to every shard and merge the results
+
+        Args:
+            query_vectors (scipy.sparse matrix): One TF-IDF row per query
+            n_recommendations (int): Number of items to keep per item type
+            exclude (np.ndarray): Optional boolean mask of global row ids never to return
+
+        Returns:
+            list: One mapping of category to candidate item dicts per query
+        """
+        # Scatter first so all shards score in parallel, then gather; the pipes
+        # carry one batch at a time, so concurrent callers take turns
+        start = time.perf_counter()
+        with stage('similarity'), self.lock:
+            for conn in self.connections:
+                conn.send((query_vectors, n_recommendations, exclude))
+            shard_results = [conn.recv() for conn in self.connections]
+
+        with stage('category_filter'):
+            batch = self._merge(shard_results, n_recommendations)
+        self.stage_costs.observe('ranking', (time.perf_counter() - start) / query_vectors.shape[0])
+        return batch
+
+    def _merge(self, shard_results, n_recommendations):
+        """Merge per-shard top-k lists into candidate dicts, one mapping per query."""
+        batch = []
+        for per_shard in zip(*shard_results):
+            recommendations = {'topwear': [], 'bottomwear': [], 'footwear': [], 'accessory': []}
+            for item_type, category_type in self.category_mapping.items():
+                # Merge the shards' top-k lists; ties go to the lower row id
+                # exactly like a single-process ranking
+                merged = heapq.nsmallest(
+                    n_recommendations,
+                    (candidate for result in per_shard for candidate in result[item_type]),
+                    key=lambda candidate: (-candidate[0], candidate[1])
+                )
+                for score, row, answer, tags in merged:
+                    if score > 0:  # Only consider somewhat relevant matches
+                        recommendations[category_type].append({
+                            'item': answer,
+                            'similarity': score,
+                            'tags': tags,
+                            'row': row
+                        })
+            batch.append(recommendations)
+        return batch
+
+    def collect_facet_candidates(self, query_vectors, row_of_type, n_per_type, exclude=None):
+        """Collect the candidates of a facet query; item-specific overrides are not supported."""
+        if row_of_type:
+            raise ValueError("Item-specific overrides are not supported by a sharded recommender")
+        return self.collect_candidates(query_vectors, n_per_type, exclude)
+
+    def rank_candidates_batch(self, query_vectors, n_per_type, exact=False, exclude=None):
+        raise ValueError("A sharded recommender ranks rows in its shards; use collect_candidates_batch()")
+
+    def closest_question_tags(self, question):
+        raise ValueError("Questions without known tags are not supported by a sharded recommender")
+
+
+def benchmark(dataset_path, shard_counts, n_queries=200, batch_size=16, k=7, seed=7):
+    """
+    Measure sharded ranking throughput for several shard counts
+
+    Args:
+        dataset_path (str): Path to the fashion dataset CSV
+        shard_counts (list): Shard counts to evaluate
+        n_queries (int): Number of sampled tag queries
+        batch_size (int): Queries sent to the shards per round trip
+        k (int): Items kept per item type
+        seed (int): Random seed for query sampling
+
+    Returns:
+        list: One dict per shard count with n_shards, qps and scaling efficiency
+    """
+    rng = random.Random(seed)
+    tag_lists = pd.read_csv(dataset_path, usecols=['Tags'], nrows=10000)['Tags'].str.split(',').tolist()
+    queries = [' '.join(rng.sample(tags, min(3, len(tags)))) for tags in rng.choices(tag_lists, k=n_queries)]
+
+    rows = []
+    for n_shards in shard_counts:
+        with ShardedRecommender(dataset_path, n_shards=n_shards) as recommender:
+            vectors = recommender.vectorizer.transform(queries)
+            recommender.collect_candidates_batch(vectors[:batch_size], k)  # warm-up
+
+            start = time.perf_counter()
+            for first in range(0, n_queries, batch_size):
+                recommender.collect_candidates_batch(vectors[first:first + batch_size], k)
+            qps = n_queries / (time.perf_counter() - start)
+        rows.append({'n_shards': n_shards, 'qps': qps})
+
+    base = rows[0]['qps'] / rows[0]['n_shards']
+    for row in rows:
+        row['efficiency'] = row['qps'] / (base * row['n_shards'])
+    return rows
+
+
+def main():
+    """Main function to assign shards or benchmark sharded scoring."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Sharded Catalog")
+    parser.add_argument("command", choices=["assign", "benchmark"],
+                       help="Persist the shard assignment or benchmark throughput")
+    parser.add_argument("--dataset", "-d", default="fashion_dataset_updated.csv",
+                       help="Path to dataset CSV file")
+    parser.add_argument("--shards", "-n", default=str(os.cpu_count() or 1),
+                       help="Number of shards (comma-separated list for benchmark)")
+    parser.add_argument("--rows", type=int,
+                       help="Benchmark on a synthetic catalog of this many rows generated from the dataset")
+    parser.add_argument("--queries", type=int, default=200, help="Number of benchmark queries")
+    parser.add_argument("--output", "-o", choices=["json", "text"], default="text",
+                       help="Benchmark output format (json or text)")
+
+    args = parser.parse_args()
+    shard_counts = [int(n) for n in args.shards.split(",")]
+
+    if args.command == "assign":
+        for n_shards in shard_counts:
+            manifest = load_manifest(args.dataset, n_shards, rebuild=True)
+            sizes = np.bincount(manifest['assignment'], minlength=n_shards)
+            print(f"Assigned {manifest['n_items']} items to {n_shards} shards "
+                  f"(sizes {sizes.tolist()}) -> {default_manifest_path(args.dataset, n_shards)}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = args.dataset
+        if args.rows:
+            dataset_path = os.path.join(tmp_dir, "synthetic_catalog.csv")
+            profile = CatalogProfile.from_recommender(FashionRecommender(args.dataset))
+            generate_catalog(profile, args.rows, dataset_path)
+        rows = benchmark(dataset_path, shard_counts, n_queries=args.queries)
+
+    if args.output == "json":
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"Sharded throughput over {args.queries} queries "
+              f"({args.rows or 'dataset'} rows, {os.cpu_count()} CPUs)\n")
+        print(f"{'shards':>6}  {'qps':>10}  {'efficiency':>10}")
+        for row in rows:
+            print(f"{row['n_shards']:>6}  {row['qps']:>10.1f}  {row['efficiency']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Slow-Query Log
+
+This module writes one JSONL record for every API request slower than a configurable
+threshold to a rotating local file. A record holds the normalized request input, the
+tags the recommendation was scored with, the candidate counts per category, the
+per-stage timings and the code path taken, so slow requests can be replayed and
+profiled offline.
+
+The log is opt-in and configured through the environment of the API process:
+
+    FASHION_SLOW_LOG=slow_queries.jsonl        # enable and set the log file
+    FASHION_SLOW_LOG_MS=250                    # threshold in milliseconds
+    FASHION_SLOW_LOG_MAX_BYTES=10485760        # rotate after this many bytes
+    FASHION_SLOW_LOG_BACKUPS=5                 # rotated files to keep
+
+Logged requests are replayed in-process with:
+
+    python fashion_slow_log.py replay --log slow_queries.jsonl
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import re
+import time
+
+
+def normalize_input(value):
+    """
+    Normalize a decoded request body so equal requests produce identical records
+
+    Strings are stripped and runs of whitespace collapsed; case is kept because the
+    questionnaire rules compare some answers case-sensitively.
+
+    Args:
+        value: Decoded JSON value
+
+    Returns:
+        The normalized value
+    """
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    if isinstance(value, list):
+        return [normalize_input(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize_input(item) for key, item in sorted(value.items())}
+    return value
+
+
+class SlowQueryLog:
+    """Append-only JSONL log of slow requests with size-based rotation."""
+
+    # Request bodies larger than this are not kept for the record
+    MAX_BODY_BYTES = 64 * 1024
+
+    def __init__(self, path, threshold_ms=250.0, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """
+        Open the log file
+
+        Args:
+            path (str): Path of the JSONL file
+            threshold_ms (float): Requests slower than this are logged
+            max_bytes (int): Rotate the file once it grows past this size
+            backup_count (int): Number of rotated files to keep
+        """
+        self.path = path
+        self.threshold = threshold_ms / 1000.0
+        # A dedicated logger gives thread-safe appends and rotation for free
+        self.logger = logging.getLogger(f'fashion_slow_log.{os.path.abspath(path)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                           backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Create the log configured by the FASHION_SLOW_LOG* environment variables
+
+        Returns:
+            SlowQueryLog: The log, or None when FASHION_SLOW_LOG is not set
+        """
+        path = os.environ.get('FASHION_SLOW_LOG')
+        if not path:
+            return None
+        return cls(path,
+                   threshold_ms=float(os.environ.get('FASHION_SLOW_LOG_MS', 250)),
+                   max_bytes=int(os.environ.get('FASHION_SLOW_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+                   backup_count=int(os.environ.get('FASHION_SLOW_LOG_BACKUPS', 5)))
+
+    def close(self):
+        """Close the log file."""
+        for handler in list(self.logger.handlers):
+            handler.close()
+            self.logger.removeHandler(handler)
+
+    def record(self, app_name, method, path, body, status, elapsed, trace):
+        """
+        Append a record for a request if it was slower than the threshold
+
+        Args:
+            app_name (str): Name of the API app
+            method (str): HTTP method
+            path (str): Request path including the query string
+            body (bytes): Raw request body
+            status (int): Response status code
+            elapsed (float): Request time in seconds
+            trace (dict): Stage timings, code paths and annotations of the request
+
+        Returns:
+            bool: True if the request was logged
+        """
+        if elapsed < self.threshold:
+            return False
+
+        try:
+            request_input = normalize_input(json.loads(body)) if body else None
+        except ValueError:
+            request_input = body.decode('utf-8', 'replace')
+        entry = {
+            'timestamp': time.time(),
+            'app': app_name,
+            'method': method,
+            'path': path,
+            'status': status,
+            'elapsed_ms': round(elapsed * 1000.0, 3),
+            'input': request_input,
+            'tags': trace.get('tags'),
+            'candidates': trace.get('candidates'),
+            'paths': trace.get('paths', []),
+            'stages_ms': {name: round(seconds * 1000.0, 3) for name, seconds in trace.get('stages', {}).items()},
+        }
+        if 'preferences' in trace:
+            entry['preferences'] = trace['preferences']
+        self.logger.info(json.dumps(entry, sort_keys=True))
+        return True
+
+
+def read_log(path):
+    """
+    Read the records of a slow-query log
+
+    Args:
+        path (str): Path of the JSONL file
+
+    Returns:
+        list: Record dicts in the order they were logged
+    """
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_record(client, record):
+    """
+    Send a logged request through an app again
+
+    Questionnaire recommendations depend on session state, so the logged preferences
+    are restored with POST /preferences before replaying them.
+
+    Args:
+        client (ASGIReplayer): In-process client of the app the record came from
+        record (dict): Slow-query record
+
+    Returns:
+        tuple: (status code, latency in seconds)
+    """
+    if record.get('preferences') is not None:
+        client.request('POST', '/preferences', record['preferences'])
+    start = time.perf_counter()
+    status, _ = client.request(record['method'], record['path'], record['input'])
+    return status, time.perf_counter() - start
+
+
+def main():
+    """Main function to summarize or replay a slow-query log."""
+    parser = argparse.ArgumentParser(description="Fashion Recommendation Slow-Query Log")
+    parser.add_argument("command", choices=["summary", "replay"],
+                       help="Summarize the log or replay its requests in-process")
+    parser.add_argument("--log", "-l", default="slow_queries.jsonl", help="Path to the slow-query log")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every record this many times")
+
+    args = parser.parse_args()
+    records = read_log(args.log)
+
+    if args.command == "summary":
+        for record in sorted(records, key=lambda record: -record['elapsed_ms']):
+            slowest = max(record['stages_ms'].items(), key=lambda item: item[1], default=('-', 0.0))
+            print(f"{record['elapsed_ms']:9.1f} ms  {record['method']} {record['path']}  "
+                  f"path={'/'.join(record['paths']) or '-'}  slowest={slowest[0]} ({slowest[1]:.1f} ms)  "
+                  f"tags={record['tags']}")
+        return
+
+    from fashion_benchmark import ASGIReplayer
+
+    clients = {}
+    try:
+        for record in records:
+            if record['app'] not in clients:
+                # Import lazily: each API module builds its own recommender
+                if record['app'] == 'questionnaire_api':
+                    from fashion_questionnaire_api import app
+                else:
+                    from fashion_recommender_api import app
+                app.state.warmup.wait()
+                clients[record['app']] = ASGIReplayer(app)
+            client = clients[record['app']]
+            timings = []
+            for _ in range(args.repeat):
+                status, elapsed = replay_record(client, record)
+                timings.append(elapsed * 1000.0)
+            print(f"{record['method']} {record['path']}  logged {record['elapsed_ms']:.1f} ms  "
+                  f"replayed {min(timings):.1f} ms (best of {args.repeat}, status {status})")
+    finally:
+        for client in clients.values():
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
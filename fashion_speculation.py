@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation Questionnaire Speculation
+
+The questionnaire asks its questions in a fixed order, and every question has a handful
+of options. After each answer, the questionnaire API ranks candidates in a background
+thread while the user reads the next question. It ranks the preferences as they stand,
+in case the user asks for recommendations now, and the preferences after each of the
+most likely answers to the next question. Likelihood comes from the answers seen so far.
+When GET /recommendations arrives, its tags usually match one of these rankings and
+only the outfit draw is left to do. Rankings leave out the items the session has seen
+(see fashion_seen.py) and are only used while it has seen no more.
+
+Speculative work of a session is abandoned as soon as the session answers again, and a
+session stops speculating once it has used up its CPU budget.
+
+    FASHION_SPECULATION=0                   # disable speculation
+    FASHION_SPECULATION_BUDGET_MS=250       # CPU time per session
+    FASHION_SPECULATION_FANOUT=3            # next answers ranked after every answer
+
+Hit rates are exported as fashion_cache_requests_total{cache="speculation"}, the CPU
+time as fashion_speculation_cpu_seconds_total, and both are listed by GET /speculation.
+"""
+import collections
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fashion_grid import cell_key
+from fashion_metrics import REGISTRY, count_cache
+from fashion_questionnaire import FashionQuestionnaire, preference_tags
+
+SPECULATION_RANKINGS = REGISTRY.counter(
+    'fashion_speculation_rankings_total',
+    'Speculative rankings by outcome (computed, cached, stale or over_budget)', ['result'])
+SPECULATION_CPU_SECONDS = REGISTRY.counter(
+    'fashion_speculation_cpu_seconds_total', 'CPU time spent on speculative rankings')
+
+# Questions in the order the questionnaire asks them
+QUESTION_ORDER = (
+    'specific_occasion', 'gender', 'item_types', 'style_vibes', 'favorite_colors', 'preferred_materials',
+    'key_occasions', 'primary_seasons', 'casual_outfit_style', 'formal_outfit_color'
+)
+SINGLE_SELECTION = ('specific_occasion', 'gender', 'casual_outfit_style', 'formal_outfit_color')
+
+
+def question_options():
+    """
+    Get the options of every questionnaire question
+
+    Returns:
+        dict: Mapping of question id to its options
+    """
+    options = FashionQuestionnaire(None)
+    return {
+        'specific_occasion': options.OCCASIONS, 'gender': options.GENDERS, 'item_types': options.ITEM_TYPES,
+        'style_vibes': options.STYLES, 'favorite_colors': options.COLORS, 'preferred_materials': options.MATERIALS,
+        'key_occasions': options.OCCASIONS, 'primary_seasons': options.SEASONS,
+        'casual_outfit_style': options.STYLES, 'formal_outfit_color': options.COLORS
+    }
+
+
+class _SessionState:
+    """Speculative rankings and CPU time of one session."""
+
+    def __init__(self):
+        self.generation = 0
+        self.cpu_seconds = 0.0
+        # Cell key -> (recommender, seen-items version, candidates), oldest first
+        self.rankings = collections.OrderedDict()
+
+
+class Speculator:
+    """Ranks the likely next questionnaire states of each session in the background."""
+
+    def __init__(self, get_recommender=None, cpu_budget_ms=250.0, fanout=3, n_per_type=7,
+                 max_rankings=32, max_sessions=10000, seen=None):
+        """
+        Args:
+            get_recommender (callable): Returns the recommender, or None while it is not loaded
+            cpu_budget_ms (float): CPU time each session may spend on speculation
+            fanout (int): Most likely answers to the next question ranked after every answer
+            n_per_type (int): Candidates ranked per item type, as GET /recommendations asks for
+            max_rankings (int): Rankings kept per session, oldest dropped first
+            max_sessions (int): Sessions tracked, least recently answering dropped first
+            seen (SeenStore): Items seen by each session, left out of the rankings
+        """
+        self.get_recommender = get_recommender
+        self.seen = seen
+        self.cpu_budget = cpu_budget_ms / 1000.0
+        self.fanout = fanout
+        self.n_per_type = n_per_type
+        self.max_rankings = max_rankings
+        self.max_sessions = max_sessions
+        self.options = question_options()
+        # Answers seen per question, to guess the next answer
+        self.answer_counts = {question_id: collections.Counter() for question_id in QUESTION_ORDER}
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.totals = {'hits': 0, 'misses': 0, 'computed': 0, 'cpu_seconds': 0.0}
+
+    @classmethod
+    def from_env(cls, seen=None):
+        """
+        Create a speculator configured by the FASHION_SPECULATION* environment variables
+
+        Args:
+            seen (SeenStore): Items seen by each session, left out of the rankings
+
+        Returns:
+            Speculator: The speculator, or None when FASHION_SPECULATION=0
+        """
+        if os.environ.get('FASHION_SPECULATION', '1') == '0':
+            return None
+        return cls(cpu_budget_ms=float(os.environ.get('FASHION_SPECULATION_BUDGET_MS', 250)),
+                   fanout=int(os.environ.get('FASHION_SPECULATION_FANOUT', 3)), seen=seen)
+
+    def _session(self, session_id):
+        """Get the state of a session, creating it; call with the lock held."""
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = _SessionState()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return state
+
+    def hypotheses(self, preferences, question_id=None):
+        """
+        Get the preferences worth ranking after an answer, most likely first
+
+        Args:
+            preferences (dict): Current preferences of the session
+            question_id (str): Question just answered (None to rank only the current state)
+
+        Returns:
+            list: Preference dicts: the current ones, then one per likely next answer
+        """
+        hypotheses = [preferences]
+        if question_id not in QUESTION_ORDER:
+            return hypotheses
+        # The next question the user has not answered yet
+        following = QUESTION_ORDER[QUESTION_ORDER.index(question_id) + 1:]
+        next_question = next((question for question in following if not preferences.get(question)), None)
+        if next_question is None:
+            return hypotheses
+
+        counts = self.answer_counts[next_question]
+        options = sorted(self.options[next_question], key=lambda option: -counts[option])
+        for option in options[:self.fanout]:
+            value = option if next_question in SINGLE_SELECTION else [option]
+            hypotheses.append(dict(preferences, **{next_question: value}))
+        return hypotheses
+
+    def answered(self, session_id, preferences, question_id=None, selection=None):
+        """
+        Record an answer and start ranking the session's likely next states
+
+        Args:
+            session_id (str): Session that answered
+            preferences (dict): Session preferences after the answer
+            question_id (str): Question answered (None when the preferences were replaced)
+            selection (list): Selected options
+        """
+        with self._lock:
+            if question_id in self.answer_counts:
+                self.answer_counts[question_id].update(selection or [])
+            state = self._session(session_id)
+            state.generation += 1
+            generation = state.generation
+            if self._executor is None:
+                # One thread, so speculation never takes more than one core from requests
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speculation')
+        self._executor.submit(self._speculate, session_id, generation, self.hypotheses(preferences, question_id))
+
+    def _speculate(self, session_id, generation, hypotheses):
+        """Rank hypotheses until the session answers again or runs out of budget."""
+        recommender = self.get_recommender() if self.get_recommender is not None else None
+        if recommender is None:
+            return
+        exclude, version = (None, 0) if self.seen is None else self.seen.snapshot(session_id, recommender)
+        for preferences in hypotheses:
+            with self._lock:
+                state = self._sessions.get(session_id)
+                if state is None or state.generation != generation:
+                    SPECULATION_RANKINGS.inc(result='stale')
+                    return
+                if state.cpu_seconds >= self.cpu_budget:
+                    SPECULATION_RANKINGS.inc(result='over_budget')
+                    return
+            # Rankings of item-specific answers are not shared, so they are not worth guessing
+            if recommender.preference_overrides(preferences):
+                continue
+            tags = preference_tags(recommender, preferences, item_specific=False)
+            key = cell_key(tags)
+            with self._lock:
+                cached = key in state.rankings and state.rankings[key][:2] == (recommender, version)
+            if cached:
+                SPECULATION_RANKINGS.inc(result='cached')
+                continue
+
+            start = time.thread_time()
+            candidates = recommender.candidates_from_tags(tags, self.n_per_type, exclude=exclude)
+            cpu_seconds = time.thread_time() - start
+            SPECULATION_RANKINGS.inc(result='computed')
+            SPECULATION_CPU_SECONDS.inc(cpu_seconds)
+            with self._lock:
+                state.cpu_seconds += cpu_seconds
+                self.totals['computed'] += 1
+                self.totals['cpu_seconds'] += cpu_seconds
+                state.rankings[key] = (recommender, version, candidates)
+                while len(state.rankings) > self.max_rankings:
+                    state.rankings.popitem(last=False)
+
+    def lookup(self, session_id, recommender, tags, seen_version=0):
+        """
+        Get a speculative ranking of a session's tags
+
+        Args:
+            session_id (str): Session asking for recommendations
+            recommender (FashionRecommender): Recommender serving the request
+            tags (list): Tags of the request
+            seen_version (int): Version of the session's seen items (see SeenStore.snapshot())
+
+        Returns:
+            dict: Copy of the candidates for assemble_outfits(), or None on a miss
+        """
+        with self._lock:
+            state = self._sessions.get(session_id)
+            entry = state.rankings.get(cell_key(tags)) if state is not None else None
+            hit = entry is not None and entry[:2] == (recommender, seen_version)
+            self.totals['hits' if hit else 'misses'] += 1
+        count_cache('speculation', hit)
+        if not hit:
+            return None
+        # assemble_outfits() consumes its candidate lists
+        return {category: copy.copy(items) for category, items in entry[2].items()}
+
+    def reset(self, session_id):
+        """Forget a session's rankings; its CPU budget is not refunded."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state.generation += 1
+                state.rankings.clear()
+
+    def wait(self):
+        """Block until the queued speculation has run."""
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result()
+
+    def stats(self):
+        """Hit rate and CPU time of the speculation for GET /speculation."""
+        with self._lock:
+            lookups = self.totals['hits'] + self.totals['misses']
+            return dict(self.totals, hit_rate=self.totals['hits'] / lookups if lookups else None,
+                        sessions=len(self._sessions), cpu_budget_seconds=self.cpu_budget, fanout=self.fanout)
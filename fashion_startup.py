@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Fashion Recommendation API Startup
+
+This module lets the FastAPI apps open their port before the recommender exists.
+The app factories create a Warmup that loads the dataset and builds the TF-IDF index
+in a background thread once the server starts, optionally running a few synthetic
+queries to warm the caches. Until it finishes, recommendation routes answer 503 with a
+Retry-After header, GET /healthz reports the process as live and GET /readyz reports
+it as not ready.
+
+The time from process start to ready is reported by /readyz and as the
+fashion_startup_seconds gauge on /metrics.
+"""
+import functools
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from fashion_metrics import REGISTRY
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    'fashion_startup_seconds', 'Seconds from process start to each startup milestone', ['app', 'milestone'])
+
+# Fallback when the process start time cannot be read from /proc
+_IMPORT_TIME = time.time()
+
+
+def process_start_time():
+    """
+    Get the wall-clock time the current process started
+
+    Returns:
+        float: Start time in seconds since the epoch
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name; starttime is field 22 of the full line
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return _IMPORT_TIME
+
+
+def default_build(grid_path=None, neighbours_path=None):
+    """
+    Get the recommender factory the APIs use unless they are given their own
+
+    Args:
+        grid_path (str): Materialized grid attached to the recommender
+        neighbours_path (str): Item neighbour table attached to the recommender
+
+    Returns:
+        callable: Builds a FashionRecommender from a dataset path, with catalog
+            compaction if FASHION_COMPACT=1 and fast JSON if FASHION_FAST_JSON=1
+    """
+    from fashion_recommender import FashionRecommender
+
+    return functools.partial(FashionRecommender, grid_path=grid_path, neighbours_path=neighbours_path,
+                             compact=os.environ.get('FASHION_COMPACT', '0') != '0',
+                             fast_json=os.environ.get('FASHION_FAST_JSON', '0') != '0')
+
+
+class Warmup:
+    """Build a FashionRecommender in a background thread and track readiness."""
+
+    # Question without known tags, so warm-up also builds the question-fallback index
+    WARMUP_QUESTION = "What should I wear?"
+
+    def __init__(self, dataset_path, app_name, warmup_queries=0, seed=0, build=None):
+        """
+        Initialize the warm-up
+
+        Args:
+            dataset_path (str): Path to the fashion dataset CSV
+            app_name (str): Value of the 'app' label of the startup metrics
+            warmup_queries (int): Number of synthetic queries run before reporting ready
+            seed (int): Random seed for the synthetic queries
+            build (callable): Builds the recommender from the dataset path (defaults to
+                default_build() with the grid named by FASHION_GRID and the neighbour
+                table named by FASHION_NEIGHBOURS, if set)
+        """
+        self.dataset_path = dataset_path
+        self.app_name = app_name
+        self.warmup_queries = warmup_queries
+        self.seed = seed
+        self.build = build
+        self.recommender = None
+        self.error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    def start(self):
+        """Start the warm-up thread unless it is already running."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.app_name}-warmup', daemon=True)
+                self._thread.start()
+
+    def preload(self):
+        """
+        Build the recommender in the calling thread, e.g. in a server master before
+        it forks its workers, so the workers share the index pages copy-on-write
+
+        Returns:
+            FashionRecommender: The recommender
+        """
+        with self._lock:
+            run_here = self._thread is None
+            if run_here:
+                self._thread = threading.current_thread()
+        if run_here:
+            self._run()
+        return self.wait()
+
+    def _run(self):
+        started = process_start_time()
+        self._record('started', time.time() - started)
+        try:
+            start = time.perf_counter()
+            if self.build is None:
+                self.build = default_build(grid_path=os.environ.get('FASHION_GRID'),
+                                           neighbours_path=os.environ.get('FASHION_NEIGHBOURS'))
+            recommender = self.build(self.dataset_path)
+            self.timings['build_s'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self._warm(recommender)
+            self.timings['warmup_s'] = time.perf_counter() - start
+            self.recommender = recommender
+            self._record('ready', time.time() - started)
+            print(f"{self.app_name} ready {self.timings['ready_s']:.2f}s after process start "
+                  f"(build {self.timings['build_s']:.2f}s, warm-up {self.timings['warmup_s']:.2f}s)",
+                  file=sys.stderr)
+            compaction = getattr(recommender, 'compaction', None)
+            if compaction:
+                print(f"{self.app_name} compacted {compaction['source_rows']} rows into {compaction['items']} "
+                      f"items in {compaction['seconds']:.2f}s", file=sys.stderr)
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            self._ready.set()
+
+    def _record(self, milestone, seconds):
+        self.timings[f'{milestone}_s'] = seconds
+        STARTUP_SECONDS.set_function(lambda: seconds, app=self.app_name, milestone=milestone)
+
+    def _warm(self, recommender):
+        """Run synthetic queries so the first real requests hit warm caches."""
+        if not self.warmup_queries:
+            return
+        rng = random.Random(self.seed)
+        vocabularies = [recommender.item_types, recommender.styles, recommender.colors,
+                        recommender.materials, recommender.occasions, recommender.seasons]
+        for i in range(self.warmup_queries):
+            tags = [rng.choice(vocabulary) for vocabulary in rng.sample(vocabularies, 3)]
+            recommender.format_outfit_recommendations(recommender.get_recommendations_from_tags(tags, seed=i))
+        recommender.get_recommendations_from_question(self.WARMUP_QUESTION, seed=0)
+
+    def wait(self, timeout=None):
+        """
+        Start the warm-up if needed and block until the recommender is ready
+
+        Args:
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            FashionRecommender: The recommender
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"{self.app_name} was not ready after {timeout}s")
+        if self.error is not None:
+            raise RuntimeError(f"{self.app_name} failed to start") from self.error
+        return self.recommender
+
+    def get(self):
+        """
+        Get the recommender for a request, or answer 503 while it is warming up
+
+        Returns:
+            FashionRecommender: The recommender
+        """
+        if not self._ready.is_set():
+            self.start()
+            raise HTTPException(status_code=503, detail="Recommender is warming up",
+                                headers={'Retry-After': '1'})
+        if self.error is not None:
+            raise HTTPException(status_code=503, detail="Recommender failed to load")
+        return self.recommender
+
+    def status(self):
+        """Readiness and startup timings for /readyz."""
+        if self.error is not None:
+            state = 'failed'
+        elif self._ready.is_set():
+            state = 'ready'
+        else:
+            state = 'starting'
+        return {'status': state, 'timings': {name: round(seconds, 3) for name, seconds in self.timings.items()}}
+
+
+def get_recommender(request: Request,
+                    catalog: Optional[str] = Query(None, description="Catalog id (defaults to the app's dataset)")):
+    """FastAPI dependency returning the recommender of the app or of the requested catalog."""
+    if catalog is None:
+        return request.app.state.warmup.get()
+    registry = getattr(request.app.state, 'catalogs', None)
+    if registry is None or catalog not in registry:
+        raise HTTPException(status_code=404, detail=f"Unknown catalog: {catalog}")
+    try:
+        return registry.get(catalog)
+    except Exception:
+        raise HTTPException(status_code=503, detail=f"Catalog {catalog} failed to load")
+
+
+def warmup_queries_from_env():
+    """Number of warm-up queries configured by FASHION_WARMUP_QUERIES (default 0)."""
+    return int(os.environ.get('FASHION_WARMUP_QUERIES', 0))
+
+
+def install_health(app, warmup):
+    """
+    Attach a warm-up to an app and add GET /healthz and GET /readyz
+
+    Args:
+        app (FastAPI): The app to extend
+        warmup (Warmup): Warm-up building the app's recommender
+    """
+    app.state.warmup = warmup
+    # Build the recommender once the server is up, so the port opens immediately
+    app.router.add_event_handler("startup", warmup.start)
+
+    @app.get("/healthz", tags=["Monitoring"], include_in_schema=False)
+    def healthz():
+        """Liveness: the process is up and serving HTTP."""
+        return {"status": "ok"}
+
+    @app.get("/readyz", tags=["Monitoring"], include_in_schema=False)
+    def readyz():
+        """Readiness: the recommender index is loaded."""
+        warmup.start()
+        return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
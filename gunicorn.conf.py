@@ -0,0 +1,64 @@
+"""
+Gunicorn configuration for the Fashion Recommendation Service
+
+The app is imported and the recommender built once in the master process; workers
+are forked afterwards and share the dataset, TF-IDF matrix and vocabulary pages
+copy-on-write. The garbage collector is disabled in the master until the fork and the
+preloaded objects are frozen, so collections in the workers never write to (and
+thereby un-share) their pages. Workers are recycled gracefully after a jittered
+number of requests.
+
+The recommendation routes are stateless. Questionnaire sessions, seen-item bitmasks
+and speculated rankings live in the memory of the worker that served them, so the
+questionnaire routes need sticky sessions in front of a multi-worker service, or a
+dedicated service with one worker that is never recycled:
+
+    WEB_CONCURRENCY=1 FASHION_MAX_REQUESTS=0 gunicorn -c gunicorn.conf.py fashion_questionnaire_api:app
+
+Settings can be overridden through the environment:
+
+    PORT                      Port to bind (default 8000)
+    WEB_CONCURRENCY           Number of workers (default: number of CPUs)
+    FASHION_MAX_REQUESTS      Requests before a worker is recycled (default 10000, 0 disables)
+    FASHION_GRACEFUL_TIMEOUT  Seconds a recycled worker gets to finish its requests (default 30)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app (and build the index) in the master before forking
+preload_app = True
+
+# Recycle workers gracefully; the jitter keeps them from restarting all at once
+max_requests = int(os.environ.get('FASHION_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = int(os.environ.get('FASHION_GRACEFUL_TIMEOUT', 30))
+timeout = 60
+
+# Objects allocated before the fork should stay where they are: collecting in the
+# master would leave holes that later allocations fill, touching shared pages
+gc.disable()
+
+
+def when_ready(server):
+    """Build the recommender in the master and freeze the heap before forking."""
+    app = server.app.wsgi()
+    recommender = app.state.warmup.preload()
+    server.log.info("Preloaded recommender with %d items in %.2fs",
+                    recommender.tag_matrix.shape[0], app.state.warmup.timings['build_s'])
+    # Questionnaire state does not survive switching or recycling workers
+    paths = {getattr(route, 'path', None) for route in app.routes}
+    if '/answers/{question_id}' in paths and (server.cfg.workers > 1 or server.cfg.max_requests):
+        server.log.warning("Questionnaire sessions are kept per worker; with %d workers and max_requests=%d "
+                           "they need sticky sessions or a dedicated single-worker service",
+                           server.cfg.workers, server.cfg.max_requests)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Re-enable garbage collection in the worker; frozen objects are never scanned."""
+    gc.enable()
@@ -0,0 +1,113 @@
+import unittest
+import json
+import os
+import sys
+import threading
+from unittest import mock
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import fashion_admin
+from fashion_recommender import FashionRecommender
+from fashion_admin import install_admin
+from fashion_benchmark import ASGIReplayer
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+class TestAdminRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+
+    def setUp(self):
+        self.sessions = {'default': {'style_vibes': ['casual'], 'favorite_colors': ['blue', 'white']}}
+        app = FastAPI()
+        install_admin(app, get_recommender=lambda: self.recommender, sessions=self.sessions)
+        self.client = ASGIReplayer(app)
+        self.addCleanup(self.client.close)
+
+    def test_routes_require_token(self):
+        with mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('FASHION_ADMIN_TOKEN', None)
+            status, _ = self.client.request('GET', '/debug/profile?seconds=0.1', headers=ADMIN)
+            self.assertEqual(status, 404)
+        with mock.patch.dict(os.environ, {'FASHION_ADMIN_TOKEN': 'secret'}):
+            status, _ = self.client.request('GET', '/debug/profile?seconds=0.1', headers={'X-Admin-Token': 'wrong'})
+            self.assertEqual(status, 403)
+
+    def test_profile_samples_busy_threads(self):
+        stop = threading.Event()
+
+        def busy():
+            while not stop.is_set():
+                self.recommender.get_recommendations_from_tags(['casual', 'summer', 'cotton'])
+
+        worker = threading.Thread(target=busy)
+        worker.start()
+        try:
+            with mock.patch.dict(os.environ, {'FASHION_ADMIN_TOKEN': 'secret'}):
+                status, body = self.client.request('GET', '/debug/profile?seconds=0.5&interval_ms=5', headers=ADMIN)
+        finally:
+            stop.set()
+            worker.join()
+
+        self.assertEqual(status, 200)
+        lines = body.decode('utf-8').splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+        self.assertTrue(any('get_recommendations_from_tags (fashion_recommender.py' in line for line in lines))
+
+    def test_one_profile_at_a_time(self):
+        with fashion_admin._profile_lock, mock.patch.dict(os.environ, {'FASHION_ADMIN_TOKEN': 'secret'}):
+            status, _ = self.client.request('GET', '/debug/profile?seconds=0.1', headers=ADMIN)
+        self.assertEqual(status, 409)
+
+    def test_memory_report(self):
+        report = self.recommender.memory_report()
+        self.assertEqual(set(report['tag_matrix']), {'data', 'indices', 'indptr'})
+        self.assertEqual(report['tag_matrix']['data'], self.recommender.tag_matrix.data.nbytes)
+        # Object columns are measured deeply, not as 8-byte pointers
+        self.assertGreater(report['dataframe']['AnswerText'], 8 * len(self.recommender.df))
+        self.assertGreater(report['vocabulary']['vocabulary_dict'], 0)
+        self.assertGreater(report['total_bytes'], report['tag_matrix']['data'])
+
+        with mock.patch.dict(os.environ, {'FASHION_ADMIN_TOKEN': 'secret'}):
+            status, body = self.client.request('GET', '/debug/memory', headers=ADMIN)
+        self.assertEqual(status, 200)
+        sessions = json.loads(body)['sessions']
+        self.assertEqual(sessions['count'], 1)
+        self.assertGreater(sessions['average_bytes'], 0)
+
+    def test_memory_report_counts_optional_structures(self):
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"),
+                                         compact=True, fast_json=True)
+        report = recommender.memory_report()
+        self.assertGreater(report['item_json'], sum(map(len, recommender.item_json.values())))
+        self.assertEqual(set(report['compaction']), {'source_questions', 'item_of_row', 'item_sources'})
+        self.assertGreater(report['compaction']['source_questions'], 8 * len(recommender.source_questions))
+        self.assertEqual(report['compaction']['item_of_row'], recommender.item_of_row.nbytes)
+        self.assertNotIn('item_json', self.recommender.memory_report())
+
+    def test_memory_trace_reports_growth(self):
+        with mock.patch.dict(os.environ, {'FASHION_ADMIN_TOKEN': 'secret'}):
+            status, _ = self.client.request('GET', '/debug/memory/trace', headers=ADMIN)
+            self.assertEqual(status, 409)
+            self.client.request('POST', '/debug/memory/trace', headers=ADMIN)
+            try:
+                leaked = [bytearray(1024) for _ in range(1000)]
+                status, body = self.client.request('GET', '/debug/memory/trace?top=5', headers=ADMIN)
+            finally:
+                self.client.request('DELETE', '/debug/memory/trace', headers=ADMIN)
+        self.assertEqual(status, 200)
+        diff = json.loads(body)
+        self.assertGreater(diff['size_diff_bytes'], 1000 * 1024)
+        self.assertTrue(any('test_admin.py' in site['location'] for site in diff['top']))
+        del leaked
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_admission import ADMISSION_SHED, install_admission
+
+async def call(app, path):
+    """Send one GET request through the app and return (status, headers, seconds)."""
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+             'root_path': '', 'headers': [], 'client': ('127.0.0.1', 0), 'server': ('test', 80)}
+    response = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = dict(message['headers'])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return response['status'], response['headers'], time.perf_counter() - start
+
+def make_app(app_name, limits, retry_after=1):
+    """App with a slow scoring endpoint, a cheap endpoint and a health probe."""
+    app = FastAPI()
+
+    @app.get("/recommendations/slow")
+    def slow():
+        time.sleep(0.4)
+        return {}
+
+    @app.get("/questions")
+    def questions():
+        return []
+
+    @app.get("/healthz")
+    def healthz():
+        return {}
+
+    install_admission(app, app_name, limits=limits, retry_after=retry_after)
+    return app
+
+class TestAdmissionControl(unittest.TestCase):
+    def test_sheds_scoring_but_serves_cheap_endpoints(self):
+        app = make_app("test_admission", {'scoring': (1, 1, 100.0), 'cheap': (4, 4, 1000.0)}, retry_after=3)
+        deadline_before = ADMISSION_SHED.value(app="test_admission", endpoint_class="scoring", reason="deadline")
+        full_before = ADMISSION_SHED.value(app="test_admission", endpoint_class="scoring", reason="queue_full")
+
+        async def burst():
+            scoring = [asyncio.ensure_future(call(app, "/recommendations/slow")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            cheap = await call(app, "/questions")
+            health = await call(app, "/healthz")
+            return await asyncio.gather(*scoring), cheap, health
+
+        loop = asyncio.new_event_loop()
+        try:
+            scoring, cheap, health = loop.run_until_complete(burst())
+        finally:
+            loop.close()
+
+        statuses = sorted(status for status, _, _ in scoring)
+        self.assertEqual(statuses, [200, 503, 503])
+        for status, headers, seconds in scoring:
+            if status == 503:
+                self.assertEqual(headers[b'retry-after'], b'3')
+                # Rejected at the queue deadline at the latest, not after the slow request
+                self.assertLess(seconds, 0.3)
+        self.assertEqual(cheap[0], 200)
+        self.assertLess(cheap[2], 0.3)
+        self.assertEqual(health[0], 200)
+
+        self.assertEqual(ADMISSION_SHED.value(app="test_admission", endpoint_class="scoring",
+                                              reason="deadline"), deadline_before + 1)
+        self.assertEqual(ADMISSION_SHED.value(app="test_admission", endpoint_class="scoring",
+                                              reason="queue_full"), full_before + 1)
+
+    def test_queued_request_gets_released_slot(self):
+        app = make_app("test_admission_queue", {'scoring': (1, 2, 2000.0), 'cheap': (4, 4, 1000.0)})
+
+        async def burst():
+            return await asyncio.gather(*(call(app, "/recommendations/slow") for _ in range(3)))
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(burst())
+        finally:
+            loop.close()
+        self.assertEqual([status for status, _, _ in results], [200, 200, 200])
+        # One at a time: the last request waited for the two before it
+        self.assertGreater(max(seconds for _, _, seconds in results), 1.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_ann_index import IVFIndex, sample_queries
+
+class TestIVFIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+        cls.index = IVFIndex.build(cls.recommender)
+
+    def test_full_probe_matches_exact_search(self):
+        for tags in sample_queries(self.recommender, 20):
+            query_vector = self.recommender.vectorizer.transform([' '.join(tags)])
+            exact = self.recommender.rank_candidates(query_vector, 7, exact=True)
+            approximate = self.index.search(query_vector, 7, n_probe=self.index.max_clusters_per_type)
+
+            for item_type, (ids, scores) in exact.items():
+                self.assertEqual(ids.tolist(), approximate[item_type][0].tolist())
+
+    def test_item_type_without_items(self):
+        # The first item type has no rows in this part of the catalog
+        first_type = next(iter(self.recommender.category_mapping))
+        rows = np.flatnonzero(~self.recommender.df['Tags'].str.contains(first_type).to_numpy())
+        recommender = FashionRecommender(self.dataset_path, rows=rows)
+        index = IVFIndex.build(recommender)
+        for tags in sample_queries(recommender, 10):
+            query_vector = recommender.vectorizer.transform([' '.join(tags)])
+            exact = recommender.rank_candidates(query_vector, 7, exact=True)
+            approximate = index.search(query_vector, 7, n_probe=index.max_clusters_per_type)
+            self.assertEqual(len(approximate[first_type][0]), 0)
+            for item_type, (ids, scores) in exact.items():
+                self.assertEqual(ids.tolist(), approximate[item_type][0].tolist())
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "catalog.ivf.npz")
+            self.index.save(index_path)
+
+            # The recommender loads the persisted index and still returns outfits
+            recommender = FashionRecommender(self.dataset_path, ann_index_path=index_path)
+            self.assertEqual(recommender.ann_index.n_clusters, self.index.n_clusters)
+            outfits = recommender.get_recommendations_from_tags(['casual', 'summer', 'party'])
+            self.assertTrue(len(outfits) > 0)
+
+    def test_rejects_stale_index(self):
+        self.index.meta['n_items'] += 1
+        try:
+            with self.assertRaises(ValueError):
+                self.index.attach(self.recommender)
+        finally:
+            self.index.meta['n_items'] -= 1
+
+if __name__ == '__main__':
+    unittest.main()
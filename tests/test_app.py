@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import json
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_benchmark import ASGIReplayer
+
+class TestServiceApp(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import app
+        cls.app = app.create_app()
+        cls.app.state.warmup.preload()
+        cls.client = ASGIReplayer(cls.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.close()
+
+    def test_serves_both_apis(self):
+        status, body = self.client.request('GET', '/')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['name'], "Fashion Recommendation Service")
+
+        status, body = self.client.request('POST', '/recommendations/tags', {'tags': ['casual', 'summer']})
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(body)['outfits'])
+
+        preferences = {'style_vibes': ['Casual'], 'favorite_colors': ['Blue'], 'specific_occasion': 'Casual'}
+        self.assertEqual(self.client.request('POST', '/preferences', preferences)[0], 200)
+        status, body = self.client.request('GET', '/recommendations')
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(body)['outfits'])
+
+    def test_preloaded_app_is_ready(self):
+        status, body = self.client.request('GET', '/readyz')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['status'], 'ready')
+
+if __name__ == '__main__':
+    unittest.main()
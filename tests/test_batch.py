@@ -0,0 +1,46 @@
+import unittest
+import os
+import sys
+import json
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender, run_batch
+
+class TestBatchMode(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+        requests = []
+        for i in range(60):
+            if i % 3 == 0:
+                requests.append({'id': f'q{i}', 'query': 'casual summer party outfit', 'seed': i})
+            elif i % 3 == 1:
+                requests.append({'tags': 'formal, black', 'count': 3, 'seed': i})
+            else:
+                requests.append({'preferences': {'style_vibes': ['Boho'], 'favorite_colors': ['Red']}, 'seed': i})
+        cls.lines = [json.dumps(request) + "\n" for request in requests]
+        cls.lines.insert(10, "\n")
+        cls.lines.insert(20, "{not json}\n")
+
+    def test_results_match_single_requests(self):
+        results = list(run_batch(self.recommender, self.lines, chunk_size=8))
+        self.assertEqual(len(results), 61)
+        self.assertEqual(results[0]['id'], 'q0')
+        self.assertIn('error', results[19])
+        self.assertEqual(results[19]['id'], 21)
+
+        expected = self.recommender.get_recommendations_from_tags(['formal', 'black'], 3, seed=1)
+        self.assertEqual(results[1]['outfits'], self.recommender.format_outfit_recommendations(expected))
+        expected = self.recommender.get_recommendations_from_question('casual summer party outfit', seed=3)
+        self.assertEqual(results[3]['outfits'], self.recommender.format_outfit_recommendations(expected))
+
+    def test_process_pool_preserves_order(self):
+        serial = list(run_batch(self.recommender, self.lines, chunk_size=8))
+        parallel = list(run_batch(self.recommender, iter(self.lines), n_workers=2, chunk_size=8))
+        self.assertEqual(parallel, serial)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_benchmark import build_corpus, find_regressions, run_benchmark
+
+class TestBenchmark(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+
+    def test_replay_reports_every_stage(self):
+        corpus = build_corpus(self.recommender, n_requests=5)
+        self.assertEqual({request['kind'] for request in corpus}, {'tags', 'question', 'preferences'})
+
+        summary = run_benchmark(corpus, self.recommender, warmup=2)
+        self.assertIn('recommender.tags', summary)
+        self.assertIn('api.question', summary)
+        self.assertIn('questionnaire_api.recommendations', summary)
+        for stats in summary.values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+    def test_regression_gate(self):
+        baseline = {'api.tags': {'p50_ms': 10.0, 'p95_ms': 20.0}}
+        self.assertEqual(find_regressions({'api.tags': {'p50_ms': 11.0, 'p95_ms': 21.0}}, baseline, 0.25), [])
+        regressions = find_regressions({'api.tags': {'p50_ms': 13.0, 'p95_ms': 21.0}}, baseline, 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('p50_ms', regressions[0])
+
+if __name__ == '__main__':
+    unittest.main()
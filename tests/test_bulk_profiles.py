@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_questionnaire import preference_tags, read_profiles, score_profiles
+
+class TestBulkProfiles(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+        cls.profiles = [
+            {'gender': 'Women', 'style_vibes': ['Casual'], 'specific_occasion': 'Casual',
+             'casual_outfit_style': 'Boho', 'primary_seasons': ['Summer']},
+            {'gender': 'Men', 'style_vibes': ['Formal'], 'specific_occasion': 'Wedding',
+             'formal_outfit_color': 'Black', 'favorite_colors': ['Blue']},
+            {'style_vibes': ['Vintage'], 'favorite_colors': ['Red'], 'key_occasions': ['Party'],
+             'item_types': ['Scarf'], 'item_specific_preferences': {'Scarf': {'colors': ['Yellow']}}},
+        ] * 10
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profile_dir = os.path.join(self.tmp_dir.name, 'profiles')
+        os.makedirs(self.profile_dir)
+        for i, preferences in enumerate(self.profiles):
+            with open(os.path.join(self.profile_dir, f'user_{i:03d}.json'), 'w') as f:
+                json.dump(preferences, f)
+        with open(os.path.join(self.profile_dir, 'broken.json'), 'w') as f:
+            f.write('{not json')
+        self.output_path = os.path.join(self.tmp_dir.name, 'results.jsonl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_results(self):
+        with open(self.output_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_results_apply_questionnaire_rules(self):
+        counts = score_profiles(self.recommender, read_profiles(self.profile_dir), self.output_path,
+                                chunk_size=8, seed=5)
+        self.assertEqual(counts, {'scored': 30, 'failed': 1, 'skipped': 0})
+
+        results = {result['id']: result for result in self.read_results()}
+        self.assertIn('error', results['broken.json'])
+        # Item-specific preferences are scored as item overrides, like GET /recommendations
+        for i, preferences in enumerate(self.profiles):
+            expected = self.recommender.get_recommendations_from_tags(
+                preference_tags(self.recommender, preferences, item_specific=False), seed=5,
+                item_overrides=self.recommender.preference_overrides(preferences))
+            self.assertEqual(results[f'user_{i:03d}.json']['outfits'],
+                             self.recommender.format_outfit_recommendations(expected))
+
+    def test_restart_skips_finished_profiles(self):
+        score_profiles(self.recommender, read_profiles(self.profile_dir), self.output_path, seed=5)
+        complete = self.read_results()
+
+        # Simulate a crash after 12 results, in the middle of writing the 13th
+        with open(self.output_path) as f:
+            lines = f.readlines()
+        with open(self.output_path, 'w') as f:
+            f.writelines(lines[:12])
+            f.write(lines[12][:20])
+
+        counts = score_profiles(self.recommender, read_profiles(self.profile_dir), self.output_path,
+                                n_workers=2, chunk_size=4, seed=5)
+        # The broken profile failed among the first 12 and is retried
+        self.assertIn('error', complete[1])
+        self.assertEqual(counts['skipped'], 11)
+        self.assertEqual(counts['scored'] + counts['failed'], 31 - 11)
+        resumed = self.read_results()
+        self.assertEqual(resumed[:12], complete[:12])
+        self.assertEqual(len(resumed), len(complete) + 1)
+        self.assertEqual({result['id']: result for result in resumed},
+                         {result['id']: result for result in complete})
+
+    def test_failed_profiles_are_retried(self):
+        counts = score_profiles(self.recommender, [('user', ['Casual'])], self.output_path)
+        self.assertEqual(counts, {'scored': 0, 'failed': 1, 'skipped': 0})
+
+        counts = score_profiles(self.recommender, [('user', {'style_vibes': ['Casual']})], self.output_path)
+        self.assertEqual(counts, {'scored': 1, 'failed': 0, 'skipped': 0})
+        counts = score_profiles(self.recommender, [('user', {'style_vibes': ['Casual']})], self.output_path)
+        self.assertEqual(counts, {'scored': 0, 'failed': 0, 'skipped': 1})
+        self.assertEqual(['error' in result for result in self.read_results()], [True, False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_catalog_generator import CatalogProfile, generate_catalog
+
+class TestCatalogGenerator(unittest.TestCase):
+    def test_generated_catalog_loads_in_recommender(self):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        source = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+        profile = CatalogProfile.from_recommender(source)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "catalog.csv")
+            generate_catalog(profile, 2500, path, seed=1)
+
+            df = pd.read_csv(path)
+            self.assertEqual(list(df.columns), ['QuestionText', 'AnswerText', 'Tags'])
+            self.assertEqual(len(df), 2500)
+            self.assertLess(df['AnswerText'].nunique(), len(df))
+            for tags in df['Tags'].str.split(',').head(100):
+                self.assertIn(tags[0], source.item_types)
+                self.assertIn(tags[1], source.styles)
+
+            recommender = FashionRecommender(path)
+            outfits = recommender.get_recommendations_from_tags(['casual', 'summer', 'party'])
+            self.assertTrue(len(outfits) > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import json
+import os
+import sys
+import threading
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_catalogs import CatalogRegistry, install_catalogs
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestCatalogRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def test_concurrent_first_requests_share_one_build(self):
+        started = threading.Event()
+        release = threading.Event()
+        builds = []
+
+        def build(path):
+            builds.append(path)
+            started.set()
+            release.wait()
+            return self.recommender
+
+        registry = CatalogRegistry({'eu': self.dataset_path}, 'test_catalogs', build=build, sizeof=lambda r: 1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get('eu'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        started.wait(timeout=10)
+        self.assertEqual(registry.status()['catalogs']['eu']['state'], 'loading')
+        release.set()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is self.recommender for result in results))
+        stats = registry.status()['catalogs']['eu']
+        self.assertEqual((stats['loads'], stats['misses'], stats['shared'] + stats['hits']), (1, 1, 7))
+        self.assertEqual(stats['state'], 'loaded')
+
+    def test_evicts_least_recently_used_over_budget(self):
+        catalogs = {name: f'{name}.csv' for name in ('a', 'b', 'c')}
+        registry = CatalogRegistry(catalogs, 'test_catalogs', memory_budget=250,
+                                   build=lambda path: object(), sizeof=lambda r: 100)
+        a = registry.get('a')
+        registry.get('b')
+        self.assertIs(registry.get('a'), a)
+        registry.get('c')
+
+        status = registry.status()
+        self.assertEqual(status['lru'], ['a', 'c'])
+        self.assertEqual(status['loaded_bytes'], 200)
+        self.assertEqual(status['catalogs']['b']['evictions'], 1)
+        self.assertEqual(status['catalogs']['b']['state'], 'unloaded')
+
+        # An evicted catalog is rebuilt on its next request
+        registry.get('b')
+        self.assertEqual(registry.status()['catalogs']['b']['loads'], 2)
+        self.assertEqual(registry.status()['lru'], ['c', 'b'])
+
+    def test_failed_build_is_retried(self):
+        attempts = []
+
+        def build(path):
+            attempts.append(path)
+            if len(attempts) == 1:
+                raise OSError("catalog not found")
+            return object()
+
+        registry = CatalogRegistry({'eu': 'eu.csv'}, 'test_catalogs', build=build, sizeof=lambda r: 1)
+        with self.assertRaises(RuntimeError):
+            registry.get('eu')
+        registry.get('eu')
+        stats = registry.status()['catalogs']['eu']
+        self.assertEqual((stats['load_errors'], stats['loads']), (1, 1))
+        with self.assertRaises(KeyError):
+            registry.get('us')
+
+    def test_api_selects_catalog(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        warmup = Warmup(self.dataset_path, 'test_catalogs', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        registry = CatalogRegistry({'eu': self.dataset_path}, 'test_catalogs',
+                                   build=lambda path: self.recommender)
+        install_catalogs(app, 'test_catalogs', registry)
+        warmup.preload()
+
+        client = ASGIReplayer(app)
+        try:
+            body = {'tags': ['casual', 'summer']}
+            self.assertEqual(client.request('POST', '/recommendations/tags?catalog=eu', body)[0], 200)
+            self.assertEqual(client.request('POST', '/recommendations/tags?catalog=us', body)[0], 404)
+            self.assertEqual(client.request('POST', '/recommendations/tags', body)[0], 200)
+            status, body = client.request('GET', '/catalogs')
+        finally:
+            client.close()
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['catalogs']['eu']['state'], 'loaded')
+        self.assertEqual(registry.status()['catalogs']['eu']['misses'], 1)
+        self.assertGreater(registry.status()['catalogs']['eu']['bytes'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+
+try:
+    from fashion_columnar import convert_csv
+except ImportError:
+    convert_csv = None
+
+@unittest.skipIf(convert_csv is None, "pyarrow is not installed")
+class TestColumnarCatalogs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_columnar_index_matches_csv(self):
+        for extension in ('parquet', 'feather'):
+            path = os.path.join(self.tmp_dir.name, f"catalog.{extension}")
+            self.assertEqual(convert_csv(self.dataset_path, path), len(self.recommender.df))
+            recommender = FashionRecommender(path)
+
+            self.assertTrue(recommender.df.equals(self.recommender.df))
+            self.assertEqual(recommender.vectorizer.vocabulary_, self.recommender.vectorizer.vocabulary_)
+            # Weights are identical bit for bit, not just close
+            for attribute in ('indptr', 'indices', 'data'):
+                self.assertTrue(np.array_equal(getattr(recommender.tag_matrix, attribute),
+                                               getattr(self.recommender.tag_matrix, attribute)))
+            for item_type, indices in self.recommender.category_indices.items():
+                self.assertEqual(recommender.category_indices[item_type].tolist(), indices.tolist())
+            self.assertEqual(recommender.get_recommendations_from_tags(['casual', 'summer'], seed=2),
+                             self.recommender.get_recommendations_from_tags(['casual', 'summer'], seed=2))
+
+    def test_row_subset(self):
+        path = os.path.join(self.tmp_dir.name, "subset.parquet")
+        convert_csv(self.dataset_path, path)
+        rows = np.arange(0, len(self.recommender.df), 7)
+        recommender = FashionRecommender(path, rows=rows, vectorizer=self.recommender.vectorizer)
+        expected = FashionRecommender(self.dataset_path, rows=rows, vectorizer=self.recommender.vectorizer)
+        self.assertTrue(recommender.df.equals(expected.df))
+        self.assertEqual((recommender.tag_matrix != expected.tag_matrix).nnz, 0)
+
+if __name__ == '__main__':
+    unittest.main()
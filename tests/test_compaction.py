@@ -0,0 +1,47 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+
+class TestCatalogCompaction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.source = FashionRecommender(dataset_path)
+        cls.recommender = FashionRecommender(dataset_path, compact=True)
+
+    def test_one_record_per_item(self):
+        df = self.recommender.df
+        self.assertEqual(len(df), self.source.df['AnswerText'].nunique())
+        self.assertTrue(df['AnswerText'].is_unique)
+        self.assertEqual(df['Multiplicity'].sum(), len(self.source.df))
+        self.assertEqual(self.recommender.tag_matrix.shape[0], len(df))
+        self.assertEqual(self.recommender.compaction['source_rows'], len(self.source.df))
+
+    def test_merged_tags_and_sources(self):
+        row = self.recommender.df.index[self.recommender.df['AnswerText'] == 'Quick-Dry Training Shirt'][0]
+        self.assertEqual(self.recommender.df['Tags'].iat[row], 'gymwear,quick-dry,training,men,women')
+
+        sources = self.recommender.item_sources(row)
+        self.assertEqual([source_row for source_row, _ in sources], [4019, 4025])
+        for source_row, question in sources:
+            self.assertEqual(self.source.df['AnswerText'].iat[source_row], 'Quick-Dry Training Shirt')
+            self.assertEqual(self.source.df['QuestionText'].iat[source_row], question)
+
+    def test_candidates_are_distinct_items(self):
+        # Without compaction the same skirt fills two of the seven slots for this query
+        query_vector = self.recommender.vectorizer.transform(['suede spring sneakers'])
+        for item_type, (ids, _) in self.recommender.rank_candidates(query_vector, 7).items():
+            names = self.recommender.df['AnswerText'].iloc[ids].tolist()
+            self.assertEqual(len(names), len(set(names)), item_type)
+
+        outfits = self.recommender.get_recommendations_from_question("What should I wear?", seed=1)
+        self.assertTrue(len(outfits) > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_deadline import StageCosts
+from fashion_grid import build_grid
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestDeadline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def setUp(self):
+        # Every test plans with its own step costs, taken as observed
+        self.recommender.stage_costs = StageCosts(cold_samples=0)
+
+    def test_generous_deadline_changes_nothing(self):
+        degraded = []
+        outfits = self.recommender.get_recommendations_from_tags(['casual', 'summer'], seed=3,
+                                                                 deadline_ms=10000, degraded=degraded)
+        self.assertEqual(outfits, self.recommender.get_recommendations_from_tags(['casual', 'summer'], seed=3))
+        self.assertEqual(degraded, [])
+        self.assertGreater(self.recommender.stage_costs.estimate('ranking'), 0)
+
+    def test_skips_scoring_that_cannot_finish(self):
+        self.recommender.stage_costs.observe('ranking', 1.0)
+        degraded = []
+        outfits = self.recommender.get_recommendations_from_tags(['casual', 'summer'], deadline_ms=30,
+                                                                 degraded=degraded)
+        self.assertEqual((outfits, degraded), ([], ['scoring']))
+
+    def test_first_sample_is_not_the_estimate(self):
+        costs = StageCosts()
+        costs.observe('ranking', 5.0)
+        self.assertEqual(costs.estimate('ranking'), 0.0)
+        costs.observe('ranking', 0.002)
+        self.assertEqual(costs.estimate('ranking'), 0.002)
+
+    def test_deadline_only_traffic_recovers(self):
+        # A slow period left a high estimate; only requests with a deadline follow
+        self.recommender.stage_costs.observe('ranking', 1.0)
+        results = []
+        for _ in range(100):
+            degraded = []
+            outfits = self.recommender.get_recommendations_from_tags(['casual', 'summer'], deadline_ms=100,
+                                                                     degraded=degraded)
+            results.append((len(outfits) > 0, 'scoring' in degraded))
+        self.assertEqual(results[0], (False, True))
+        # Skipped scoring lowers the estimate until requests score and measure it again
+        self.assertEqual(results[-10:], [(True, False)] * 10)
+        self.assertLess(self.recommender.stage_costs.estimate('ranking'), 0.1)
+
+    def test_reduces_depth(self):
+        self.recommender.stage_costs.observe('ranking', 0.0)
+        # 13 item types at 2 ms per candidate leave room for one candidate per type
+        self.recommender.stage_costs.observe('candidate_build', 0.002)
+        degraded = []
+        outfits = self.recommender.get_recommendations_from_tags(['casual', 'summer'], deadline_ms=30,
+                                                                 degraded=degraded)
+        self.assertEqual(degraded, ['depth'])
+        # Bottomwear has three item types, so there are at most three bottoms to draw from
+        self.assertTrue(0 < len(outfits) <= 3)
+
+    def test_skips_question_fallback(self):
+        question = "Something nice to wear please"
+        degraded = []
+        self.recommender.stage_costs.observe('question_fallback', 1.0)
+        self.recommender.question_index()
+        outfits = self.recommender.get_recommendations_from_question(question, deadline_ms=30, degraded=degraded)
+        self.assertEqual((outfits, degraded), ([], ['question_fallback']))
+        self.assertTrue(len(self.recommender.get_recommendations_from_question(question)) > 0)
+
+    def test_falls_back_to_shallower_grid(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            grid_path = os.path.join(tmp_dir, 'test.grid.sqlite')
+            build_grid(self.recommender, [['casual', 'summer']], grid_path, depth=1)
+            recommender = FashionRecommender(self.dataset_path, grid_path=grid_path)
+            recommender.stage_costs = StageCosts(cold_samples=0)
+            recommender.stage_costs.observe('ranking', 1.0)
+
+            degraded = []
+            outfits = recommender.get_recommendations_from_tags(['summer', 'casual'], deadline_ms=30,
+                                                                degraded=degraded)
+            self.assertEqual(degraded, ['depth'])
+            self.assertTrue(0 < len(outfits) <= 3)
+
+            # Uncached tag lists have no cheaper route
+            degraded = []
+            self.assertEqual(recommender.get_recommendations_from_tags(['formal'], deadline_ms=30,
+                                                                       degraded=degraded), [])
+            self.assertEqual(degraded, ['scoring'])
+
+    def test_api_reports_degradation(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        warmup = Warmup(self.dataset_path, 'test_deadline', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+        self.recommender.stage_costs.observe('ranking', 1.0)
+
+        client = ASGIReplayer(app)
+        try:
+            status, body = client.request('POST', '/recommendations/tags', {'tags': ['casual'], 'deadline_ms': 30})
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body), {'outfits': [], 'source': 'Tags: casual', 'degraded': ['scoring']})
+
+            status, body = client.request('POST', '/recommendations/tags', {'tags': ['casual']})
+            self.assertEqual(status, 200)
+            self.assertNotIn('degraded', json.loads(body))
+            self.assertEqual(client.request('POST', '/recommendations/tags',
+                                            {'tags': ['casual'], 'deadline_ms': 0})[0], 422)
+        finally:
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import json
+import os
+import sys
+
+import numpy as np
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FACETS, FashionRecommender
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestFacets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def ranking(self, ranked):
+        return {item_type: list(ids) for item_type, (ids, _) in ranked.items()}
+
+    def test_blocks_partition_the_vocabulary(self):
+        vocabulary = self.recommender.vectorizer.vocabulary_
+        blocks = self.recommender.facet_blocks
+        self.assertEqual(sorted(np.concatenate(list(blocks.values()))), list(range(len(vocabulary))))
+        self.assertIn(vocabulary['casual'], blocks['style'])
+        self.assertNotIn(vocabulary['casual'], blocks['occasion'])
+        self.assertIn(vocabulary['summer'], blocks['season'])
+        self.assertIn(vocabulary['men'], blocks['other'])
+        self.assertEqual(list(blocks), list(FACETS))
+
+    def test_weights_scale_facet_blocks(self):
+        recommender = self.recommender
+        plain = recommender.rank_candidates(recommender.vectorizer.transform(['shirt red']), 7)
+
+        # Scaling every facet alike leaves the cosine ranking unchanged
+        query_vectors, _ = recommender.facet_query_vectors(['shirt', 'red'], {facet: 2.0 for facet in FACETS})
+        self.assertEqual(self.ranking(recommender.rank_candidates(query_vectors, 7)), self.ranking(plain))
+
+        # A zero weight removes the facet from the query
+        query_vectors, _ = recommender.facet_query_vectors(['shirt', 'red'], {'color': 0.0})
+        without_color = recommender.rank_candidates(recommender.vectorizer.transform(['shirt']), 7)
+        self.assertEqual(self.ranking(recommender.rank_candidates(query_vectors, 7)), self.ranking(without_color))
+
+        with self.assertRaises(ValueError):
+            recommender.facet_query_vectors(['shirt'], {'fabric': 2.0})
+
+    def test_item_overrides_only_affect_their_item_type(self):
+        recommender = self.recommender
+        query_vectors, row_of_type = recommender.facet_query_vectors(
+            ['casual', 'summer'], item_overrides={'shirt': {'tags': ['red', 'linen']}})
+        self.assertEqual((query_vectors.shape[0], row_of_type), (2, {'shirt': 1}))
+
+        base = recommender.rank_candidates(recommender.vectorizer.transform(['casual summer']), 7)
+        shirt = recommender.rank_candidates(recommender.vectorizer.transform(['casual summer red linen']), 7)
+        expected = dict(base, shirt=shirt['shirt'])
+        ranked_rows = recommender.rank_candidates_batch(query_vectors, 7)
+        merged = {item_type: ranked_rows[row_of_type.get(item_type, 0)][item_type]
+                  for item_type in recommender.category_mapping}
+        self.assertEqual(self.ranking(merged), self.ranking(expected))
+
+        outfits = recommender.get_recommendations_from_tags(['casual', 'summer'], seed=1,
+                                                            item_overrides={'shirt': {'tags': ['red', 'linen']}})
+        self.assertTrue(len(outfits) > 0)
+
+    def test_preference_overrides(self):
+        preferences = {
+            'item_types': ['Shirt', 'Boots'],
+            'style_vibes': ['Casual'],
+            'item_specific_preferences': {'shirt': {'colors': ['Red']}, 'skirt': {'colors': ['Blue']}}
+        }
+        self.assertEqual(self.recommender.preference_overrides(preferences, {'Boots': {'color': 2.0}}),
+                         {'shirt': {'tags': ['red']}, 'boots': {'tags': [], 'facet_weights': {'color': 2.0}}})
+        self.assertNotIn('red', self.recommender.process_user_preferences(preferences, item_specific=False))
+
+    def test_api_accepts_facet_weights(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        warmup = Warmup(self.dataset_path, 'test_facets', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        preferences = {'item_types': ['shirt'], 'style_vibes': ['casual'], 'favorite_colors': ['red'],
+                       'item_specific_preferences': {'shirt': {'materials': ['linen']}}}
+        client = ASGIReplayer(app)
+        try:
+            status, body = client.request('POST', '/recommendations/preferences',
+                                          {'preferences': preferences, 'facet_weights': {'color': 3.0},
+                                           'item_facet_weights': {'shirt': {'material': 2.0}}})
+            self.assertEqual(status, 200)
+            self.assertTrue(len(json.loads(body)['outfits']) > 0)
+            status, _ = client.request('POST', '/recommendations/preferences',
+                                       {'preferences': preferences, 'facet_weights': {'fabric': 3.0}})
+            self.assertEqual(status, 400)
+        finally:
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
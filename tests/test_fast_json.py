@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_fast_json import encode_item_fragments, recommendation_response
+from fashion_recommender_api import RecommendationResponse
+from fashion_questionnaire_api import RecommendationsResponse
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestFastJson(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path, fast_json=True)
+
+    def outfit_lists(self):
+        for seed, tags in enumerate([['casual', 'summer'], ['formal', 'black', 'jewelry'], ['scarf', 'winter'],
+                                     ['no-such-tag']]):
+            yield self.recommender.get_recommendations_from_tags(tags, seed=seed), f"Tags: {', '.join(tags)}"
+        # Items outside the catalog and characters JSON has to escape
+        odd = {'item': 'Ünïcode "quoted" \\ back\tslash   \x01 👗'}
+        yield [{'topwear': odd, 'bottomwear': odd, 'footwear': odd, 'accessory': odd}], 'Source "ü" \n'
+
+    def test_bytes_match_response_models(self):
+        # Deadline flags cycle through absent, nothing degraded and degraded steps
+        flags = [None, [], ['depth', 'question_fallback']]
+        cases = [(outfits, source, flags[case % len(flags)], 'Y3Vyc29yOjc' if case % 2 else None)
+                 for case, (outfits, source) in enumerate(self.outfit_lists())]
+        item_json = dict(self.recommender.item_json)
+        item_json.update(encode_item_fragments(['Ünïcode "quoted" \\ back\tslash   \x01 👗']))
+
+        app = FastAPI()
+
+        @app.get("/validated/{case}", response_model=RecommendationResponse, response_model_exclude_none=True)
+        def validated(case: int):
+            outfits, source, degraded, cursor = cases[case]
+            return {"outfits": self.recommender.format_outfit_recommendations(outfits), "source": source,
+                    "degraded": degraded, "cursor": cursor}
+
+        @app.get("/validated_questionnaire/{case}", response_model=RecommendationsResponse,
+                 response_model_exclude_none=True)
+        def validated_questionnaire(case: int):
+            outfits, _, degraded, _ = cases[case]
+            return {"outfits": self.recommender.format_outfit_recommendations(outfits), "degraded": degraded}
+
+        @app.get("/fast/{case}")
+        def fast(case: int):
+            outfits, source, degraded, cursor = cases[case]
+            return recommendation_response(outfits, item_json, source, degraded, cursor)
+
+        @app.get("/fast_questionnaire/{case}")
+        def fast_questionnaire(case: int):
+            outfits, _, degraded, _ = cases[case]
+            return recommendation_response(outfits, item_json, degraded=degraded)
+
+        client = ASGIReplayer(app)
+        try:
+            for case in range(len(cases)):
+                for name in ('', '_questionnaire'):
+                    status, expected = client.request('GET', f'/validated{name}/{case}')
+                    self.assertEqual(status, 200)
+                    self.assertEqual(client.request('GET', f'/fast{name}/{case}'), (200, expected))
+        finally:
+            client.close()
+
+    def test_api_endpoint_uses_fast_path(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        warmup = Warmup(self.dataset_path, 'test_fast_json', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        client = ASGIReplayer(app)
+        try:
+            status, body = client.request('POST', '/recommendations/tags', {'tags': ['casual', 'summer']})
+        finally:
+            client.close()
+        self.assertEqual(status, 200)
+        response = RecommendationResponse.model_validate_json(body)
+        self.assertEqual(response.source, "Tags: casual, summer")
+        self.assertTrue(len(response.outfits) > 0)
+
+if __name__ == '__main__':
+    unittest.main()
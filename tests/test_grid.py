@@ -0,0 +1,131 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_questionnaire import preference_tags
+from fashion_grid import RecommendationGrid, build_grid, questionnaire_cells
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_questionnaire_api
+
+class TestRecommendationGrid(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+        cls.tag_lists = [preference_tags(cls.recommender, preferences) for preferences in questionnaire_cells()[::40]]
+
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.grid_path = os.path.join(cls.tmp_dir.name, "catalog.grid.sqlite")
+        build_grid(cls.recommender, cls.tag_lists, cls.grid_path)
+        cls.grid_recommender = FashionRecommender(cls.dataset_path, grid_path=cls.grid_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_grid_matches_live_scoring(self):
+        for tags in self.tag_lists:
+            self.assertIsNotNone(self.grid_recommender.grid.lookup(tags, 7))
+            # Cells are matched regardless of tag order
+            for query in (tags, list(reversed(tags))):
+                self.assertEqual(self.grid_recommender.get_recommendations_from_tags(query, seed=3),
+                                 self.recommender.get_recommendations_from_tags(tags, seed=3))
+
+    def test_misses_fall_back_to_live_scoring(self):
+        tags = ['grunge', 'boots', 'autumn']
+        self.assertIsNone(self.grid_recommender.grid.lookup(tags, 7))
+        self.assertIsNone(self.grid_recommender.grid.lookup(self.tag_lists[0], self.grid_recommender.grid.depth + 1))
+        self.assertEqual(self.grid_recommender.get_recommendations_from_tags(tags, seed=3),
+                         self.recommender.get_recommendations_from_tags(tags, seed=3))
+
+    def test_rejects_grid_of_other_catalog(self):
+        with self.assertRaises(ValueError):
+            FashionRecommender(self.dataset_path, rows=list(range(100)), grid_path=self.grid_path)
+
+    def test_rejects_grid_of_edited_catalog(self):
+        # Existing terms added to some rows keep the vocabulary and the row count
+        df = pd.read_csv(self.dataset_path)
+        shirts = df.index[df['Tags'].str.contains('shirt')][:200]
+        df.loc[shirts, 'Tags'] = df.loc[shirts, 'Tags'] + ',casual,summer'
+        edited_path = os.path.join(self.tmp_dir.name, "edited.csv")
+        df.to_csv(edited_path, index=False)
+        with self.assertRaises(ValueError):
+            FashionRecommender(edited_path, grid_path=self.grid_path)
+
+    def test_seen_rows_are_dropped_from_stored_rankings(self):
+        tags = self.tag_lists[0]
+        stored = self.grid_recommender.grid.lookup(tags, self.grid_recommender.grid.depth)
+        exclude = np.zeros(len(self.recommender.df), dtype=bool)
+        for ids, _ in stored.values():
+            exclude[ids[:5]] = True
+        self.assertIsNotNone(self.grid_recommender.grid.lookup(tags, 7, exclude))
+        self.assertEqual(self.grid_recommender.candidates_from_tags(tags, 7, exclude=exclude),
+                         self.recommender.candidates_from_tags(tags, 7, exclude=exclude))
+
+        # Too few unseen rows left in a full list: scored live
+        for ids, _ in stored.values():
+            exclude[ids[:-3]] = True
+        self.assertIsNone(self.grid_recommender.grid.lookup(tags, 7, exclude))
+        partial = self.grid_recommender.grid.lookup(tags, 7, exclude, partial=True)
+        self.assertTrue(all(len(ids) <= 3 for ids, _ in partial.values()))
+        self.assertEqual(self.grid_recommender.candidates_from_tags(tags, 7, exclude=exclude),
+                         self.recommender.candidates_from_tags(tags, 7, exclude=exclude))
+
+    def test_repeated_session_requests_stay_on_the_grid(self):
+        app = FastAPI()
+        app.include_router(fashion_questionnaire_api.router)
+        recommender = FashionRecommender(self.dataset_path)
+        warmup = Warmup(self.dataset_path, 'test_grid', build=lambda path: recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        def garments(body):
+            return {item for outfit in json.loads(body)['outfits'] for item in outfit['components'].values()}
+
+        client = ASGIReplayer(app)
+        try:
+            client.request('POST', '/reset')
+            client.request('POST', '/answers/style_vibes', {'selection': ['Casual']})
+            preferences = fashion_questionnaire_api.sessions['default'].dict()
+            tags = preference_tags(recommender, preferences, item_specific=False)
+            grid_path = os.path.join(self.tmp_dir.name, "session.grid.sqlite")
+            build_grid(recommender, [tags], grid_path)
+            recommender.grid = RecommendationGrid(grid_path)
+
+            lookup = recommender.grid.lookup
+            served = []
+
+            def record(*args, **kwargs):
+                served.append(lookup(*args, **kwargs))
+                return served[-1]
+
+            with mock.patch.object(recommender.grid, 'lookup', side_effect=record) as spy:
+                status, first = client.request('GET', '/recommendations')
+                self.assertEqual(status, 200)
+                status, second = client.request('GET', '/recommendations')
+                self.assertEqual(status, 200)
+            # The second request excludes what the first showed and is still served from the grid
+            self.assertEqual(len(served), 2)
+            self.assertTrue(spy.call_args_list[1].args[2].any())
+            self.assertTrue(all(ranked is not None for ranked in served))
+            self.assertTrue(garments(first) and garments(second))
+            self.assertFalse(garments(first) & garments(second))
+        finally:
+            client.request('POST', '/reset')
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_metrics import MetricsRegistry, STAGE_SECONDS, stage, start_trace, end_trace
+from fashion_benchmark import ASGIReplayer
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_exposition(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1.0))
+        counter = registry.counter('hits_total', 'Hits', ['cache'])
+        histogram.observe(0.05, route='/a')
+        histogram.observe(0.5, route='/a')
+        counter.inc(cache='question_index')
+
+        text = registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{route="/a"} 2', text)
+        self.assertIn('hits_total{cache="question_index"} 1', text)
+
+    def test_trace_collects_stage_times(self):
+        trace, token = start_trace()
+        with stage('unit_test'):
+            pass
+        end_trace(token)
+        self.assertIn('unit_test', trace['stages'])
+        self.assertGreaterEqual(STAGE_SECONDS.count(stage='unit_test'), 1)
+
+    def test_metrics_endpoint(self):
+        import fashion_recommender_api
+
+        fashion_recommender_api.app.state.warmup.wait()
+        client = ASGIReplayer(fashion_recommender_api.app)
+        try:
+            status, _ = client.request('POST', '/recommendations/question', {'text': 'casual summer party'})
+            self.assertEqual(status, 200)
+            status, body = client.request('GET', '/metrics')
+        finally:
+            client.close()
+
+        self.assertEqual(status, 200)
+        text = body.decode('utf-8')
+        for stage_name in ('tag_extraction', 'vectorize', 'similarity', 'category_filter',
+                           'outfit_assembly', 'formatting', 'framework'):
+            self.assertIn(f'fashion_stage_duration_seconds_count{{stage="{stage_name}"}}', text)
+        self.assertIn('fashion_recommendation_path_total{path="question_tags"}', text)
+        self.assertIn('route="/recommendations/question"', text)
+
+if __name__ == '__main__':
+    unittest.main()
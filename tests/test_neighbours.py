@@ -0,0 +1,159 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from sklearn.metrics.pairwise import cosine_similarity
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender, top_k
+from fashion_neighbours import NeighbourTable
+import fashion_neighbours
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestNeighbours(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+        cls.table = NeighbourTable.build(cls.recommender, k=10)
+
+    def test_neighbours_match_brute_force(self):
+        recommender = self.recommender
+        answers = recommender.df['AnswerText'].to_numpy()
+        for row in (0, 17, 1234, len(answers) - 1):
+            similarities = cosine_similarity(recommender.tag_matrix[row], recommender.tag_matrix)[0]
+            # Rows of the same item are not neighbours
+            candidates = np.flatnonzero((similarities > 0) & (answers != answers[row]))
+            expected_ids, expected_scores = top_k(similarities[candidates], 10, candidates)
+            ids, scores = self.table.similar(row)
+            self.assertEqual(list(ids), list(expected_ids))
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+        self.assertEqual(len(self.table.similar(0, 3)[0]), 3)
+        with self.assertRaises(IndexError):
+            self.table.similar(len(answers))
+
+    def test_small_blocks_give_the_same_table(self):
+        entries = fashion_neighbours.NEIGHBOUR_BLOCK_ENTRIES
+        fashion_neighbours.NEIGHBOUR_BLOCK_ENTRIES = 1000
+        try:
+            ids, scores = fashion_neighbours.rank_neighbours(self.recommender, np.arange(300), 10)
+        finally:
+            fashion_neighbours.NEIGHBOUR_BLOCK_ENTRIES = entries
+        np.testing.assert_array_equal(ids, self.table.ids[:300])
+        np.testing.assert_array_equal(scores, self.table.scores[:300])
+
+    def test_save_load_and_validate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'neighbours.npz')
+            self.table.save(path)
+            recommender = FashionRecommender(self.dataset_path, neighbours_path=path)
+            np.testing.assert_array_equal(recommender.neighbours.ids, self.table.ids)
+            self.assertIn('neighbours', recommender.memory_report())
+
+            # A table of another catalog is rejected
+            with self.assertRaises(ValueError):
+                FashionRecommender(self.dataset_path, rows=np.arange(1000), neighbours_path=path)
+
+    def test_update_matches_a_full_build(self):
+        df = pd.read_csv(self.dataset_path)
+        base_df = df.iloc[:3000]
+        changed_df = base_df.drop(index=[5, 120, 2500]).copy()
+        changed_df.loc[[40, 41], 'Tags'] = changed_df.loc[[40, 41], 'Tags'] + ',silk'
+        changed_df.loc[700, 'AnswerText'] = 'boho red silk scarf'
+        changed_df = pd.concat([changed_df, df.iloc[3000:3200]])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            base_path = os.path.join(tmp, 'base.csv')
+            changed_path = os.path.join(tmp, 'changed.csv')
+            base_df.to_csv(base_path, index=False)
+            changed_df.to_csv(changed_path, index=False)
+            base = FashionRecommender(base_path)
+            # Indexing with the same vectorizer keeps the unchanged scores exact
+            changed = FashionRecommender(changed_path, vectorizer=base.vectorizer)
+            refitted = FashionRecommender(changed_path)
+
+        table = NeighbourTable.build(base, k=10)
+        updated, counts = table.update(changed)
+        rebuilt = NeighbourTable.build(changed, k=10)
+        np.testing.assert_array_equal(updated.ids, rebuilt.ids)
+        np.testing.assert_allclose(updated.scores, rebuilt.scores, rtol=1e-5)
+        self.assertEqual(updated.meta, rebuilt.meta)
+        self.assertEqual(counts['changed'], 203)
+        self.assertGreater(counts['merged'], counts['ranked'])
+
+        # Refitting shifts the IDF weights; kept neighbours are rescored under them
+        updated, counts = table.update(refitted)
+        updated.validate(refitted)
+        self.assertGreater(counts['merged'], 0)
+        self.assertLess(counts['ranked'], len(refitted.df))
+        rows, columns = np.nonzero(updated.ids >= 0)
+        expected = refitted.tag_matrix[rows].multiply(refitted.tag_matrix[updated.ids[rows, columns]]).sum(axis=1)
+        np.testing.assert_allclose(updated.scores[rows, columns], np.asarray(expected).ravel(), rtol=1e-5)
+        rebuilt = NeighbourTable.build(refitted, k=10)
+        self.assertGreater(np.mean(updated.ids == rebuilt.ids), 0.9)
+
+    def test_build_command_updates_incrementally(self):
+        df = pd.read_csv(self.dataset_path).iloc[:3000]
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset_path = os.path.join(tmp, 'catalog.csv')
+            df.to_csv(dataset_path, index=False)
+            argv = ['fashion_neighbours.py', 'build', '--dataset', dataset_path, '--k', '10']
+            with mock.patch.object(sys, 'argv', argv), contextlib.redirect_stdout(io.StringIO()):
+                fashion_neighbours.main()
+
+            # Each run refits the vectorizer on the edited catalog
+            df.loc[7, 'Tags'] = df.loc[7, 'Tags'] + ',silk'
+            df.drop(index=[11]).to_csv(dataset_path, index=False)
+            output = io.StringIO()
+            with mock.patch.object(sys, 'argv', argv), contextlib.redirect_stdout(output):
+                fashion_neighbours.main()
+            recommender = FashionRecommender(dataset_path)
+            table = NeighbourTable.load(fashion_neighbours.default_neighbours_path(dataset_path))
+
+        counts = re.search(r'Updated (\d+) items \((\d+) changed, (\d+) ranked, (\d+) merged\)',
+                           output.getvalue())
+        self.assertIsNotNone(counts, output.getvalue())
+        self.assertEqual(int(counts.group(1)), 2999)
+        self.assertLess(int(counts.group(3)), 2999)
+        self.assertGreater(int(counts.group(4)), 0)
+        table.validate(recommender)
+
+    def test_similar_items_endpoint(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        recommender = FashionRecommender(self.dataset_path)
+        warmup = Warmup(self.dataset_path, 'test_neighbours', build=lambda path: recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        client = ASGIReplayer(app)
+        try:
+            status, _ = client.request('GET', '/items/0/similar')
+            self.assertEqual(status, 404)
+
+            recommender.neighbours = self.table
+            status, body = client.request('GET', '/items/0/similar?count=4')
+            self.assertEqual(status, 200)
+            response = json.loads(body)
+            self.assertEqual(response['item'], recommender.df['AnswerText'].iat[0])
+            self.assertEqual([item['id'] for item in response['similar']], list(self.table.similar(0, 4)[0]))
+            self.assertEqual(client.request('GET', f'/items/{len(recommender.df)}/similar')[0], 404)
+        finally:
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
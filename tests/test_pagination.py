@@ -0,0 +1,115 @@
+import unittest
+import json
+import os
+import sys
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_pagination import CandidateSnapshots, CursorExpired
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestPagination(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def test_pages_cover_snapshot_without_duplicates(self):
+        store = CandidateSnapshots(depth=20)
+        recommendations = self.recommender.candidates_from_tags(['casual', 'summer', 'scarf'], store.depth)
+        outfits, cursor = store.create(recommendations, 'casual summer scarf', 4, seed=0)
+        pages = [outfits]
+        while cursor is not None:
+            outfits, cursor, _ = store.page(cursor, 4)
+            pages.append(outfits)
+
+        outfits = [outfit for page in pages for outfit in page]
+        # Every distinct item of the scarcest mandatory category is used once
+        self.assertEqual(len(outfits), min(len({item['item'] for item in recommendations[category]})
+                                           for category in ('topwear', 'bottomwear', 'footwear')))
+        self.assertGreater(len(pages), 2)
+        self.assertTrue(all(len(page) == 4 for page in pages[:-1]))
+        for category in ('topwear', 'bottomwear', 'footwear', 'accessory'):
+            items = [outfit[category]['item'] for outfit in outfits if category in outfit]
+            self.assertEqual(len(items), len(set(items)))
+        self.assertIn('accessory', outfits[0])
+
+        # Pages follow the ranking: page k shuffles the k-th window of distinct candidates
+        for category in ('topwear', 'bottomwear', 'footwear'):
+            ranked = list(dict.fromkeys(item['item'] for item in recommendations[category]))
+            for k, page in enumerate(pages[:-1]):
+                self.assertEqual({outfit[category]['item'] for outfit in page}, set(ranked[4 * k:4 * k + 4]))
+            self.assertLessEqual({outfit[category]['item'] for outfit in pages[-1]},
+                                 set(ranked[4 * (len(pages) - 1):4 * len(pages)]))
+
+    def test_cursor_expiry(self):
+        recommendations = self.recommender.candidates_from_tags(['casual'], 20)
+        store = CandidateSnapshots(ttl=0.0)
+        _, cursor = store.create(recommendations, 'casual', 2)
+        with self.assertRaises(CursorExpired):
+            store.page(cursor, 2)
+        with self.assertRaises(CursorExpired):
+            store.page('not-a-cursor', 2)
+
+        # The least recently read snapshots are dropped over the limit
+        store = CandidateSnapshots(max_snapshots=2)
+        cursors = [store.create(recommendations, 'casual', 2)[1] for _ in range(3)]
+        self.assertEqual(len(store), 2)
+        with self.assertRaises(CursorExpired):
+            store.page(cursors[0], 2)
+        self.assertEqual(len(store.page(cursors[2], 2)[0]), 2)
+
+    def test_api_pages_without_rescoring(self):
+        app = FastAPI()
+        app.include_router(fashion_recommender_api.router)
+        warmup = Warmup(self.dataset_path, 'test_pagination', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        calls = []
+        candidates_from_tags = self.recommender.candidates_from_tags
+        self.recommender.candidates_from_tags = lambda *args, **kwargs: calls.append(args) or \
+            candidates_from_tags(*args, **kwargs)
+        client = ASGIReplayer(app)
+        try:
+            status, body = client.request('POST', '/recommendations/tags',
+                                          {'tags': ['casual', 'summer'], 'count': 5, 'paginate': True})
+            self.assertEqual(status, 200)
+            response = json.loads(body)
+            self.assertEqual(len(response['outfits']), 5)
+            items = {outfit['components']['topwear'] for outfit in response['outfits']}
+            for _ in range(2):
+                status, body = client.request('POST', '/recommendations/next',
+                                              {'cursor': response['cursor'], 'count': 5})
+                self.assertEqual(status, 200)
+                response = json.loads(body)
+                self.assertEqual(response['source'], 'Tags: casual, summer')
+                page_items = {outfit['components']['topwear'] for outfit in response['outfits']}
+                self.assertFalse(items & page_items)
+                items |= page_items
+            self.assertEqual(len(calls), 1)
+
+            status, _ = client.request('POST', '/recommendations/next', {'cursor': 'bm8tc3VjaDox'})
+            self.assertEqual(status, 410)
+            # Pages hold at most 7 outfits, like an unpaginated response
+            status, _ = client.request('POST', '/recommendations/next', {'cursor': response['cursor'], 'count': 8})
+            self.assertEqual(status, 422)
+            status, body = client.request('POST', '/recommendations/tags',
+                                          {'tags': ['casual'], 'count': 20, 'paginate': True})
+            self.assertEqual(len(json.loads(body)['outfits']), 7)
+            # Without paginate there is no cursor
+            status, body = client.request('POST', '/recommendations/tags', {'tags': ['casual']})
+            self.assertNotIn('cursor', json.loads(body))
+        finally:
+            client.close()
+            del self.recommender.candidates_from_tags
+
+if __name__ == '__main__':
+    unittest.main()
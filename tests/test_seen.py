@@ -0,0 +1,115 @@
+import unittest
+import json
+import os
+import sys
+
+import numpy as np
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_ann_index import IVFIndex
+from fashion_seen import SeenItems, SeenStore
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_questionnaire_api
+
+class TestSeenItems(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def test_bitmask(self):
+        n_items = len(self.recommender.df)
+        seen = SeenItems(self.recommender, max_bytes=65536)
+        seen.add([0, 9, n_items - 1])
+        self.assertEqual(list(np.flatnonzero(seen.mask())), [0, 9, n_items - 1])
+        self.assertEqual((seen.count(), seen.bits.nbytes, seen.folded), (3, (n_items + 7) // 8, False))
+
+        # A capped bitmask folds the catalog onto its bits and never forgets a seen row
+        folded = SeenItems(self.recommender, max_bytes=64)
+        folded.add([3, 1000])
+        mask = folded.mask()
+        self.assertEqual((folded.bits.nbytes, folded.folded, len(mask)), (64, True, n_items))
+        self.assertEqual(list(np.flatnonzero(mask)), sorted(row for row in range(n_items) if row % 512 in (3, 1000 % 512)))
+
+    def test_store_marks_every_row_of_an_item(self):
+        store = SeenStore()
+        answers = self.recommender.df['AnswerText'].to_numpy()
+        row = int(np.flatnonzero(answers == answers[0])[-1])
+        store.add('session', self.recommender, [row])
+        exclude, version = store.snapshot('session', self.recommender)
+        self.assertEqual(list(np.flatnonzero(exclude)), list(np.flatnonzero(answers == answers[0])))
+        self.assertEqual(version, 1)
+
+        # Another catalog starts from scratch
+        self.assertEqual(store.snapshot('session', FashionRecommender(self.dataset_path, rows=np.arange(100))),
+                         (None, 0))
+        store.reset('session')
+        self.assertEqual(store.snapshot('session', self.recommender), (None, 0))
+
+    def test_excluded_rows_are_masked_before_top_k(self):
+        recommender = self.recommender
+        query_vector = recommender.vectorizer.transform(['casual summer shirt'])
+        deep = recommender.rank_candidates(query_vector, 20)
+        exclude = np.zeros(len(recommender.df), dtype=bool)
+        exclude[deep['shirt'][0][:5]] = True
+
+        ranked = recommender.rank_candidates(query_vector, 7, exclude=exclude)
+        expected = [row for row in deep['shirt'][0] if not exclude[row]][:7]
+        self.assertEqual(list(ranked['shirt'][0]), expected)
+
+        # The ANN index applies the mask to its probed clusters
+        recommender.ann_index = IVFIndex.build(recommender)
+        try:
+            ranked = recommender.rank_candidates(query_vector, 7, exclude=exclude)
+            self.assertFalse(exclude[ranked['shirt'][0][ranked['shirt'][1] > 0]].any())
+        finally:
+            recommender.ann_index = None
+
+        candidates = recommender.candidates_from_tags(['casual', 'summer', 'shirt'], 7, exclude=exclude)
+        self.assertFalse(any(exclude[item['row']] for items in candidates.values() for item in items))
+
+    def test_repeated_recommendations_show_new_garments(self):
+        app = FastAPI()
+        app.include_router(fashion_questionnaire_api.router)
+        warmup = Warmup(self.dataset_path, 'test_seen', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        def garments(body):
+            return {item for outfit in json.loads(body)['outfits'] for item in outfit['components'].values()}
+
+        client = ASGIReplayer(app)
+        try:
+            client.request('POST', '/reset')
+            client.request('POST', '/answers/style_vibes', {'selection': ['Casual']})
+            status, first = client.request('GET', '/recommendations')
+            self.assertEqual(status, 200)
+            status, second = client.request('GET', '/recommendations')
+            self.assertEqual(status, 200)
+            self.assertTrue(garments(first) and garments(second))
+            self.assertFalse(garments(first) & garments(second))
+
+            # Every component carries the id the item routes take
+            answers = self.recommender.df['AnswerText']
+            outfit = json.loads(second)['outfits'][0]
+            self.assertEqual({category: answers.iat[row] for category, row in outfit['item_ids'].items()},
+                             outfit['components'])
+
+            status, body = client.request('POST', f"/items/{outfit['item_ids']['topwear']}/dismiss")
+            self.assertEqual(status, 200)
+            self.assertGreater(json.loads(body)['seen_items']['seen'], 0)
+            self.assertEqual(client.request('POST', f'/items/{len(self.recommender.df)}/dismiss')[0], 404)
+
+            client.request('POST', '/reset')
+            self.assertEqual(fashion_questionnaire_api.seen.stats('default')['seen'], 0)
+        finally:
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender, run_batch
+from fashion_shards import ShardedRecommender, load_manifest
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_recommender_api
+
+class TestShardedRecommender(unittest.TestCase):
+    def setUp(self):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        self.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_sharded_candidates_match_single_process(self):
+        recommender = FashionRecommender(self.dataset_path)
+        manifest_path = os.path.join(self.tmp_dir.name, "catalog.shards-3.pkl")
+
+        with ShardedRecommender(self.dataset_path, n_shards=3, manifest_path=manifest_path) as sharded:
+            self.assertEqual(sum(sharded.shard_sizes), len(recommender.df))
+            for tags in (['casual', 'summer', 'party'], ['formal', 'wool', 'winter'], ['jewelry', 'gold']):
+                query_vector = recommender.vectorizer.transform([' '.join(tags)])
+                expected = recommender.collect_candidates(query_vector, 7)
+                candidates = sharded.collect_candidates(query_vector, 7)
+
+                # Shards sum the sparse products in a different order, so
+                # scores may differ in the last bits
+                for category, items in expected.items():
+                    self.assertEqual([c['item'] for c in candidates[category]], [c['item'] for c in items])
+                    for candidate, item in zip(candidates[category], items):
+                        self.assertAlmostEqual(candidate['similarity'], item['similarity'], places=9)
+
+            outfits = sharded.get_recommendations_from_tags(['casual', 'summer', 'party'])
+            self.assertTrue(len(outfits) > 0)
+
+    def test_unsupported_paths_raise_explicit_errors(self):
+        manifest_path = os.path.join(self.tmp_dir.name, "catalog.shards-2.pkl")
+
+        with ShardedRecommender(self.dataset_path, n_shards=2, manifest_path=manifest_path) as sharded:
+            # Questions with known tags and facet weights are scored in the shards
+            self.assertTrue(len(sharded.get_recommendations_from_question("casual summer party outfit")) > 0)
+            outfits = sharded.get_recommendations_from_tags(['casual', 'summer'], facet_weights={'color': 2.0})
+            self.assertTrue(len(outfits) > 0)
+
+            with self.assertRaises(ValueError):
+                sharded.get_recommendations_from_question("What should I wear?")
+            with self.assertRaises(ValueError):
+                sharded.get_recommendations_from_tags(['casual'], item_overrides={'shirt': {'tags': ['red']}})
+
+            # Batch requests with item-specific preferences fail with that error
+            preferences = {'item_types': ['Scarf'], 'item_specific_preferences': {'Scarf': {'colors': ['Red']}}}
+            results = list(run_batch(sharded, [json.dumps({'id': 'scarf', 'preferences': preferences})]))
+            self.assertIn('not supported by a sharded recommender', results[0]['error'])
+
+            # The API reports them as bad requests
+            app = FastAPI()
+            app.include_router(fashion_recommender_api.router)
+            warmup = Warmup(self.dataset_path, 'test_shards', build=lambda path: sharded)
+            install_health(app, warmup)
+            warmup.preload()
+            client = ASGIReplayer(app)
+            try:
+                status, _ = client.request('POST', '/recommendations/question', {'text': 'What should I wear?'})
+                self.assertEqual(status, 400)
+            finally:
+                client.close()
+
+    def test_manifest_follows_catalog_edits(self):
+        dataset_path = os.path.join(self.tmp_dir.name, "catalog.csv")
+        with open(self.dataset_path) as f:
+            text = f.read()
+        with open(dataset_path, 'w') as f:
+            f.write(text)
+        manifest = load_manifest(dataset_path, 2)
+        self.assertIn('red', manifest['vectorizer'].vocabulary_)
+
+        # Retagging keeps the file size but changes the vocabulary
+        with open(dataset_path, 'w') as f:
+            f.write(text.replace(',red', ',tan'))
+        self.assertEqual(os.path.getsize(dataset_path), len(text.encode('utf-8')))
+        manifest = load_manifest(dataset_path, 2)
+        self.assertNotIn('red', manifest['vectorizer'].vocabulary_)
+        self.assertIn('tan', manifest['vectorizer'].vocabulary_)
+
+if __name__ == '__main__':
+    unittest.main()
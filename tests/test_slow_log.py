@@ -0,0 +1,96 @@
+import unittest
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_metrics import install_metrics
+import fashion_metrics
+from fashion_slow_log import SlowQueryLog, normalize_input, read_log, replay_record
+from fashion_benchmark import ASGIReplayer
+
+class QuestionRequest(BaseModel):
+    text: str
+
+class TestSlowQueryLog(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.recommender = FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'slow.jsonl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_app(self, threshold_ms):
+        slow_log = SlowQueryLog(self.log_path, threshold_ms=threshold_ms)
+        self.addCleanup(slow_log.close)
+        app = FastAPI()
+        install_metrics(app, 'test_api', slow_log=slow_log)
+
+        @app.post("/question")
+        def question(request: QuestionRequest):
+            outfits = self.recommender.get_recommendations_from_question(request.text)
+            return self.recommender.format_outfit_recommendations(outfits)
+
+        return ASGIReplayer(app)
+
+    def test_normalize_input(self):
+        self.assertEqual(normalize_input({'text': '  casual\n summer ', 'count': 7}),
+                         {'count': 7, 'text': 'casual summer'})
+
+    def test_slow_request_is_logged_and_replayable(self):
+        client = self.make_app(threshold_ms=0)
+        try:
+            status, _ = client.request('POST', '/question', {'text': 'Something  for tonight'})
+            self.assertEqual(status, 200)
+
+            records = read_log(self.log_path)
+            self.assertEqual(len(records), 1)
+            record = records[0]
+            self.assertEqual(record['input'], {'text': 'Something for tonight'})
+            self.assertEqual(record['paths'], ['question_fallback', 'tags'])
+            self.assertEqual(set(record['candidates']), {'topwear', 'bottomwear', 'footwear', 'accessory'})
+            self.assertTrue(record['tags'])
+            for stage_name in ('tag_extraction', 'question_fallback', 'similarity', 'framework'):
+                self.assertIn(stage_name, record['stages_ms'])
+
+            status, _ = replay_record(client, record)
+            self.assertEqual(status, 200)
+        finally:
+            client.close()
+
+    def test_slow_log_works_with_metrics_disabled(self):
+        client = self.make_app(threshold_ms=0)
+        enabled = fashion_metrics.ENABLED
+        fashion_metrics.ENABLED = False
+        try:
+            status, _ = client.request('POST', '/question', {'text': 'casual summer party'})
+            self.assertEqual(status, 200)
+        finally:
+            fashion_metrics.ENABLED = enabled
+            client.close()
+
+        records = read_log(self.log_path)
+        self.assertEqual(len(records), 1)
+        self.assertIn('similarity', records[0]['stages_ms'])
+
+    def test_fast_request_is_not_logged(self):
+        client = self.make_app(threshold_ms=60000)
+        try:
+            client.request('POST', '/question', {'text': 'casual summer party'})
+        finally:
+            client.close()
+        self.assertEqual(read_log(self.log_path), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import json
+import os
+import sys
+
+from fastapi import FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_questionnaire import preference_tags
+from fashion_speculation import Speculator
+from fashion_startup import Warmup, install_health
+from fashion_benchmark import ASGIReplayer
+import fashion_questionnaire_api
+
+class TestSpeculation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Locate dataset relative to this test file
+        test_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.dataset_path = os.path.join(test_dir, '..', "fashion_dataset_updated.csv")
+        cls.recommender = FashionRecommender(cls.dataset_path)
+
+    def speculator(self, **kwargs):
+        return Speculator(get_recommender=lambda: self.recommender, **kwargs)
+
+    def test_hypotheses_follow_the_question_order(self):
+        speculator = self.speculator(fanout=2)
+        preferences = {'specific_occasion': 'Casual', 'gender': None, 'item_types': []}
+        hypotheses = speculator.hypotheses(preferences, 'specific_occasion')
+        self.assertEqual(hypotheses[0], preferences)
+        self.assertEqual([hypothesis['gender'] for hypothesis in hypotheses[1:]], ['Men', 'Women'])
+
+        # The options answered most often come first
+        speculator.answered('other', {}, 'gender', ['Women'])
+        speculator.wait()
+        self.assertEqual(speculator.hypotheses(preferences, 'specific_occasion')[1]['gender'], 'Women')
+
+        # List questions are guessed with a single selection
+        hypotheses = speculator.hypotheses(dict(preferences, gender='Men'), 'gender')
+        self.assertEqual(hypotheses[1]['item_types'], ['Blazer'])
+
+    def test_answers_are_ranked_ahead_of_time(self):
+        speculator = self.speculator(cpu_budget_ms=60000, fanout=10)
+        preferences = {'specific_occasion': 'Casual', 'style_vibes': ['Casual']}
+        speculator.answered('session', preferences, 'style_vibes', ['Casual'])
+        speculator.wait()
+
+        # The next question is favorite_colors; every color was ranked
+        answered = dict(preferences, favorite_colors=['Red'])
+        tags = preference_tags(self.recommender, answered, item_specific=False)
+        candidates = speculator.lookup('session', self.recommender, tags)
+        expected = self.recommender.candidates_from_tags(tags, 7)
+        self.assertEqual({category: [item['item'] for item in items] for category, items in candidates.items()},
+                         {category: [item['item'] for item in items] for category, items in expected.items()})
+
+        # Lookups hand out copies, so assembling outfits leaves the ranking intact
+        self.recommender.assemble_outfits(candidates, ' '.join(tags), 7)
+        self.assertEqual(len(speculator.lookup('session', self.recommender, tags)['topwear']),
+                         len(expected['topwear']))
+
+        # Other recommenders, sessions and tags miss
+        self.assertIsNone(speculator.lookup('session', object(), tags))
+        self.assertIsNone(speculator.lookup('unknown', self.recommender, tags))
+        self.assertIsNone(speculator.lookup('session', self.recommender, ['tuxedo']))
+        stats = speculator.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['computed']), (2, 3, 11))
+        self.assertEqual(stats['hit_rate'], 0.4)
+
+        speculator.reset('session')
+        self.assertIsNone(speculator.lookup('session', self.recommender, tags))
+
+    def test_cpu_budget_stops_speculation(self):
+        speculator = self.speculator(cpu_budget_ms=0.001, fanout=5)
+        speculator.answered('session', {'specific_occasion': 'Casual'}, 'specific_occasion', ['Casual'])
+        speculator.wait()
+        # The first ranking uses up the budget
+        self.assertEqual(speculator.stats()['computed'], 1)
+        self.assertGreater(speculator.stats()['cpu_seconds'], 0)
+
+    def test_questionnaire_api_serves_speculated_rankings(self):
+        app = FastAPI()
+        app.include_router(fashion_questionnaire_api.router)
+        warmup = Warmup(self.dataset_path, 'test_speculation', build=lambda path: self.recommender)
+        install_health(app, warmup)
+        warmup.preload()
+
+        speculator = fashion_questionnaire_api.speculator
+        fashion_questionnaire_api.speculator = self.speculator()
+        client = ASGIReplayer(app)
+        try:
+            client.request('POST', '/reset')
+            for question_id, selection in (('specific_occasion', ['Casual']), ('style_vibes', ['Boho'])):
+                status, _ = client.request('POST', f'/answers/{question_id}', {'selection': selection})
+                self.assertEqual(status, 200)
+            fashion_questionnaire_api.speculator.wait()
+
+            status, body = client.request('GET', '/recommendations')
+            self.assertEqual(status, 200)
+            self.assertTrue(len(json.loads(body)['outfits']) > 0)
+            status, body = client.request('GET', '/speculation')
+            stats = json.loads(body)
+            self.assertTrue(stats['enabled'])
+            self.assertEqual((stats['hits'], stats['misses']), (1, 0))
+        finally:
+            client.close()
+            fashion_questionnaire_api.speculator = speculator
+            client = ASGIReplayer(app)
+            client.request('POST', '/reset')
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+import subprocess
+import sys
+import threading
+
+from fastapi import Depends, FastAPI
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_startup import Warmup, get_recommender, install_health
+from fashion_benchmark import ASGIReplayer
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class TestStartup(unittest.TestCase):
+    def test_api_import_defers_heavy_modules(self):
+        code = ("import sys, fashion_recommender_api, fashion_questionnaire_api; "
+                "print(sorted(m for m in ('pandas', 'sklearn') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_not_ready_until_warmup_finishes(self):
+        release = threading.Event()
+        dataset_path = os.path.join(PACKAGE_DIR, "fashion_dataset_updated.csv")
+
+        def build(path):
+            release.wait()
+            return FashionRecommender(path)
+
+        app = FastAPI()
+        warmup = Warmup(dataset_path, 'test_api', warmup_queries=3, build=build)
+        install_health(app, warmup)
+
+        @app.post("/tags")
+        def tags(recommender=Depends(get_recommender)):
+            return recommender.format_outfit_recommendations(recommender.get_recommendations_from_tags(['casual']))
+
+        client = ASGIReplayer(app)
+        try:
+            self.assertEqual(client.request('GET', '/healthz')[0], 200)
+            self.assertEqual(client.request('GET', '/readyz')[0], 503)
+            self.assertEqual(client.request('POST', '/tags')[0], 503)
+
+            release.set()
+            warmup.wait(timeout=60)
+            self.assertEqual(client.request('GET', '/readyz')[0], 200)
+            self.assertEqual(client.request('POST', '/tags')[0], 200)
+        finally:
+            client.close()
+
+        self.assertEqual(warmup.status()['status'], 'ready')
+        self.assertGreaterEqual(warmup.timings['ready_s'], warmup.timings['build_s'])
+
+if __name__ == '__main__':
+    unittest.main()
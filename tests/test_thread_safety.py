@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path so we can import the module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fashion_recommender import FashionRecommender
+from fashion_ann_index import sample_queries
+
+def load_recommender():
+    # Locate dataset relative to this test file
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    return FashionRecommender(os.path.join(test_dir, '..', "fashion_dataset_updated.csv"))
+
+class TestThreadSafety(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.recommender = load_recommender()
+        cls.queries = sample_queries(cls.recommender, 200)
+
+    def test_shared_index_is_read_only(self):
+        with self.assertRaises(ValueError):
+            self.recommender.tag_matrix.data[0] = 0.0
+        with self.assertRaises(ValueError):
+            self.recommender.category_indices['shirt'][0] = 0
+
+    def test_seeded_draws_are_reproducible(self):
+        first = self.recommender.get_recommendations_from_tags(['casual', 'summer'], seed=3)
+        second = self.recommender.get_recommendations_from_tags(['casual', 'summer'], seed=3)
+        self.assertEqual(first, second)
+
+    def test_threaded_batch_matches_serial(self):
+        serial = self.recommender.get_recommendations_batch(self.queries, seed=11, chunk_size=16)
+        threaded = self.recommender.get_recommendations_batch(self.queries, seed=11, chunk_size=16, n_threads=8)
+        self.assertEqual(threaded, serial)
+
+    def test_concurrent_requests_match_serial(self):
+        questions = ["What should I wear for a casual summer party?", "Something for tonight"] * 10
+        expected_tags = [self.recommender.get_recommendations_from_tags(tags, seed=i)
+                         for i, tags in enumerate(self.queries)]
+        expected_questions = [self.recommender.get_recommendations_from_question(q, seed=i)
+                              for i, q in enumerate(questions)]
+
+        # Hammer the shared recommender from many threads at once
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            tag_futures = [executor.submit(self.recommender.get_recommendations_from_tags, tags, 7, i)
+                           for i, tags in enumerate(self.queries)]
+            question_futures = [executor.submit(self.recommender.get_recommendations_from_question, q, 7, i)
+                                for i, q in enumerate(questions)]
+            self.assertEqual([f.result() for f in tag_futures], expected_tags)
+            self.assertEqual([f.result() for f in question_futures], expected_questions)
+
+def report_thread_scaling(thread_counts=(1, 2, 4, 8), n_queries=2000):
+    """Print batch throughput for several thread counts."""
+    recommender = load_recommender()
+    queries = sample_queries(recommender, n_queries)
+    print(f"Batch throughput over {n_queries} queries ({os.cpu_count()} CPUs, "
+          f"GIL {'enabled' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'disabled'})")
+    for n_threads in thread_counts:
+        start = time.perf_counter()
+        recommender.get_recommendations_batch(queries, seed=0, chunk_size=32, n_threads=n_threads)
+        print(f"  {n_threads:>2} threads: {n_queries / (time.perf_counter() - start):8.1f} queries/s")
+
+if __name__ == '__main__':
+    if '--scaling' in sys.argv:
+        report_thread_scaling()
+    else:
+        unittest.main()